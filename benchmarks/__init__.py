@@ -0,0 +1 @@
+"""Benchmarks on a synthetic LDOCE5-shaped corpus"""
@@ -0,0 +1,432 @@
+"""Synthetic LDOCE5-shaped corpus generator
+
+The real ldoce5.data is proprietary, so this writes a directory in IDM's
+archive format that idmreader.is_ldoce5_dir() accepts and the indexer can
+process: every archive has files.skn and dirs.skn with config.cft,
+NAME.tda and the .dat records, and the files are stored in zlib chunks in
+CONTENT.tda, catalogued by CONTENT.tda.tdz.
+
+Usage: python -m benchmarks.corpus OUTDIR [--entries N] [--seed N]
+"""
+
+import argparse
+import os
+import os.path
+import random
+import zlib
+from html import escape
+from struct import Struct
+
+from ldoce5viewer.ldoce5.idmreader import _ARCHIVE_DIRS
+
+_struct_LL = Struct("<LL")
+_pack_LL = _struct_LL.pack
+_struct_L = Struct("<L")
+_pack_L = _struct_L.pack
+_struct_H = Struct("<H")
+_pack_H = _struct_H.pack
+
+_CHUNK_SIZE = 0x10000
+
+_FILES_CFT = "[DAT]\n$content, offset = ULONG\n$a_dirs, parent = USHORT\n"
+_DIRS_CFT = "[DAT]\n$a_name, name = ULONG\n$parent, parent = USHORT\n"
+
+_ONSETS = (
+    "b bl br c ch cl cr d dr f fl fr g gl gr h j k l m n p pl pr qu r s sc sh sk "
+    "sl sm sn sp st str sw t th tr v w wh y z"
+).split()
+_VOWELS = "a e i o u a e i o ea ee ai oo ou ie".split()
+_CODAS = "- - - - b ck d ft g ll m n nd ng nt p r rd rk s sh ss st t th x".split()
+_POS = ("noun", "verb", "adjective", "adverb")
+_GRAMS = {
+    "noun": ("[countable]", "[uncountable]", "[countable, uncountable]"),
+    "verb": ("[transitive]", "[intransitive]", "[intransitive, transitive]"),
+    "adjective": ("", "[no comparative]"),
+    "adverb": ("",),
+}
+_FREQS = (("S1", "233"), ("S2", "234"), ("S3", "235"), ("W1", "236"), ("W2", "237"))
+_FILLERS = (
+    "the a of to and in that it with as for on at by from this which "
+    "someone something people way time when often very more"
+).split()
+
+
+def _make_id(archive, num, sub=0):
+    return "{0}.x.{1:06d}.{2}".format(archive, num, sub)
+
+
+class _Words(object):
+    """Deterministic pseudo-English vocabulary"""
+
+    def __init__(self, rng):
+        self._rng = rng
+        self._seen = set()
+
+    def syllable(self):
+        rng = self._rng
+        coda = rng.choice(_CODAS)
+        if coda == "-":
+            coda = ""
+        return rng.choice(_ONSETS) + rng.choice(_VOWELS) + coda
+
+    def new_word(self):
+        rng = self._rng
+        while True:
+            n = rng.choice((1, 1, 2, 2, 3))
+            syllables = [self.syllable() for _ in range(n)]
+            word = "".join(syllables)
+            if word not in self._seen:
+                self._seen.add(word)
+                return (word, syllables)
+
+    def sentence(self, vocab, keyword, n=None):
+        rng = self._rng
+        n = n or rng.randint(5, 14)
+        words = [
+            rng.choice(_FILLERS if rng.random() < 0.5 else vocab) for _ in range(n)
+        ]
+        words.insert(rng.randrange(len(words) + 1), keyword)
+        return " ".join(words)
+
+
+def _inflections(word, pos):
+    if pos == "noun":
+        return (word + ("es" if word.endswith(("s", "sh", "x")) else "s"),)
+    if pos == "verb":
+        return (word + "s", word + "ed", word + "ing")
+    if pos == "adjective":
+        return (word + "er", word + "est")
+    return ()
+
+
+def _make_entry(words, rng, num, word, syllables, vocab):
+    """Return the XML of an entry in the fs archive"""
+
+    sub = [0]
+
+    def next_id():
+        sub[0] += 1
+        return _make_id("fs", num, sub[0])
+
+    pos = rng.choice(_POS)
+    freq = rng.choice(_FREQS) if rng.random() < 0.2 else None
+    as_filter = [str(rng.randint(300, 340))]
+    if freq:
+        as_filter.append(freq[1])
+    as_filter = " | ".join(as_filter)
+    e = escape
+
+    head = ['<HWD as_filter="{0}"><BASE>{1}</BASE>'.format(as_filter, e(word))]
+    head.extend("<INFLX>{0}</INFLX>".format(e(w)) for w in _inflections(word, pos))
+    head.append("</HWD>")
+    head.append("<HYPHENATION>{0}</HYPHENATION>".format("‧".join(syllables)))
+    if rng.random() < 0.1:
+        head.append("<HOMNUM>{0}</HOMNUM>".format(rng.randint(1, 3)))
+    if freq:
+        head.append('<FREQ title="{0}">{0}</FREQ>'.format(freq[0]))
+    head.append("<POS>{0}</POS>".format(pos))
+    gram = rng.choice(_GRAMS[pos])
+    if gram:
+        head.append("<GRAM>{0}</GRAM>".format(gram))
+    head.append(
+        '<Audio resource="GB_HWD_PRON" topic="gb_hwd_pron/{0}.mp3"/>'
+        '<Audio resource="US_HWD_PRON" topic="us_hwd_pron/{0}.mp3"/>'.format(num)
+    )
+    if rng.random() < 0.1:
+        head.append(
+            '<LEXVAR id="{0}"><INFLX>{1}</INFLX></LEXVAR>'.format(
+                next_id(), e(word + "e")
+            )
+        )
+
+    body = []
+    for sn in range(rng.choice((1, 1, 2, 3, 4, 6))):
+        s = [
+            '<Sense id="{0}"><span class="sensenum">{1}</span>'.format(
+                next_id(), sn + 1
+            )
+        ]
+        s.append(
+            '<DEF as_filter="{0}">{1} '
+            "<NonDV><REFHWD>{2}</REFHWD></NonDV> {3}</DEF>".format(
+                rng.randint(300, 340),
+                e(words.sentence(vocab, "", 4)),
+                e(rng.choice(vocab)),
+                e(words.sentence(vocab, "", 3)),
+            )
+        )
+        if rng.random() < 0.3:
+            s.append(
+                '<LEXUNIT id="{0}">{1} {2} {3}</LEXUNIT>'.format(
+                    next_id(), e(word), rng.choice(_FILLERS), e(rng.choice(vocab))
+                )
+            )
+        for _ in range(rng.randint(1, 4)):
+            colloinexa = ""
+            if rng.random() < 0.2:
+                colloinexa = " <COLLOINEXA>{0} {1}</COLLOINEXA>".format(
+                    e(word), e(rng.choice(_FILLERS))
+                )
+            s.append(
+                '<EXAMPLE id="{0}" as_filter="{1}"><span class="exabullet">•</span>'
+                "<BASE>{2}{3} {4}</BASE>"
+                '<Audio resource="EXA_PRON" topic="exa_pron/{5}.mp3"/>'
+                "</EXAMPLE>".format(
+                    next_id(),
+                    rng.randint(300, 340),
+                    e(words.sentence(vocab, word)),
+                    colloinexa,
+                    e(words.sentence(vocab, "", 3)),
+                    num * 10 + sn,
+                )
+            )
+        if rng.random() < 0.3:
+            s.append(
+                '<ColloExa><COLLO id="{0}">{1} {2}</COLLO>'
+                '<EXAMPLE id="{3}"><BASE>{4}</BASE></EXAMPLE></ColloExa>'.format(
+                    next_id(),
+                    e(rng.choice(_FILLERS)),
+                    e(word),
+                    next_id(),
+                    e(words.sentence(vocab, word)),
+                )
+            )
+        if rng.random() < 0.3:
+            s.append(
+                '<Crossref><span class="neutral"> → </span>'
+                '<Ref topic="{0}">{1}</Ref></Crossref>'.format(
+                    _make_id("fs", rng.randint(0, num)), e(rng.choice(vocab))
+                )
+            )
+        s.append("</Sense>")
+        body.append("".join(s))
+
+    if pos == "adjective" and rng.random() < 0.5:
+        body.append(
+            '<RunOn><DERIV id="{0}"><BASE>{1}ly</BASE></DERIV> '
+            "<POS>adverb</POS></RunOn>".format(next_id(), e(word))
+        )
+    if pos == "verb" and rng.random() < 0.3:
+        phrvb = " ".join((word, rng.choice(("up", "out", "off", "in", "down"))))
+        body.append(
+            '<PhrVbEntry id="{0}"><Head><PHRVBHWD>{1}</PHRVBHWD></Head>'
+            '<Sense id="{2}"><DEF>{3}</DEF></Sense></PhrVbEntry>'.format(
+                next_id(), e(phrvb), next_id(), e(words.sentence(vocab, ""))
+            )
+        )
+    if rng.random() < 0.2:
+        collocates = "".join(
+            '<Collocate id="{0}"><COLLOC id="{4}">{1} {2}</COLLOC>'
+            "<COLLEXA><BASE>{3}</BASE></COLLEXA></Collocate>".format(
+                next_id(),
+                e(rng.choice(vocab)),
+                e(word),
+                e(words.sentence(vocab, word)),
+                next_id(),
+            )
+            for _ in range(rng.randint(1, 5))
+        )
+        body.append(
+            "<ColloBox><SECHEADING>COLLOCATIONS</SECHEADING>"
+            "<Section>{0}</Section></ColloBox>".format(collocates)
+        )
+    if rng.random() < 0.1:
+        body.append(
+            '<ThesBox><Section><Exponent id="{0}"><EXP>{1}</EXP>'
+            "<DEF>{2}</DEF><THESEXA><BASE>{3}</BASE></THESEXA></Exponent>"
+            "</Section></ThesBox>".format(
+                next_id(),
+                e(rng.choice(vocab)),
+                e(words.sentence(vocab, "")),
+                e(words.sentence(vocab, word)),
+            )
+        )
+
+    tail = (
+        '<Tail><SE_EntryAssets><EntryAsset type="ENTRY_COLLOCATIONS"><Refs>'
+        '<Ref topic="{0}"/></Refs></EntryAsset>'
+        '<EntryAsset type="ETYMOLOGY"><Refs><Ref topic="{1}"/></Refs></EntryAsset>'
+        "</SE_EntryAssets></Tail>".format(
+            _make_id("collocations", num), _make_id("etymologies", num)
+        )
+    )
+
+    return '<Entry id="{0}" idm_id="{1:06d}"><Head>{2}</Head>{3}{4}</Entry>'.format(
+        _make_id("fs", num), num, "".join(head), "".join(body), tail
+    ).encode("utf-8")
+
+
+def write_archive(archive_dir, files):
+    """Write an IDM archive of [(dirs, name, data)] into archive_dir"""
+
+    files_dir = os.path.join(archive_dir, "files.skn")
+    dirs_dir = os.path.join(archive_dir, "dirs.skn")
+    for d in (files_dir, dirs_dir):
+        if not os.path.isdir(d):
+            os.makedirs(d)
+
+    # directory 0 is the root; its children have the parent 0
+    dir_index = {(): 0}
+    dir_records = [("", 0)]
+    for (dirs, name, data) in files:
+        for i in range(1, len(dirs) + 1):
+            if dirs[:i] not in dir_index:
+                dir_index[dirs[:i]] = len(dir_records)
+                dir_records.append((dirs[i - 1], dir_index[dirs[: i - 1]]))
+
+    with open(os.path.join(dirs_dir, "config.cft"), "w") as f:
+        f.write(_DIRS_CFT)
+    with open(os.path.join(dirs_dir, "NAME.tda"), "wb") as f_name:
+        with open(os.path.join(dirs_dir, "dirs.dat"), "wb") as f_dat:
+            for (name, parent) in dir_records:
+                f_dat.write(_pack_L(f_name.tell()) + _pack_H(parent))
+                f_name.write(name.encode("utf-8") + b"\0")
+
+    # the files are separated by NULs and stored in zlib chunks
+    with open(os.path.join(files_dir, "config.cft"), "w") as f:
+        f.write(_FILES_CFT)
+    f_name = open(os.path.join(files_dir, "NAME.tda"), "wb")
+    f_dat = open(os.path.join(files_dir, "files.dat"), "wb")
+    f_content = open(os.path.join(files_dir, "CONTENT.tda"), "wb")
+    f_catalog = open(os.path.join(files_dir, "CONTENT.tda.tdz"), "wb")
+    try:
+        chunk = []
+        chunk_len = 0
+        offset = 0
+
+        def flush():
+            data = b"".join(chunk)
+            cmp = zlib.compress(data)
+            f_content.write(cmp)
+            f_catalog.write(_pack_LL(len(data), len(cmp)))
+            del chunk[:]
+
+        for (dirs, name, data) in files:
+            f_name.write(name.encode("utf-8") + b"\0")
+            f_dat.write(_pack_L(offset) + _pack_H(dir_index[tuple(dirs)]))
+            chunk.append(data + b"\0")
+            chunk_len += len(data) + 1
+            offset += len(data) + 1
+            if chunk_len >= _CHUNK_SIZE:
+                flush()
+                chunk_len = 0
+        if chunk:
+            flush()
+    finally:
+        f_name.close()
+        f_dat.close()
+        f_content.close()
+        f_catalog.close()
+
+
+def generate(out_dir, entries=2000, seed=0):
+    """Write a synthetic ldoce5.data with the given number of entries"""
+
+    rng = random.Random(seed)
+    words = _Words(rng)
+    vocab = [words.new_word() for _ in range(entries)]
+    plain_vocab = [w for (w, _) in vocab]
+
+    archives = dict((name, []) for name in _ARCHIVE_DIRS)
+
+    for (num, (word, syllables)) in enumerate(vocab):
+        entry = _make_entry(words, rng, num, word, syllables, plain_vocab)
+        archives["fs"].append(((), "{0}.xml".format(num), entry))
+        for res in ("gb_hwd_pron", "us_hwd_pron"):
+            archives[res].append(((), "{0}.mp3".format(num), rng.randbytes(256)))
+        for name in ("collocations", "etymologies"):
+            archives[name].append(
+                (
+                    (),
+                    "{0}.xml".format(num),
+                    '<Root id="{0}">{1}</Root>'.format(
+                        _make_id(name, num), escape(words.sentence(plain_vocab, word))
+                    ).encode("utf-8"),
+                )
+            )
+        if num % 50 == 0:
+            for size in ("thumbnail", "fullsize"):
+                archives["picture"].append(
+                    ((size,), "{0}.jpg".format(num), rng.randbytes(512))
+                )
+
+    for (name, files) in archives.items():
+        if files or name.startswith("activator"):
+            continue
+        for i in range(10):
+            files.append(
+                (
+                    (),
+                    "{0}.xml".format(i),
+                    '<Root id="{0}">{1}</Root>'.format(
+                        _make_id(name, i), escape(words.sentence(plain_vocab, ""))
+                    ).encode("utf-8"),
+                )
+            )
+
+    # the language activator: concepts made of sections of exponents
+    n_concepts = max(1, entries // 100)
+    labels = []
+    for c in range(n_concepts):
+        section_ids = []
+        for s in range(rng.randint(1, 4)):
+            sid = _make_id("activator_section", c * 10 + s)
+            section_ids.append(sid)
+            exponents = []
+            for x in range(rng.randint(1, 6)):
+                exp = " ".join(rng.sample(plain_vocab, rng.randint(1, 3)))
+                labels.append(exp)
+                exponents.append(
+                    '<Exponent id="{0}"><EXP>{1}</EXP><DEF>{2}</DEF></Exponent>'.format(
+                        _make_id("activator_exponent", c * 100 + s * 10 + x),
+                        escape(exp),
+                        escape(words.sentence(plain_vocab, "")),
+                    )
+                )
+            archives["activator_section"].append(
+                (
+                    (),
+                    "{0}.xml".format(sid),
+                    '<Section id="{0}">{1}</Section>'.format(
+                        sid, "".join(exponents)
+                    ).encode("utf-8"),
+                )
+            )
+        hwd = "/".join(rng.choice(plain_vocab) for _ in range(rng.randint(1, 2)))
+        cid = _make_id("activator_concept", c)
+        archives["activator_concept"].append(
+            (
+                (),
+                "{0}.xml".format(cid),
+                '<Concept id="{0}"><HWD>{1}</HWD>{2}</Concept>'.format(
+                    cid,
+                    escape(hwd),
+                    "".join('<Section id="{0}"/>'.format(sid) for sid in section_ids),
+                ).encode("utf-8"),
+            )
+        )
+    archives["activator"].append(((), "index.xml", b'<Root id="activator.x.0.0"/>'))
+
+    for (name, files) in archives.items():
+        write_archive(os.path.join(out_dir, _ARCHIVE_DIRS[name]), files)
+
+    alpha_dir = os.path.join(out_dir, _ARCHIVE_DIRS["activator"], "alpha_index.skn")
+    if not os.path.isdir(alpha_dir):
+        os.makedirs(alpha_dir)
+    with open(os.path.join(alpha_dir, "LABEL.tda"), "wb") as f:
+        f.write(b"".join(label.encode("utf-8") + b"\0" for label in labels))
+
+    return plain_vocab
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("out_dir")
+    parser.add_argument("--entries", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    generate(args.out_dir, args.entries, args.seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""Incremental index lookups on a large key set
+
+Builds an incremental index of random keys in each file format and replays
+the prefixes of random words typed into the search box, with a cold result
+cache, so that the lookups of the two formats can be compared.
+
+Usage: python -m benchmarks.incremental [--keys N] [--words N]
+                                        [--limit N ...] [--workdir DIR]
+"""
+
+import argparse
+import os.path
+import random
+import shutil
+import string
+import sys
+import tempfile
+import time
+
+from ldoce5viewer import incremental
+
+_VERSIONS = (1, 2)
+
+
+def random_keys(count, seed=0):
+    rng = random.Random(seed)
+    letters = string.ascii_lowercase
+    return [
+        "".join(rng.choice(letters) for _ in range(rng.randint(3, 12)))
+        for _ in range(count)
+    ]
+
+
+def build(path, keys, version, seed=0):
+    rng = random.Random(seed)
+    maker = incremental.Maker(path, path + ".tmp", fuzzy=False, version=version)
+    for (i, key) in enumerate(keys):
+        maker.add_item(
+            key,
+            "hm",
+            "<b>{0}</b>".format(key),
+            "/fs/{0}".format(i),
+            rng.randint(0, 3),
+            rng.randint(0, 255),
+        )
+    maker.finalize()
+
+
+def replay(path, prefixes, limit, ranked):
+    """Return the mean time of a lookup in seconds, decoding every row"""
+
+    total = 0.0
+    with incremental.Searcher(path) as searcher:
+        for prefix in prefixes:
+            # a cold cache, so that no prefix is refined from a shorter one
+            searcher._cache.clear()
+            t = time.perf_counter()
+            for row in searcher.search(prefix, limit, ranked):
+                tuple(row)
+            total += time.perf_counter() - t
+    return total / len(prefixes)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--keys", type=int, default=500000)
+    parser.add_argument("--words", type=int, default=200, help="typed words")
+    parser.add_argument("--limit", type=int, nargs="+", default=[1, 500])
+    parser.add_argument("--ranked", action="store_true")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--workdir", help="keep the indexes here")
+    args = parser.parse_args()
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="ldoce5bench")
+    try:
+        keys = random_keys(args.keys, args.seed)
+        words = random.Random(args.seed).sample(keys, args.words)
+        prefixes = [w[:n] for w in words for n in range(1, len(w) + 1)]
+        paths = {}
+        for version in _VERSIONS:
+            path = paths[version] = os.path.join(
+                workdir, "incremental-{0}-v{1}.db".format(args.keys, version)
+            )
+            if not os.path.exists(path):
+                build(path, keys, version, args.seed)
+            sys.stdout.write(
+                "v{0}: {1} keys, {2} bytes\n".format(
+                    version, args.keys, os.path.getsize(path)
+                )
+            )
+
+        sys.stdout.write("{0} prefixes\n".format(len(prefixes)))
+        for limit in args.limit:
+            for version in _VERSIONS:
+                mean = min(
+                    replay(paths[version], prefixes, limit, args.ranked)
+                    for _ in range(args.repeat)
+                )
+                sys.stdout.write(
+                    "limit={0:<6} v{1}  {2:.3f} ms\n".format(limit, version, mean * 1e3)
+                )
+    finally:
+        if not args.workdir:
+            shutil.rmtree(workdir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""Index builder for the benchmarks
+
+This runs the stages of the indexing thread of qtgui/indexer.py from
+ldoce5viewer.indexing without Qt, so that a full index build can be timed
+on a machine without a display.
+"""
+
+import os
+import os.path
+import shutil
+
+from ldoce5viewer import indexing
+from ldoce5viewer.indexing import Progress, ScanTempFile
+
+
+class IndexPaths(object):
+    """Locations of the index files under a directory"""
+
+    def __init__(self, index_dir):
+        self.index_dir = index_dir
+        self.filemap = os.path.join(index_dir, "filemap.cdb")
+        self.incremental = os.path.join(index_dir, "incremental.db")
+        self.variations = os.path.join(index_dir, "variations.cdb")
+        self.fulltext_hwdphr = os.path.join(index_dir, "fulltext_hp")
+        self.fulltext_defexa = os.path.join(index_dir, "fulltext_de")
+
+
+def build_index(data_dir, index_dir):
+    """Build all the index files of data_dir into index_dir"""
+
+    if os.path.exists(index_dir):
+        shutil.rmtree(index_dir)
+    os.makedirs(index_dir)
+    paths = IndexPaths(index_dir)
+
+    progress = Progress()
+    indexing.make_filemap(data_dir, paths.filemap, progress)
+    scan_temp = ScanTempFile(os.path.join(index_dir, "scan.tmp"))
+    try:
+        (_, variations) = indexing.scan_entries(data_dir, scan_temp, progress)
+        indexing.make_variations(paths.variations, variations, progress)
+        del variations
+        indexing.scan_activator(data_dir, scan_temp, progress)
+        indexing.make_incremental(
+            paths.incremental,
+            paths.incremental + ".tmp",
+            scan_temp.iter_items(),
+            progress,
+        )
+        indexing.make_fulltext(
+            paths.fulltext_hwdphr,
+            scan_temp.iter_items(),
+            "pha",
+            "headwords and phrases",
+            progress,
+        )
+        indexing.make_fulltext(
+            paths.fulltext_defexa,
+            scan_temp.iter_items(),
+            "de",
+            "examples and definitions",
+            progress,
+        )
+    finally:
+        scan_temp.remove()
+    return paths
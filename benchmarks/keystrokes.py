@@ -0,0 +1,277 @@
+"""Keystroke-replay latency harness
+
+Replays typing sessions through the search box pipeline of the main window
+without a window: the incremental search on the typing thread, the
+full-text search on a background thread which is aborted by the next
+keystroke (as in qtgui.asyncfts) and the merge of both results (as in
+MainWindow._updateIndex).  The timers delaying the list update in the GUI
+are left out, so the latencies are those of the pipeline itself.
+
+A session file is a JSON list of sessions, each a list of
+[seconds since the start of the session, text in the search box].
+
+Usage: python -m benchmarks.keystrokes [--sessions FILE] [--index DIR]
+                                       [--speed X] [--max-p95 MS] ...
+"""
+
+import argparse
+import json
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+from ldoce5viewer import fulltext, incremental
+from ldoce5viewer.utils.results import MergedResults
+
+from .index import IndexPaths
+
+# as in qtgui.main
+_INCREMENTAL_LIMIT = 500
+_FTS_HWDPHR_LIMIT = 10000
+
+_PERCENTILES = (50, 95, 99)
+
+
+class _FullTextWorker(threading.Thread):
+    """The full-text search thread of qtgui.asyncfts without Qt
+
+    A new query aborts the search in progress. Finished searches are merged
+    with the incremental results and passed to on_done(job, merged).
+    """
+
+    def __init__(self, searcher, on_done):
+        threading.Thread.__init__(self)
+        self.daemon = True
+        self._searcher = searcher
+        self._on_done = on_done
+        self._cond = threading.Condition()
+        self._job = None
+        self._collector = None
+        self._busy = False
+        self._quit = False
+
+    def run(self):
+        searcher = self._searcher
+        while True:
+            with self._cond:
+                while self._job is None and not self._quit:
+                    self._cond.wait()
+                if self._quit:
+                    return
+                job = self._job
+                self._job = None
+                self._busy = True
+                collector = self._collector = searcher.make_collector(
+                    _FTS_HWDPHR_LIMIT + 1
+                )
+
+            (query, itemtypes, started, incr_res) = job
+            result = searcher.search(
+                collector, query, itemtypes=itemtypes, refine=True
+            )
+            if not collector.aborted:
+                self._on_done(job, MergedResults(incr_res, result))
+
+            with self._cond:
+                self._collector = None
+                self._busy = False
+                self._cond.notify_all()
+
+    def submit(self, job):
+        with self._cond:
+            if self._collector:
+                self._collector.abort()
+            self._job = job
+            self._cond.notify_all()
+
+    def wait_idle(self):
+        with self._cond:
+            while self._job is not None or self._busy:
+                self._cond.wait()
+
+    def stop(self):
+        with self._cond:
+            if self._collector:
+                self._collector.abort()
+            self._quit = True
+            self._cond.notify_all()
+        self.join()
+
+
+def synthetic_sessions(words, count, seed=0):
+    """Return sessions typing words and phrases of words, with typos
+    corrected by backspace"""
+
+    rng = random.Random(seed)
+    sessions = []
+    for _ in range(count):
+        target = " ".join(rng.sample(words, rng.choice((1, 1, 1, 2))))
+        (t, text, session) = (0.0, "", [])
+        for c in target:
+            if rng.random() < 0.05:
+                t += max(0.03, rng.gauss(0.15, 0.05))
+                session.append([round(t, 3), text + rng.choice("aeiost")])
+            t += max(0.03, rng.gauss(0.15, 0.05))
+            text += c
+            session.append([round(t, 3), text])
+        sessions.append(session)
+    return sessions
+
+
+def percentile(values, p):
+    """Nearest-rank percentile of sorted values"""
+    if not values:
+        return float("nan")
+    return values[max(0, min(len(values) - 1, -(-len(values) * p // 100) - 1))]
+
+
+def replay(sessions, incr_searcher, fts_searcher, speed=1.0):
+    """Replay the sessions and return the latencies in seconds
+
+    Returns {"incremental": [...], "merged": [...], "superseded": n}.
+    With speed 0 the keystrokes are sent as fast as possible.
+    """
+
+    incr_latencies = []
+    merged_latencies = []
+    lock = threading.Lock()
+
+    def on_done(job, merged):
+        latency = time.perf_counter() - job[2]
+        with lock:
+            merged_latencies.append(latency)
+
+    worker = _FullTextWorker(fts_searcher, on_done)
+    worker.start()
+    submitted = 0
+    try:
+        for session in sessions:
+            start = time.perf_counter()
+            for (ts, query) in session:
+                if speed:
+                    delay = start + ts / speed - time.perf_counter()
+                    if delay > 0:
+                        time.sleep(delay)
+                if not query:
+                    continue
+
+                started = time.perf_counter()
+                contains_wild = any(c in query for c in "*?")
+                if contains_wild:
+                    incr_res = ()
+                else:
+                    incr_res = tuple(
+                        incr_searcher.search(query, _INCREMENTAL_LIMIT, ranked=True)
+                    )
+                incr_latencies.append(time.perf_counter() - started)
+
+                itemtypes = ("hm",) if contains_wild else ()
+                worker.submit((query, itemtypes, started, incr_res))
+                submitted += 1
+            worker.wait_idle()
+    finally:
+        worker.stop()
+
+    return dict(
+        incremental=sorted(incr_latencies),
+        merged=sorted(merged_latencies),
+        superseded=submitted - len(merged_latencies),
+    )
+
+
+def summarize(result):
+    summary = dict(superseded=result["superseded"])
+    for name in ("incremental", "merged"):
+        values = result[name]
+        summary[name] = dict(
+            count=len(values),
+            **dict(("p{0}".format(p), percentile(values, p)) for p in _PERCENTILES)
+        )
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", help="session file to replay")
+    parser.add_argument(
+        "--index", help="index directory, e.g. the data directory of the viewer"
+    )
+    parser.add_argument("--workdir", help="keep the synthetic corpus here")
+    parser.add_argument("--entries", type=int, default=2000)
+    parser.add_argument("--count", type=int, default=50, help="synthetic sessions")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--save-sessions", help="write the replayed sessions here")
+    parser.add_argument(
+        "--speed", type=float, default=1.0, help="replay speed; 0 for no pauses"
+    )
+    parser.add_argument("--json", help="write the summary to this file")
+    parser.add_argument(
+        "--max-p95", type=float, help="fail if the merged p95 exceeds this (ms)"
+    )
+    args = parser.parse_args()
+
+    tmp_dir = None
+    if args.index:
+        paths = IndexPaths(args.index)
+        words = None
+    else:
+        from .run import prepare
+
+        workdir = args.workdir
+        if not workdir:
+            workdir = tmp_dir = tempfile.mkdtemp(prefix="ldoce5bench")
+        ctx = prepare(workdir, args.entries, args.seed)
+        paths = ctx.paths
+        words = ctx.vocab
+
+    try:
+        if args.sessions:
+            with open(args.sessions) as f:
+                sessions = json.load(f)
+        elif words:
+            sessions = synthetic_sessions(words, args.count, args.seed)
+        else:
+            parser.error("--sessions is required with --index")
+
+        if args.save_sessions:
+            with open(args.save_sessions, "w") as f:
+                json.dump(sessions, f)
+
+        incr_searcher = incremental.Searcher(paths.incremental)
+        fts_searcher = fulltext.Searcher(paths.fulltext_hwdphr, paths.variations)
+        try:
+            result = replay(sessions, incr_searcher, fts_searcher, args.speed)
+        finally:
+            incr_searcher.close()
+            fts_searcher.close()
+    finally:
+        if tmp_dir:
+            shutil.rmtree(tmp_dir)
+
+    summary = summarize(result)
+    for name in ("incremental", "merged"):
+        s = summary[name]
+        sys.stdout.write(
+            "{0:<12} n={1:<6} ".format(name, s["count"])
+            + " ".join(
+                "p{0}={1:.2f}ms".format(p, s["p{0}".format(p)] * 1e3)
+                for p in _PERCENTILES
+            )
+            + "\n"
+        )
+    sys.stdout.write("superseded   {0}\n".format(summary["superseded"]))
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(summary, f, indent=2, sort_keys=True)
+
+    if args.max_p95 is not None and summary["merged"]["p95"] * 1e3 > args.max_p95:
+        sys.stdout.write("merged p95 exceeds {0}ms\n".format(args.max_p95))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,289 @@
+"""Benchmark suite
+
+Generates a synthetic corpus (see benchmarks.corpus), builds its index and
+times the hot paths of the viewer on it.
+
+Usage: python -m benchmarks.run [--entries N] [--repeat N] [--workdir DIR]
+                                [--json PATH] [-k SUBSTRING]
+"""
+
+import argparse
+import json
+import os.path
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+import lxml.etree as et
+
+from ldoce5viewer import fulltext, incremental
+from ldoce5viewer.ldoce5 import idmreader
+from ldoce5viewer.ldoce5.extract import get_entry_items, iterparse_entry_items
+from ldoce5viewer.ldoce5.filemap import FilemapReader
+from ldoce5viewer.ldoce5.paths import Path
+from ldoce5viewer.ldoce5.transform import trans_entry
+from ldoce5viewer.ldoce5.utils import shorten_id
+
+from .corpus import generate
+from .index import IndexPaths, build_index
+
+_BENCHMARKS = []
+
+
+def benchmark(func):
+    """Register a benchmark
+
+    func(ctx) returns (run, ops): run() performs ops operations.
+    """
+    _BENCHMARKS.append(func)
+    return func
+
+
+class Context(object):
+    def __init__(self, data_dir, index_dir, vocab, seed=0):
+        self.data_dir = data_dir
+        self.index_dir = index_dir
+        self.paths = IndexPaths(index_dir)
+        self.vocab = vocab
+        self.rng = random.Random(seed)
+        self.locations = [
+            location for (dirs, name, location) in idmreader.list_files(data_dir, "fs")
+        ]
+        with idmreader.ArchiveReader(data_dir, "fs") as reader:
+            self.entries = [
+                reader.read(location) for location in self.sample(self.locations, 200)
+            ]
+
+    def sample(self, population, k):
+        return self.rng.sample(population, min(k, len(population)))
+
+    def prefixes(self, k):
+        """Return k search-box prefixes of the words in the corpus"""
+        words = self.sample(self.vocab, k)
+        return [w[: self.rng.randint(1, len(w))] for w in words]
+
+
+@benchmark
+def archive_read(ctx):
+    locations = ctx.sample(ctx.locations, 200)
+
+    def run():
+        with idmreader.ArchiveReader(ctx.data_dir, "fs") as reader:
+            for location in locations:
+                reader.read(location)
+
+    return (run, len(locations))
+
+
+@benchmark
+def filemap_lookup(ctx):
+    names = [shorten_id("fs.x.{0:06d}.0".format(i)) for i in range(len(ctx.vocab))]
+    names = ctx.sample(names, 1000)
+
+    def run():
+        with FilemapReader(ctx.paths.filemap) as reader:
+            for name in names:
+                reader.lookup("fs", name)
+
+    return (run, len(names))
+
+
+@benchmark
+def incremental_search(ctx):
+    queries = ctx.prefixes(200)
+
+    def run():
+        # a new searcher each time, so that the result cache is cold
+        with incremental.Searcher(ctx.paths.incremental) as searcher:
+            for q in queries:
+                tuple(searcher.search(q, limit=500, ranked=True))
+
+    return (run, len(queries))
+
+
+@benchmark
+def incremental_suggest(ctx):
+    words = ctx.sample(ctx.vocab, 100)
+    queries = [w[:-1] + "q" for w in words]
+
+    def run():
+        with incremental.Searcher(ctx.paths.incremental) as searcher:
+            for q in queries:
+                searcher.suggest(q, prefix=True)
+
+    return (run, len(queries))
+
+
+@benchmark
+def fulltext_search(ctx):
+    queries = ctx.sample(ctx.vocab, 50)
+
+    def run():
+        searcher = fulltext.Searcher(ctx.paths.fulltext_hwdphr, ctx.paths.variations)
+        try:
+            for q in queries:
+                searcher.search(searcher.make_collector(10001), q)
+        finally:
+            searcher.close()
+
+    return (run, len(queries))
+
+
+@benchmark
+def extract_entry_items(ctx):
+    entries = ctx.entries
+
+    def run():
+        for data in entries:
+            get_entry_items(data)
+
+    return (run, len(entries))
+
+
+@benchmark
+def iterparse_entry(ctx):
+    entries = ctx.entries
+
+    def run():
+        for data in entries:
+            iterparse_entry_items(data)
+
+    return (run, len(entries))
+
+
+# the lookups of the render and index paths, from the root of the entries
+_ENTRY_PATHS = (
+    "Head",
+    "Head/HWD/BASE",
+    "Head/POS",
+    "Head/HYPHENATION",
+    'Head/Audio[@resource="GB_HWD_PRON"]',
+    ".//EntryAsset",
+    "Sense//GRAM",
+    ".//DEF",
+    ".//LEXVAR",
+    ".//ORTHVAR",
+    ".//COLLOINEXA",
+)
+
+
+@benchmark
+def string_paths(ctx):
+    roots = [et.fromstring(data) for data in ctx.entries]
+
+    def run():
+        for root in roots:
+            for path in _ENTRY_PATHS:
+                root.findall(path)
+
+    return (run, len(roots))
+
+
+@benchmark
+def compiled_paths(ctx):
+    roots = [et.fromstring(data) for data in ctx.entries]
+    paths = [Path(path) for path in _ENTRY_PATHS]
+
+    def run():
+        for root in roots:
+            for path in paths:
+                path.findall(root)
+
+    return (run, len(roots))
+
+
+@benchmark
+def transform_entry(ctx):
+    entries = ctx.entries
+
+    def run():
+        for data in entries:
+            trans_entry(data)
+
+    return (run, len(entries))
+
+
+@benchmark
+def index_build(ctx):
+    index_dir = ctx.index_dir + ".bench"
+
+    def run():
+        build_index(ctx.data_dir, index_dir)
+        shutil.rmtree(index_dir)
+
+    return (run, 1)
+
+
+def run_benchmarks(ctx, repeat=5, pattern=None, out=sys.stdout):
+    """Run the benchmarks and return {name: {"ops", "min", "median"}}
+    with the times per operation in seconds"""
+
+    report = {}
+    for func in _BENCHMARKS:
+        name = func.__name__
+        if pattern and pattern not in name:
+            continue
+        (run, ops) = func(ctx)
+        times = []
+        for _ in range(1 if name == "index_build" else repeat):
+            t = time.perf_counter()
+            run()
+            times.append((time.perf_counter() - t) / ops)
+        times.sort()
+        report[name] = dict(ops=ops, min=times[0], median=times[len(times) // 2])
+        out.write(
+            "{0:<24} {1:>12.1f} us {2:>12.1f} us  ({3} ops)\n".format(
+                name, times[0] * 1e6, times[len(times) // 2] * 1e6, ops
+            )
+        )
+        out.flush()
+    return report
+
+
+def prepare(workdir, entries, seed=0):
+    """Generate the corpus and its index in workdir, unless already done"""
+
+    data_dir = os.path.join(workdir, "ldoce5.data")
+    index_dir = os.path.join(workdir, "index")
+    stamp = os.path.join(workdir, "corpus-{0}-{1}.json".format(entries, seed))
+    if os.path.exists(stamp):
+        with open(stamp) as f:
+            vocab = json.load(f)
+    else:
+        if os.path.exists(data_dir):
+            shutil.rmtree(data_dir)
+        vocab = generate(data_dir, entries, seed)
+        build_index(data_dir, index_dir)
+        with open(stamp, "w") as f:
+            json.dump(vocab, f)
+    return Context(data_dir, index_dir, vocab, seed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--entries", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--workdir", help="keep the corpus and the index here")
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("-k", dest="pattern", help="run the matching benchmarks")
+    args = parser.parse_args()
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="ldoce5bench")
+    try:
+        ctx = prepare(workdir, args.entries, args.seed)
+        sys.stdout.write("{0:<24} {1:>15} {2:>15}\n".format("", "min", "median"))
+        report = run_benchmarks(ctx, args.repeat, args.pattern)
+    finally:
+        if not args.workdir:
+            shutil.rmtree(workdir)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+
+
+if __name__ == "__main__":
+    main()
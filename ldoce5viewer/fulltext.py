@@ -3,6 +3,10 @@
 import fnmatch
 import os.path
 import re
+import threading
+import zlib
+from bisect import bisect_left
+from collections import namedtuple
 from operator import itemgetter
 
 from whoosh import index as wh_index
@@ -18,19 +22,73 @@ from whoosh.qparser import (
     WildcardPlugin,
 )
 from whoosh.query import And, Or, Term, Variations
+from whoosh.searching import Results
 
+from .utils.cache import LRUCache
 from .utils.cdb import CDBError, CDBMaker, CDBReader
 from .utils.text import dec_utf8, enc_utf8, normalize_index_key, normalize_token
 
 
+_FILTERS_NAME = "filters.cdb"
+_CACHE_SIZE = 32
+_CACHE_WEIGHT = 100000  # total number of cached result items
+_MATCH_SPACES = re.compile(r"\s+")
+_MATCH_PLAIN_WORDS = re.compile(r"[^\W_]+( [^\W_]+)*\Z")
+_OPERATOR_WORDS = frozenset(("AND", "OR", "NOT"))
+
+# results: sorted list of (label, path, sortkey, prio, None)
+# docnums: list of the document numbers of results
+# scores: list of the scores of results
+# query: the query whose words are highlighted in the content, or None
+# complete: True if all the matching docs are in results
+_CachedResult = namedtuple("_CachedResult", "results docnums scores query complete")
+
+
 class IndexError(Exception):
     pass
 
 
+def _results_len(entry):
+    return len(entry.results)
+
+
+def _normalize_query(q):
+    """Collapse the runs of spaces as the query parser does"""
+    return (_MATCH_SPACES.sub(" ", q).rstrip() or None) if q else None
+
+
+def _sorted_result(found, query, complete):
+    """Make a _CachedResult of (label, path, sortkey, prio, None, docnum,
+    score) in the order of the collector"""
+
+    found.sort(key=itemgetter(2, 3))
+    return _CachedResult(
+        [item[:5] for item in found],
+        [item[5] for item in found],
+        [item[6] for item in found],
+        query,
+        complete,
+    )
+
+
+def _subqueries(query):
+    return query.subqueries if isinstance(query, And) else [query]
+
+
+def _iter_highlights(hits):
+    formatter = hits.formatter
+    for hit in hits:
+        # the terms are numbered per hit, so that a hit is highlighted the
+        # same on any page
+        formatter.clean()
+        yield hit.highlights("content")
+
+
 class AbortableCollector(WrappingCollector):
-    def __init__(self, child):
+    def __init__(self, child, limit=None):
         WrappingCollector.__init__(self, child)
         self._aborted = False
+        self._limit = limit
 
     def collect_matches(self):
         collect = self.collect
@@ -43,6 +101,10 @@ class AbortableCollector(WrappingCollector):
     def aborted(self):
         return self._aborted
 
+    @property
+    def limit(self):
+        return self._limit
+
     def abort(self):
         self._aborted = True
 
@@ -155,6 +217,140 @@ _schema = Schema(
 _schema["content"].scorable = False
 
 
+# -----------------
+# Filter Bitsets
+# -----------------
+
+
+def _write_filter_bitsets(index, f):
+    """Write the docnum bitsets of every itemtype and asfilter code"""
+
+    maker = CDBMaker(f)
+    with index.reader() as reader:
+        maker.add(b"generation", enc_utf8(str(reader.generation())))
+        size = (reader.doc_count_all() + 7) // 8
+        for fieldname in ("itemtype", "asfilter"):
+            for text in reader.field_terms(fieldname):
+                bits = bytearray(size)
+                for docnum in reader.postings(fieldname, text).all_ids():
+                    bits[docnum >> 3] |= 1 << (docnum & 7)
+                key = enc_utf8(fieldname + ":" + text)
+                maker.add(key, zlib.compress(bytes(bits)))
+    maker.finalize()
+
+
+class _UnsupportedFilter(Exception):
+    pass
+
+
+class FilterBitsets(object):
+    """Docnum bitsets (as python ints) of itemtypes and asfilter codes"""
+
+    def __init__(self, path):
+        self._reader = CDBReader(path)
+        self._cache = {}
+        self.generation = int(dec_utf8(self._reader[b"generation"]))
+
+    def close(self):
+        if self._reader:
+            self._reader.close()
+            self._reader = None
+
+    def get(self, fieldname, text):
+        key = (fieldname, text)
+        bits = self._cache.get(key)
+        if bits is None:
+            data = self._reader.get(enc_utf8(fieldname + ":" + text))
+            if data is None:
+                bits = 0
+            else:
+                bits = int.from_bytes(zlib.decompress(data), "little")
+            self._cache[key] = bits
+        return bits
+
+    def evaluate(self, query):
+        """Evaluate a query made of And, Or and Term as {score: bitset}
+
+        The matching docs are grouped by the score whoosh gives them. The
+        fields have the Existence format and are not scorable, so a term
+        scores 1, And adds the scores of its subqueries and Or adds those
+        of its matching subqueries.
+        """
+
+        if query.boost != 1:
+            raise _UnsupportedFilter()
+        if isinstance(query, Term):
+            return {1: self.get(query.fieldname, query.text)}
+        elif isinstance(query, (And, Or)):
+            union = isinstance(query, Or)
+            scores = {0: -1}
+            for q in query.subqueries:
+                sub = self.evaluate(q)
+                if union:
+                    matched = 0
+                    for bits in sub.values():
+                        matched |= bits
+                    sub[0] = ~matched
+                product = {}
+                for (s1, bits1) in scores.items():
+                    for (s2, bits2) in sub.items():
+                        bits = bits1 & bits2
+                        if bits:
+                            product[s1 + s2] = product.get(s1 + s2, 0) | bits
+                scores = product
+            scores.pop(0, None)
+            return scores
+        raise _UnsupportedFilter()
+
+
+def _iter_bits(bits):
+    s = bin(bits)[:1:-1]
+    find = s.find
+    i = find("1")
+    while i != -1:
+        yield i
+        i = find("1", i + 1)
+
+
+def _match_on(searcher, context, query, scores, collector):
+    """Match query on the docs of {docnum: score}, and return the scores of
+    the matching ones plus their scores for query
+
+    Returns None if the collector is aborted.
+    """
+
+    docnums = sorted(scores)
+    matched = {}
+    # walk the postings if they are fewer than the docs
+    walk = query.estimate_size(searcher.reader()) < len(docnums)
+    for (subsearcher, offset) in searcher.leaf_searchers():
+        matcher = query.matcher(subsearcher, context)
+        if walk:
+            while matcher.is_active():
+                if collector.aborted:
+                    return None
+                docnum = matcher.id() + offset
+                if docnum in scores:
+                    matched[docnum] = scores[docnum] + matcher.score()
+                matcher.next()
+            continue
+
+        start = bisect_left(docnums, offset)
+        end = bisect_left(docnums, offset + subsearcher.doc_count_all())
+        for docnum in docnums[start:end]:
+            if collector.aborted:
+                return None
+            if not matcher.is_active():
+                break
+            if matcher.id() < docnum - offset:
+                matcher.skip_to(docnum - offset)
+                if not matcher.is_active():
+                    break
+            if matcher.id() == docnum - offset:
+                matched[docnum] = scores[docnum] + matcher.score()
+    return matched
+
+
 # -----------------
 # Maker
 # -----------------
@@ -169,6 +365,7 @@ class Maker(object):
             os.makedirs(index_dir)
 
         index = wh_index.create_in(index_dir, _schema)
+        self._index_dir = index_dir
         self._index = index
         self._writer = index.writer()
         self._committed = False
@@ -184,6 +381,8 @@ class Maker(object):
     def commit(self):
         self._committed = True
         self._writer.commit()
+        with open(os.path.join(self._index_dir, _FILTERS_NAME), "w+b") as f:
+            _write_filter_bitsets(self._index, f)
 
     def close(self):
         if not self._committed:
@@ -202,11 +401,21 @@ class Maker(object):
 class Searcher(object):
     def __init__(self, index_dir, var_path):
         self._index = None
+        self._cache = LRUCache(_CACHE_SIZE, _CACHE_WEIGHT, weigher=_results_len)
+        self._local = threading.local()
+        self._searchers = []
+        self._lock = threading.Lock()
+        self._bitsets = None
         try:
             self._index = wh_index.open_dir(index_dir)
         except wh_index.IndexError:
             raise IndexError
 
+        try:
+            self._bitsets = FilterBitsets(os.path.join(index_dir, _FILTERS_NAME))
+        except (EnvironmentError, CDBError, KeyError, ValueError):
+            pass
+
         self._var_reader = self._make_var_reader(var_path)
 
         op = OperatorsPlugin(
@@ -247,9 +456,17 @@ class Searcher(object):
             pass
 
     def close(self):
+        with self._lock:
+            for searcher in self._searchers:
+                searcher.close()
+            del self._searchers[:]
         if self._index:
             self._index.close()
             self._index = None
+        self._cache.clear()
+        if self._bitsets:
+            self._bitsets.close()
+            self._bitsets = None
         if self._var_reader:
             self._var_reader.close()
 
@@ -259,86 +476,283 @@ class Searcher(object):
         except (EnvironmentError, CDBError):
             return None
 
+    def _get_searcher(self, generation=None):
+        """Return a long-lived whoosh searcher owned by the calling thread.
+
+        Whoosh searchers are not thread-safe, so each thread (the GUI
+        thread and the async FTS thread) keeps its own one. It is
+        reopened only when the index generation changes.
+        """
+
+        if generation is None:
+            generation = self._index.latest_generation()
+
+        local = self._local
+        searcher = getattr(local, "searcher", None)
+        if searcher is not None and local.generation != generation:
+            with self._lock:
+                self._searchers.remove(searcher)
+            searcher.close()
+            searcher = None
+
+        if searcher is None:
+            searcher = self._index.searcher()
+            with self._lock:
+                self._searchers.append(searcher)
+            local.searcher = searcher
+            local.generation = generation
+
+        return searcher
+
     def correct(self, misspelled, limit=5):
-        with self._index.searcher() as searcher:
-            corrector = searcher.corrector("content")
-            return corrector.suggest(misspelled, limit)
+        corrector = self._get_searcher().corrector("content")
+        return corrector.suggest(misspelled, limit)
 
     def make_collector(self, limit=None):
         if limit is None:
             return AbortableCollector(UnlimitedCollector())
         else:
-            return AbortableCollector(TopCollector(limit))
+            return AbortableCollector(TopCollector(limit), limit)
+
+    def cache_info(self):
+        return self._cache.info()
 
     def search(
-        self, collector, query_str1=None, query_str2=None, itemtypes=(), highlight=False
+        self,
+        collector,
+        query_str1=None,
+        query_str2=None,
+        itemtypes=(),
+        highlight=False,
+        offset=0,
+        count=None,
+        refine=False,
     ):
+        """Return a list of (label, path, sortkey, prio, text)
+
+        The sorted hits of a query are cached, and offset/count take a page
+        of them. If refine is True and the result of a query made of the
+        leading words of query_str1 is cached, it is narrowed down instead
+        of searching the whole index again.
+        """
+
+        # Results are cached per index generation
+        generation = self._index.latest_generation()
+        query_str1 = _normalize_query(query_str1)
+        query_str2 = _normalize_query(query_str2)
+        key = (
+            generation,
+            query_str1,
+            query_str2,
+            tuple(sorted(set(itemtypes))),
+            collector.limit,
+        )
+        entry = self._cache.get(key)
+        if entry is None and refine:
+            entry = self._refine(key, collector, itemtypes)
+            if collector.aborted:
+                return []
+        if entry is None:
+            entry = self._search(
+                self._get_searcher(generation),
+                collector,
+                query_str1,
+                query_str2,
+                itemtypes,
+            )
+            if collector.aborted:
+                return []
+        self._cache.put(key, entry)
+        return self._page(generation, collector, entry, highlight, offset, count)
+
+    def _page(self, generation, collector, entry, highlight, offset, count):
+        """Take a page of a result (highlighting is done only for it)"""
+
+        results = entry.results
+        docnums = entry.docnums
+        if offset or count is not None:
+            stop = None if count is None else offset + count
+            results = results[offset:stop]
+            docnums = docnums[offset:stop]
+        if not highlight:
+            return list(results)
+
+        searcher = self._get_searcher(generation)
+        if entry.query is None:
+            stored_fields = searcher.stored_fields
+            texts = (stored_fields(docnum)["content"] for docnum in docnums)
+        else:
+            # The page is highlighted as the hits of a result of its own
+            hits = Results(searcher, entry.query, [(None, d) for d in docnums])
+            hits.fragmenter = WholeFragmenter()
+            hits.formatter = HtmlFormatter(
+                tagname="span", classname="s_match", termclass="s_term"
+            )
+            texts = _iter_highlights(hits)
+
+        page = []
+        for (item, text) in zip(results, texts):
+            if collector.aborted:
+                return []
+            page.append(item[:4] + (text,))
+        return page
+
+    def _refine(self, key, collector, itemtypes):
+        """Narrow down a complete cached result of the leading words
+
+        The docs of the query are those of its leading words that match
+        the extra words, so the other words are not matched again, and
+        their stored fields are not loaded again.
+        """
+
+        (generation, query_str1, query_str2) = key[:3]
+        if not query_str1 or not _MATCH_PLAIN_WORDS.match(query_str1):
+            return None
+        words = query_str1.split(" ")
+        if _OPERATOR_WORDS.intersection(words):
+            return None
+
+        for n in range(len(words) - 1, 0, -1):
+            base_str1 = " ".join(words[:n])
+            base = self._cache.peek((generation, base_str1) + key[2:])
+            if base is not None and base.complete:
+                break
+        else:
+            return None
+
+        # Each word of the shorter query must be in the query as the
+        # parser reads it (stop words and short words are dropped). The
+        # parsed query_str1 comes first in the query.
+        if base.query is None:
+            return None
+        try:
+            query = self._make_query(self._parser, query_str1, query_str2, itemtypes)
+        except:
+            return None
+        subqueries = _subqueries(query.subqueries[0])
+        base_subqueries = _subqueries(base.query.subqueries[0])
+        for q in base_subqueries:
+            if not isinstance(q, (Term, Variations)) or q not in subqueries:
+                return None
+
+        # Match the extra words on the docs of the base result. The content
+        # field is not scorable, so a term scores its frequency, and the
+        # scores of the extra words add up to those of the base result.
+        searcher = self._get_searcher(generation)
+        context = searcher.context()
+        scores = dict(zip(base.docnums, base.scores))
+        for q in subqueries:
+            if q in base_subqueries:
+                continue
+            scores = _match_on(searcher, context, q, scores, collector)
+            if scores is None:
+                return None
+
+        # Order the docs as the collector does: by score, then by docnum
+        items = dict(zip(base.docnums, base.results))
+        order = sorted(scores, key=lambda docnum: (-scores[docnum], docnum))
+        found = [items[docnum] + (docnum, scores[docnum]) for docnum in order]
+
+        # There are fewer of them than in the complete base result
+        return _sorted_result(found, query, True)
+
+    def _search_filter_only(self, searcher, collector, query_str2, itemtypes):
+        """Search only by itemtypes and asfilter, using the bitsets"""
+
+        bitsets = self._bitsets
+        if bitsets.generation != searcher.reader().generation():
+            raise _UnsupportedFilter()
+        if not (query_str2 or itemtypes):
+            raise _UnsupportedFilter()
+
+        andlist = []
+        if query_str2:
+            try:
+                andlist.append(self._asf_parser.parse(query_str2))
+            except:
+                return _CachedResult([], [], [], None, True)
+        if itemtypes:
+            andlist.append(Or([Term("itemtype", t) for t in itemtypes]))
+        scores = bitsets.evaluate(And(andlist))
+
+        # Which docs whoosh keeps when they are more than the limit depends
+        # on the block quality optimizations of its collector
+        limit = collector.limit
+        if limit is not None:
+            if sum(bin(bits).count("1") for bits in scores.values()) > limit:
+                raise _UnsupportedFilter()
+
+        # Order the docs as the collector does: by score, then by docnum
+        found = []
+        stored_fields = searcher.stored_fields
+        for score in sorted(scores, reverse=True):
+            for docnum in _iter_bits(scores[score]):
+                if collector.aborted:
+                    return None
+                (label, path, prio, sortkey) = stored_fields(docnum)["data"]
+                found.append((label, path, sortkey, prio, None, docnum, float(score)))
 
+        return _sorted_result(found, None, True)
+
+    def _search(self, searcher, collector, query_str1, query_str2, itemtypes):
         # rejects '*' and '?'
         if query_str1:
             for kw in (s.strip() for s in query_str1.split()):
                 if not kw.replace("*", "").replace("?", "").strip():
-                    return []
+                    return _CachedResult([], [], [], None, True)
 
         wildcard = query_str1 and any(c in query_str1 for c in "*?")
 
         parser = self._parser_wild if wildcard else self._parser
-        asf_parser = self._asf_parser
 
-        with self._index.searcher() as searcher:
-            andlist = []
+        if not query_str1 and self._bitsets:
             try:
-                if query_str1:
-                    andlist.append(parser.parse(query_str1))
-                if query_str2:
-                    andlist.append(asf_parser.parse(query_str2))
-            except:
-                return []
+                return self._search_filter_only(
+                    searcher, collector, query_str2, itemtypes
+                )
+            except _UnsupportedFilter:
+                pass
 
-            if itemtypes:
-                if len(itemtypes) > 1:
-                    andlist.append(Or([Term("itemtype", t) for t in itemtypes]))
-                else:
-                    andlist.append(Term("itemtype", itemtypes[0]))
+        try:
+            query = self._make_query(parser, query_str1, query_str2, itemtypes)
+        except:
+            return _CachedResult([], [], [], None, True)
 
-            query = And(andlist)
+        searcher.search_with_collector(query, collector)
+        hits = collector.results()
+        limit = collector.limit
+        complete = limit is None or hits.scored_length() < limit
 
-            searcher.search_with_collector(query, collector)
-            hits = collector.results()
+        if wildcard and query_str1:
+            pat = query_str1.replace("-", "").replace(" ", "")
+            wildmatch = re.compile(fnmatch.translate(pat))
 
-            if highlight:
-                hits.fragmenter = WholeFragmenter()
-                hits.formatter = HtmlFormatter(
-                    tagname="span", classname="s_match", termclass="s_term"
-                )
+        # Collect the stored data
+        found = []
+        for hit in hits:
+            if collector.aborted:
+                return None
+            (label, path, prio, sortkey) = hit["data"]
 
             if wildcard and query_str1:
-                pat = query_str1.replace("-", "").replace(" ", "")
-                wildmatch = re.compile(fnmatch.translate(pat))
+                if not wildmatch.match(sortkey):
+                    continue
 
-            # Construct a result list
-            results = []
-            for hit in hits:
-                if collector.aborted:
-                    return []
-                (label, path, prio, sortkey) = hit["data"]
+            found.append((label, path, sortkey, prio, None, hit.docnum, hit.score))
 
-                if wildcard and query_str1:
-                    if not wildmatch.match(sortkey):
-                        continue
+        return _sorted_result(found, query if query_str1 else None, complete)
 
-                if highlight:
-                    if query_str1:
-                        text = hit.highlights("content")
-                    else:
-                        text = hit["content"]
-                else:
-                    text = None
-
-                results.append((label, path, sortkey, prio, text))
+    def _make_query(self, parser, query_str1, query_str2, itemtypes):
+        andlist = []
+        if query_str1:
+            andlist.append(parser.parse(query_str1))
+        if query_str2:
+            andlist.append(self._asf_parser.parse(query_str2))
 
-            sortkey_prio_getter = itemgetter(2, 3)
-            results.sort(key=sortkey_prio_getter)
+        if itemtypes:
+            if len(itemtypes) > 1:
+                andlist.append(Or([Term("itemtype", t) for t in itemtypes]))
+            else:
+                andlist.append(Term("itemtype", itemtypes[0]))
 
-            # Return
-            return results
+        return And(andlist)
@@ -2,13 +2,34 @@
 
 import mmap
 import os
+import zlib
+from bisect import bisect_left
+from collections import namedtuple
+from heapq import heappop, heappush, heapreplace
 from operator import itemgetter
 from struct import Struct
 
+from .utils.cache import LRUCache
 from .utils.text import dec_utf8, enc_utf8, normalize_index_key
 
 _MAGIC = 0x28061691
-_DB_VERSION = 1
+_DB_VERSION = 2
+
+# Every _SPARSE_STEP-th key is kept in memory as the top level of the search
+# (version 1)
+_SPARSE_STEP = 32
+
+# Number of keys in a front-coded key block (version 2)
+_BLOCK_SIZE = 16
+
+# Number of records covered by each maximum score in SMAX (version 2)
+_SCORE_BLOCK = 64
+
+# Upper bound of the number of DAWG nodes visited by a single suggest()
+_SUGGEST_MAX_VISITS = 20000
+
+_CACHE_SIZE = 64
+_CACHE_WEIGHT = 50000  # total number of cached rows
 
 
 _struct_I = Struct(b"<I")
@@ -19,38 +40,669 @@ _struct_HBHHB = Struct(b"<HBHHB")
 _pack_HBHHB = _struct_HBHHB.pack
 _unpack_HBHHB = _struct_HBHHB.unpack
 del _struct_HBHHB
-_unpack_H = Struct(b"<H").unpack
+_struct_H = Struct(b"<H")
+_pack_H = _struct_H.pack
+_unpack_H = _struct_H.unpack
+_unpack_from_H = _struct_H.unpack_from
+del _struct_H
+_struct_II = Struct(b"<II")
+_unpack_II = _struct_II.unpack
+del _struct_II
+_struct_4sII = Struct(b"<4sII")
+_pack_4sII = _struct_4sII.pack
+_unpack_4sII = _struct_4sII.unpack
+del _struct_4sII
+_struct_BH = Struct(b"<BH")
+_pack_BH = _struct_BH.pack
+_unpack_from_BH = _struct_BH.unpack_from
+del _struct_BH
+_struct_BB = Struct(b"<BB")
+_pack_BB = _struct_BB.pack
+_unpack_from_BB = _struct_BB.unpack_from
+_RECORD_SIZE = _struct_BB.size
+del _struct_BB
 
 
 class IndexError(Exception):
     pass
 
 
+# complete: the result was not truncated by the limit
+_CachedResult = namedtuple("_CachedResult", "rows limit complete")
+
+
+def _rows_len(entry):
+    return len(entry.rows)
+
+
+def _covers(entry, limit, ranked):
+    """Whether the first rows of the cached result are the result of
+    a search with the limit"""
+    if entry.complete:
+        # more rows than the limit would have been ranked
+        return not ranked or len(entry.rows) <= limit
+    return entry.limit >= limit
+
+
+# ----
+# DAWG of the normalized keys
+#
+# node:  (nedges << 1 | final: u16),
+#        nedges * (code point: u32, offset of the target node: u32)
+#        where the edges are sorted by the code point
+
+
+_edge_structs = {}
+
+
+def _edge_struct(n):
+    st = _edge_structs.get(n)
+    if st is None:
+        st = _edge_structs[n] = Struct("<{0}I".format(2 * n))
+    return st
+
+
+def _default_maxdist(n):
+    return min(2, n // 3)
+
+
+class _Dawg(object):
+    """Reader of a DAWG section"""
+
+    def __init__(self, mm, offset):
+        self._mm = mm
+        self._base = offset
+
+    def _node(self, node):
+        mm = self._mm
+        p = self._base + node
+        (v,) = _unpack_from_H(mm, p)
+        return (v & 1, _edge_struct(v >> 1).unpack_from(mm, p + 2))
+
+    def suggest(self, word, limit, maxdist, prefix):
+        """Return the keys within maxdist edits of word,
+        ranked by (distance, length, key)
+
+        An edit is an insertion, a deletion, a substitution or a
+        transposition of adjacent characters. Keys whose first character
+        differs from that of the word are allowed only one edit, since
+        misspellings rarely involve the first letter; this keeps the
+        searched part of the DAWG small.
+
+        If prefix is True, the distance of a key is that of its closest
+        prefix, so the completions of a mistyped prefix are also found.
+        """
+
+        query = [ord(c) for c in word]
+        chars = frozenset(query)
+        n = len(query)
+        rng = range(1, n + 1)
+        results = []
+        visits = 0
+
+        # The cells of a row are capped at maxdist + 1, so the rows are
+        # the states of a Levenshtein automaton and the transitions
+        # between them can be memoized.
+        cap = maxdist + 1
+        transitions = {}
+
+        def step(row, prow, pc, best, c):
+            """Return (lower bound, row, best) after reading c"""
+            if pc not in chars:
+                (prow, pc) = (None, -1)
+            k = (row, prow, pc, c)
+            t = transitions.get(k)
+            if t is None:
+                new = [min(row[0] + 1, cap)]
+                prev = new[0]
+                for j in rng:
+                    qc = query[j - 1]
+                    prev = min(prev + 1, row[j] + 1, row[j - 1] + (qc != c), cap)
+                    if prow is not None and j > 1 and qc == pc and query[j - 2] == c:
+                        prev = min(prev, prow[j - 2] + 1)
+                    new.append(prev)
+                t = transitions[k] = (min(new), tuple(new))
+            (m, new) = t
+            if not prefix:
+                return (m, new, None)
+            best = min(best, new[n])
+            if m >= best:
+                return (best, None, best)
+            return (m, new, best)
+
+        # Best-first traversal. The entries are
+        # (lower bound of the distance, depth, key, is_node, node,
+        #  row, parent's row, best, maxdist).
+        # A row is a row of the DP table, i.e. a state of the Levenshtein
+        # automaton. best is the distance of the closest prefix seen so
+        # far, used in the prefix mode.
+        row0 = tuple(min(j, cap) for j in range(n + 1))
+        heap = [(0, 0, "", 1, 0, row0, None, n, maxdist)]
+        while heap and len(results) < limit and visits < _SUGGEST_MAX_VISITS:
+            (lb, depth, key, is_node, node, row, prow, best, md) = heappop(heap)
+            if not is_node:
+                results.append(key)
+                continue
+
+            visits += 1
+            (final, edges) = self._node(node)
+            if final:
+                dist = best if prefix else row[n]
+                if dist <= md:
+                    heappush(heap, (dist, depth, key, 0, 0, None, None, 0, 0))
+
+            depth_c = depth + 1
+            if row is None:
+                # every completion is a match and can't get closer
+                for i in range(0, len(edges), 2):
+                    key_c = key + chr(edges[i])
+                    entry = (lb, depth_c, key_c, 1, edges[i + 1], None, None, best, md)
+                    heappush(heap, entry)
+                continue
+
+            # All the characters absent from the query make the same
+            # transition, so it is computed at most once per node.
+            pc = ord(key[-1]) if key else -1
+            other = None
+            for i in range(0, len(edges), 2):
+                c = edges[i]
+                if c in chars:
+                    (lb_c, new, best_c) = step(row, prow, pc, best, c)
+                else:
+                    if other is None:
+                        other = step(row, prow, pc, best, -1)
+                    (lb_c, new, best_c) = other
+                md_c = md if depth or c == query[0] else min(md, 1)
+                if lb_c <= md_c:
+                    (key_c, node_c) = (key + chr(c), edges[i + 1])
+                    entry = (lb_c, depth_c, key_c, 1, node_c, new, row, best_c, md_c)
+                    heappush(heap, entry)
+
+        return results
+
+
+class _DawgBuilder(object):
+    """Build a minimal DAWG from keys added in the sorted order
+    (Daciuk et al., 2000)"""
+
+    class _Node(object):
+        __slots__ = ("final", "edges")
+
+        def __init__(self):
+            self.final = 0
+            self.edges = {}
+
+    def __init__(self):
+        self._root = self._Node()
+        self._register = {}
+        self._unchecked = []
+        self._prev = ""
+
+    def add(self, word):
+        prev = self._prev
+        if word == prev:
+            return
+        common = 0
+        limit = min(len(word), len(prev))
+        while common < limit and word[common] == prev[common]:
+            common += 1
+        self._minimize(common)
+
+        node = self._unchecked[-1][2] if self._unchecked else self._root
+        for c in word[common:]:
+            child = self._Node()
+            node.edges[c] = child
+            self._unchecked.append((node, c, child))
+            node = child
+        node.final = 1
+        self._prev = word
+
+    def _minimize(self, down_to):
+        unchecked = self._unchecked
+        register = self._register
+        while len(unchecked) > down_to:
+            (parent, c, child) = unchecked.pop()
+            sig = (child.final, tuple(child.edges.items()))
+            node = register.get(sig)
+            if node is None:
+                register[sig] = child
+            else:
+                parent.edges[c] = node
+
+    def serialize(self):
+        self._minimize(0)
+        self._register = None
+
+        # assign the offsets; the root comes first
+        offsets = {}
+        order = []
+        size = 0
+        stack = [self._root]
+        while stack:
+            node = stack.pop()
+            if id(node) in offsets:
+                continue
+            offsets[id(node)] = size
+            order.append(node)
+            size += 2 + 8 * len(node.edges)
+            stack.extend(reversed(list(node.edges.values())))
+
+        chunks = []
+        for node in order:
+            edges = []
+            for (c, child) in sorted(node.edges.items()):
+                edges.append(ord(c))
+                edges.append(offsets[id(child)])
+            chunks.append(_pack_H(len(node.edges) << 1 | node.final))
+            chunks.append(_edge_struct(len(node.edges)).pack(*edges))
+        return b"".join(chunks)
+
+
+class _ReaderV1(object):
+    """Reader for the version 1 format
+
+    header:   magic, version, num, offset of the pointers (u32 each)
+    records:  (lenplain: u16, lentypecode: u8, lenlabel: u16, lenpath: u16,
+               prio: u8), plain, typecode, label, path
+    pointers: num * u32, sorted by (plain, prio)
+    """
+
+    dawg = None
+    has_scores = False
+
+    def __init__(self, mm):
+        self._mm = mm
+        file_size = len(mm)
+        if file_size < 4 * 4:
+            raise IndexError("too small")
+
+        (self.num, self._first) = _unpack_II(mm[8:16])
+        if self.num == 0 or self._first == 0:
+            raise IndexError("does not contain any data")
+        if file_size != self._first + self.num * 4:
+            raise IndexError("broken")
+
+        self._sparse = [self._key_at(i) for i in range(0, self.num, _SPARSE_STEP)]
+
+    def _key_at(self, i):
+        """Return the UTF-8 encoded normalized key of the i-th record"""
+        mm = self._mm
+        p = self._first + 4 * i
+        (p,) = _unpack_I(mm[p : p + 4])
+        (lenp,) = _unpack_H(mm[p : p + 2])
+        return mm[p + 8 : p + 8 + lenp]
+
+    def bisect(self, key):
+        """Return the index of the first record whose key is >= key"""
+
+        j = bisect_left(self._sparse, key)
+        a = max(0, (j - 1) * _SPARSE_STEP + 1)
+        b = min(self.num, j * _SPARSE_STEP)
+        key_at = self._key_at
+        while a < b:
+            c = (a + b) // 2
+            if key_at(c) < key:
+                a = c + 1
+            else:
+                b = c
+        return a
+
+    def _record(self, i):
+        """Return the offset of the data and the header of the i-th record"""
+        mm = self._mm
+        p = self._first + 4 * i
+        (p,) = _unpack_I(mm[p : p + 4])
+        return (p + 8,) + _unpack_HBHHB(mm[p : p + 8])
+
+    def key(self, i):
+        return self._key_at(i)
+
+    def keys(self, indices):
+        """Return the UTF-8 encoded keys of the records at the indices"""
+        return [self._key_at(i) for i in indices]
+
+    def label(self, i):
+        (p, lenplain, lentypecode, lenlabel, _, _) = self._record(i)
+        p += lenplain + lentypecode
+        return dec_utf8(self._mm[p : p + lenlabel])
+
+    def path(self, i):
+        (p, lenplain, lentypecode, lenlabel, lenpath, _) = self._record(i)
+        p += lenplain + lentypecode + lenlabel
+        return dec_utf8(self._mm[p : p + lenpath])
+
+    def prio(self, i):
+        return self._record(i)[5]
+
+
+class _ReaderV2(object):
+    """Reader for the version 2 format
+
+    header:   magic, version, num, number of sections (u32 each),
+              and (tag: 4s, offset: u32, size: u32) for each section
+    sections:
+      KIDX:   offset of each key block in KBLK (u32)
+      KBLK:   blocks of _BLOCK_SIZE front-coded keys sorted by (key, prio);
+              each key is (shared: u8, lensuffix: u16, suffix)
+      RECS:   num * (typecode: u8, prio: u8)
+      TYPE:   interned typecodes joined by '\\0'
+      SIDX:   offset of each string block in SBLK, and the size of SBLK
+              (u32 each)
+      SBLK:   for each block of _BLOCK_SIZE records, their labels then
+              their paths, joined by '\\0' and compressed by raw deflate
+      SCOR:   num * (score: u8)
+      SMAX:   maximum score of every _SCORE_BLOCK records (u8)
+      DAWG:   (optional) DAWG of the unique keys
+    """
+
+    def __init__(self, mm):
+        self._mm = mm
+        file_size = len(mm)
+        if file_size < 4 * 4:
+            raise IndexError("too small")
+
+        (self.num, nsections) = _unpack_II(mm[8:16])
+        if self.num == 0:
+            raise IndexError("does not contain any data")
+
+        sections = {}
+        p = 16
+        for _ in range(nsections):
+            (tag, offset, size) = _unpack_4sII(mm[p : p + 12])
+            if offset + size > file_size:
+                raise IndexError("broken")
+            sections[tag] = (offset, size)
+            p += 12
+        try:
+            (kidx, kidx_size) = sections[b"KIDX"]
+            (self._kblk, _) = sections[b"KBLK"]
+            (self._recs, recs_size) = sections[b"RECS"]
+            (types, types_size) = sections[b"TYPE"]
+            (sidx, sidx_size) = sections[b"SIDX"]
+            (self._sblk, sblk_size) = sections[b"SBLK"]
+        except KeyError:
+            raise IndexError("broken")
+        if b"DAWG" in sections:
+            self.dawg = _Dawg(mm, sections[b"DAWG"][0])
+        else:
+            self.dawg = None
+
+        nblocks = (self.num + _BLOCK_SIZE - 1) // _BLOCK_SIZE
+        if (
+            kidx_size != nblocks * 4
+            or recs_size != self.num * _RECORD_SIZE
+            or sidx_size != (nblocks + 1) * 4
+        ):
+            raise IndexError("broken")
+
+        self.has_scores = b"SCOR" in sections and b"SMAX" in sections
+        if self.has_scores:
+            (self._scor, scor_size) = sections[b"SCOR"]
+            (smax, smax_size) = sections[b"SMAX"]
+            nsblocks = (self.num + _SCORE_BLOCK - 1) // _SCORE_BLOCK
+            if scor_size != self.num or smax_size != nsblocks:
+                raise IndexError("broken")
+            self._score_max = mm[smax : smax + smax_size]
+
+        self._typecodes = tuple(
+            dec_utf8(t) for t in mm[types : types + types_size].split(b"\0")
+        )
+        self._block_offsets = Struct("<{0}I".format(nblocks)).unpack(
+            mm[kidx : kidx + kidx_size]
+        )
+        self._string_offsets = Struct("<{0}I".format(nblocks + 1)).unpack(
+            mm[sidx : sidx + sidx_size]
+        )
+        if self._string_offsets[-1] != sblk_size:
+            raise IndexError("broken")
+
+        # the first key of each block (its shared length is always 0)
+        firsts = []
+        kblk = self._kblk
+        for offset in self._block_offsets:
+            p = kblk + offset
+            (_, lensuffix) = _unpack_from_BH(mm, p)
+            firsts.append(mm[p + 3 : p + 3 + lensuffix])
+        self._firsts = firsts
+        self._last_block = (None, None)
+        self._last_strings = (None, None)
+
+    def _block_keys(self, b):
+        """Decode the keys in the b-th block"""
+
+        mm = self._mm
+        p = self._kblk + self._block_offsets[b]
+        n = min(_BLOCK_SIZE, self.num - b * _BLOCK_SIZE)
+        keys = [None] * n
+        key = b""
+        for i in range(n):
+            (shared, lensuffix) = _unpack_from_BH(mm, p)
+            p += 3
+            key = key[:shared] + mm[p : p + lensuffix]
+            p += lensuffix
+            keys[i] = key
+        return keys
+
+    def _strings(self, b):
+        """Return the labels then the paths of the b-th block"""
+
+        # the last decompressed block is kept, since a label and a path
+        # are usually read together
+        last = self._last_strings
+        if last[0] != b:
+            p = self._sblk
+            (start, end) = self._string_offsets[b : b + 2]
+            data = zlib.decompress(self._mm[p + start : p + end], -15)
+            last = self._last_strings = (b, data.split(b"\0"))
+        return last[1]
+
+    def bisect(self, key):
+        """Return the index of the first record whose key is >= key"""
+
+        j = bisect_left(self._firsts, key)
+        if j == 0:
+            return 0
+
+        # scan the preceding block, decoding only as far as needed
+        mm = self._mm
+        b = j - 1
+        p = self._kblk + self._block_offsets[b]
+        n = min(_BLOCK_SIZE, self.num - b * _BLOCK_SIZE)
+        k = b""
+        for i in range(n):
+            (shared, lensuffix) = _unpack_from_BH(mm, p)
+            p += 3
+            k = k[:shared] + mm[p : p + lensuffix]
+            p += lensuffix
+            if k >= key:
+                return b * _BLOCK_SIZE + i
+        return b * _BLOCK_SIZE + n
+
+    def _record(self, i):
+        """Return (typecode, prio) of the i-th record"""
+        return _unpack_from_BB(self._mm, self._recs + i * _RECORD_SIZE)
+
+    def key(self, i):
+        # the last decoded block is kept for sequential accesses
+        (b, k) = divmod(i, _BLOCK_SIZE)
+        last = self._last_block
+        if last[0] != b:
+            last = self._last_block = (b, self._block_keys(b))
+        return last[1][k]
+
+    def keys(self, indices):
+        """Return the UTF-8 encoded keys of the records at the indices"""
+
+        blocks = {}
+        keys = []
+        for i in indices:
+            (b, k) = divmod(i, _BLOCK_SIZE)
+            block = blocks.get(b)
+            if block is None:
+                block = blocks[b] = self._block_keys(b)
+            keys.append(block[k])
+        return keys
+
+    def label(self, i):
+        (b, k) = divmod(i, _BLOCK_SIZE)
+        return dec_utf8(self._strings(b)[k])
+
+    def path(self, i):
+        (b, k) = divmod(i, _BLOCK_SIZE)
+        strings = self._strings(b)
+        return dec_utf8(strings[len(strings) // 2 + k])
+
+    def prio(self, i):
+        return self._record(i)[1]
+
+    def top(self, start, stop, k):
+        """Return the indices of the k records with the highest scores
+        in [start, stop), ordered by (-score, index)"""
+
+        if k <= 0 or start >= stop:
+            return []
+
+        # Visit the score blocks from the one with the highest maximum
+        # and stop as soon as no remaining block can enter the top k.
+        mm = self._mm
+        scor = self._scor
+        score_max = self._score_max
+        blocks = sorted(
+            range(start // _SCORE_BLOCK, (stop - 1) // _SCORE_BLOCK + 1),
+            key=lambda b: -score_max[b],
+        )
+        heap = []  # min-heap of (score, -index)
+        for b in blocks:
+            if len(heap) == k:
+                (s, i) = heap[0]
+                m = score_max[b]
+                if m < s or (m == s and b * _SCORE_BLOCK > -i):
+                    break
+            lo = max(start, b * _SCORE_BLOCK)
+            hi = min(stop, (b + 1) * _SCORE_BLOCK)
+            for (i, s) in enumerate(mm[scor + lo : scor + hi], lo):
+                if len(heap) < k:
+                    heappush(heap, (s, -i))
+                elif (s, -i) > heap[0]:
+                    heapreplace(heap, (s, -i))
+
+        heap.sort(reverse=True)
+        return [-i for (_, i) in heap]
+
+
+class _Row(object):
+    """A search result (label, path, sortkey, prio, None)
+    whose fields are decoded on access"""
+
+    __slots__ = ("_reader", "_index", "_key")
+
+    def __init__(self, reader, index, key):
+        self._reader = reader
+        self._index = index
+        self._key = key
+
+    def _plain(self):
+        key = self._key
+        if key is None:
+            key = self._key = self._reader.key(self._index)
+        return dec_utf8(key)
+
+    def __len__(self):
+        return 5
+
+    def __getitem__(self, n):
+        if n == 0:
+            return self._reader.label(self._index)
+        elif n == 1:
+            return self._reader.path(self._index)
+        elif n == 2:
+            return self._plain()
+        elif n == 3:
+            return self._reader.prio(self._index)
+        return tuple(self)[n]
+
+    def __iter__(self):
+        reader = self._reader
+        i = self._index
+        yield reader.label(i)
+        yield reader.path(i)
+        yield self._plain()
+        yield reader.prio(i)
+        yield None
+
+    def __eq__(self, other):
+        if isinstance(other, (tuple, _Row)):
+            return tuple(self) == tuple(other)
+        return NotImplemented
+
+    def __hash__(self):
+        return hash(tuple(self))
+
+    def __repr__(self):
+        return repr(tuple(self))
+
+
+class _Results(object):
+    """Sequence of the search results backed by the index,
+    which are decoded on access"""
+
+    __slots__ = ("_reader", "_indices", "_keys")
+
+    def __init__(self, reader, indices, keys=None):
+        self._reader = reader
+        self._indices = indices
+        self._keys = keys
+
+    def keys(self):
+        """Return the UTF-8 encoded keys of the rows"""
+        if self._keys is None:
+            self._keys = self._reader.keys(self._indices)
+        return self._keys
+
+    def __len__(self):
+        return len(self._indices)
+
+    def __getitem__(self, i):
+        keys = self._keys
+        key = keys[i] if keys is not None else None
+        if isinstance(i, slice):
+            return _Results(self._reader, self._indices[i], key)
+        return _Row(self._reader, self._indices[i], key)
+
+    def __iter__(self):
+        reader = self._reader
+        keys = self._keys
+        if keys is None:
+            for i in self._indices:
+                yield _Row(reader, i, None)
+        else:
+            for (i, key) in zip(self._indices, keys):
+                yield _Row(reader, i, key)
+
+
 class Searcher(object):
     def __init__(self, index_path):
         self._mm = None
+        self._cache = LRUCache(_CACHE_SIZE, _CACHE_WEIGHT, weigher=_rows_len)
         try:
             with open(index_path, "rb") as f:
                 self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
         except ValueError:
             raise IndexError("broken")
 
-        read = self._mm.read
-        file_size = len(self._mm)
-
-        if file_size < 4 * 4:
+        mm = self._mm
+        if len(mm) < 4 * 2:
             raise IndexError("too small")
-        if _MAGIC != _unpack_I(read(4))[0]:
+        (magic, version) = _unpack_II(mm[0:8])
+        if _MAGIC != magic:
             raise IndexError("broken")
-        if _DB_VERSION != _unpack_I(read(4))[0]:
-            raise IndexError("cannot use this version of index")
 
-        (self._num,) = _unpack_I(read(4))
-        (self._first,) = _unpack_I(read(4))
-        if self._num == 0 or self._first == 0:
-            raise IndexError("does not contain any data")
-        if file_size != self._first + self._num * 4:
-            raise IndexError("broken")
+        if version == 2:
+            self._reader = _ReaderV2(mm)
+        elif version == 1:
+            self._reader = _ReaderV1(mm)
+        else:
+            raise IndexError("cannot use this version of index")
 
     def __enter__(self):
         return self
@@ -68,78 +720,127 @@ class Searcher(object):
         if self._mm:
             self._mm.close()
             self._mm = None
+        self._cache.clear()
+
+    def cache_info(self):
+        return self._cache.info()
+
+    def search(self, key, limit, ranked=False):
+        """Return a sequence of (label, path, sortkey, prio, None)
+        of the items starting with the key
+
+        The items are in the (sortkey, prio) order. If ranked is True, the
+        index has scores and more items than the limit start with the key,
+        the exact matches come first and the others are the ones with the
+        highest scores, in the descending order.
+
+        The rows are decoded on access and must not be used after the
+        searcher is closed.
+        """
 
-    def search(self, key, limit):
         key = normalize_index_key(key)
         if not key:
             return []
 
-        mm = self._mm
-        num = self._num
-        first = self._first
-
-        def bisect_start(key):
-            (a, b) = (0, num)
-            while a != b:
-                c = (a + b) // 2
-                p = first + 4 * c
-                (p,) = _unpack_I(mm[p : p + 4])
-                (lenp,) = _unpack_H(mm[p : p + 2])
-                p += 8
-                plain = dec_utf8(mm[p : p + lenp])
-                if key > plain:
-                    a = c + 1
-                else:
-                    b = c
-            return a
-
-        def bisect_end(key, start):
-            (a, b) = (start, num)
-            while a != b:
-                c = (a + b) // 2
-                p = first + 4 * c
-                (p,) = _unpack_I(mm[p : p + 4])
-                (lenp,) = _unpack_H(mm[p : p + 2])
-                p += 8
-                plain = dec_utf8(mm[p : p + lenp])
-                if key < plain and not plain.startswith(key):
-                    b = c
-                else:
-                    a = c + 1
-            return a
+        ranked = ranked and self._reader.has_scores
+        entry = self._lookup(key, limit, ranked)
+        if entry is None:
+            entry = self._search(key, limit, ranked)
+            self._cache.put((key, ranked), entry)
+        return entry.rows[:limit]
 
-        start = bisect_start(key)
-        end = bisect_end(key, start)
+    def _lookup(self, key, limit, ranked):
+        """Find the result in the cache, or make it from the complete
+        result of a shorter prefix"""
 
-        if start == num:
-            return []
+        cache = self._cache
+        entry = cache.get((key, ranked))
+        if entry is not None and _covers(entry, limit, ranked):
+            return entry
+
+        for i in range(len(key) - 1, 0, -1):
+            base = cache.peek((key[:i], ranked))
+            if base is not None and base.complete:
+                entry = self._refine(base, key)
+                if not _covers(entry, limit, ranked):
+                    return None
+                cache.put((key, ranked), entry)
+                return entry
+
+        return None
+
+    def _refine(self, base, key):
+        # The complete result is in the index order, and so are the rows
+        # of the key, which are a part of it
+        rows = base.rows
+        key_e = enc_utf8(key)
+        matches = [
+            (i, k) for (i, k) in zip(rows._indices, rows.keys()) if k.startswith(key_e)
+        ]
+        indices = [i for (i, _) in matches]
+        keys = [k for (_, k) in matches]
+        return _CachedResult(_Results(self._reader, indices, keys), base.limit, True)
+
+    def _search(self, key, limit, ranked):
+        # The keys are compared as raw UTF-8 bytes, which preserves the
+        # code point order. '\xff' never appears in UTF-8, so every key
+        # starting with key_e sorts before key_e + b'\xff'.
+        reader = self._reader
+        key_e = enc_utf8(key)
+        start = reader.bisect(key_e)
+        end = reader.bisect(key_e + b"\xff")
+        complete = end - start <= limit
 
-        (seek, read) = (mm.seek, mm.read)
-        ret = [None] * min(limit, end - start)
-        p = first + 4 * start
-        seek(_unpack_I(mm[p : p + 4])[0])
-        for i in range(len(ret)):
-            (lenplain, lentypecode, lenlabel, lenpath, prio) = _unpack_HBHHB(read(8))
-            data = read(lenplain + lentypecode + lenlabel + lenpath)
-            plain = dec_utf8(data[:lenplain])
-            x1 = lenplain + lentypecode
-            x2 = x1 + lenlabel
-            # typecode = data[lenplain:x1]
-            label = dec_utf8(data[x1:x2])
-            path = dec_utf8(data[-lenpath:])
-            ret[i] = (label, path, plain, prio, None)
+        if ranked and not complete:
+            # '\0' never appears in the normalized keys
+            exact = min(reader.bisect(key_e + b"\0"), start + limit)
+            indices = list(range(start, exact))
+            indices.extend(reader.top(exact, end, limit - len(indices)))
+        else:
+            indices = range(start, min(end, start + limit))
 
-        return ret
+        rows = _Results(reader, indices)
+        return _CachedResult(rows, limit, complete)
+
+    def has_suggest(self):
+        return self._reader.dawg is not None
+
+    def suggest(self, key, limit=5, maxdist=None, prefix=False):
+        """Return a list of normalized keys similar to the key
+
+        The index must have been built with fuzzy=True.
+        maxdist defaults to 0, 1 or 2 depending on the length of the key.
+        """
+
+        dawg = self._reader.dawg
+        if dawg is None:
+            raise IndexError("does not support suggestions")
+        key = normalize_index_key(key)
+        if not key:
+            return []
+        if maxdist is None:
+            maxdist = _default_maxdist(len(key))
+        return dawg.suggest(key, limit, maxdist, prefix)
 
 
 class Maker(object):
-    def __init__(self, path, tmp_path):
+    """Index writer
+
+    version 1 is the format of the older releases, which has neither the
+    scores nor the DAWG of fuzzy=True.
+    """
+
+    def __init__(self, path, tmp_path, fuzzy=False, version=_DB_VERSION):
+        if version not in (1, 2):
+            raise ValueError("unknown version: {0}".format(version))
+        self._fuzzy = fuzzy
+        self._version = version
         self._items = []
         self._path = path
         self._tmp_path = tmp_path
         self._tmpf = open(tmp_path, "wb")
 
-    def add_item(self, plain, typecode, label, path, prio):
+    def add_item(self, plain, typecode, label, path, prio, score=0):
         plain_n = normalize_index_key(plain)
         plain_e = enc_utf8(plain_n)
         typecode_e = enc_utf8(typecode)
@@ -159,7 +860,7 @@ class Maker(object):
         tmpf = self._tmpf
         pos = tmpf.tell()
         tmpf.write(data)
-        self._items.append((pos, plain_n, prio))
+        self._items.append((pos, plain_n, prio, score))
 
     def abort(self):
         if self._tmpf:
@@ -177,51 +878,159 @@ class Maker(object):
 
         for item in self._items:
             tmpf.write(_pack_I(item[0]))
+        scores = bytes(item[3] for item in self._items)
         del self._items
 
         self._tmpf.close()
         self._tmpf = None
         try:
-            self._generate(num, first)
+            self._generate(num, first, scores)
         except:
             raise
         finally:
             os.remove(self._tmp_path)
 
-    def _generate(self, num, first):
+    def _generate(self, num, first, scores):
         try:
             with open(self._tmp_path, "rb") as f:
                 mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
         except ValueError:
             raise IndexError("index is broken")
 
-        if len(mm) != first + num * 4:
-            raise IndexError("index is broken")
+        try:
+            if len(mm) != first + num * 4:
+                raise IndexError("index is broken")
+            if self._version == 1:
+                self._generate_v1(mm, num, first)
+            else:
+                self._generate_v2(mm, num, first, scores)
+        finally:
+            mm.close()
+
+    def _generate_v1(self, mm, num, first):
+        with open(self._path, "wb") as dstf:
+            write = dstf.write
+            write(_pack_I(_MAGIC))
+            write(_pack_I(1))
+            write(_pack_I(num))
+            write(_pack_I(first + 4 * 4))
+
+            new_xlist = []
+            p = first
+            newx = 4 * 4
+            for i in range(num):
+                new_xlist.append(newx)
+                x = _unpack_I(mm[p : p + 4])[0]
+                (lenplain, lentypecode, lenlabel, lenpath, prio) = _unpack_HBHHB(
+                    mm[x : x + 8]
+                )
+                datasize = lenplain + lentypecode + lenlabel + lenpath
+                data = mm[x : (x + 8 + datasize)]
+                write(data)
+                p += 4
+                newx += 8 + datasize
 
-        dstf = open(self._path, "wb")
+            for x in new_xlist:
+                write(_pack_I(x))
 
-        write = dstf.write
-        write(_pack_I(_MAGIC))
-        write(_pack_I(_DB_VERSION))
-        write(_pack_I(num))
-        write(_pack_I(first + 4 * 4))
+    def _generate_v2(self, mm, num, first, scores):
+        kidx = []
+        kblk = []
+        kblk_size = 0
+        recs = []
+        typecodes = {}
+        dawg = _DawgBuilder() if self._fuzzy else None
+        sidx = []
+        sblk = []
+        sblk_size = 0
+        labels = []
+        paths = []
 
-        new_xlist = []
+        def flush_strings():
+            data = b"\0".join(labels + paths)
+            compressor = zlib.compressobj(9, zlib.DEFLATED, -15)
+            data = compressor.compress(data) + compressor.flush()
+            sidx.append(_pack_I(sblk_size))
+            sblk.append(data)
+            del labels[:], paths[:]
+            return len(data)
+
+        prev = b""
         p = first
-        newx = 4 * 4
         for i in range(num):
-            new_xlist.append(newx)
             x = _unpack_I(mm[p : p + 4])[0]
-            sizes = mm[x : (x + 8)]
-            (lenplain, lentypecode, lenlabel, lenpath, prio) = _unpack_HBHHB(sizes)
-            datasize = lenplain + lentypecode + lenlabel + lenpath
-            data = mm[x : (x + 8 + datasize)]
-            write(data)
             p += 4
-            newx += 8 + datasize
+            (lenplain, lentypecode, lenlabel, lenpath, prio) = _unpack_HBHHB(
+                mm[x : x + 8]
+            )
+            x += 8
+            plain = mm[x : x + lenplain]
+            x += lenplain
+            typecode = mm[x : x + lentypecode]
+            x += lentypecode
+            label = mm[x : x + lenlabel]
+            x += lenlabel
+            path = mm[x : x + lenpath]
 
-        for x in new_xlist:
-            write(_pack_I(x))
+            # front-coded key
+            if i % _BLOCK_SIZE == 0:
+                kidx.append(_pack_I(kblk_size))
+                shared = 0
+            else:
+                limit = min(len(prev), len(plain), 255)
+                shared = 0
+                while shared < limit and prev[shared] == plain[shared]:
+                    shared += 1
+            suffix = plain[shared:]
+            kblk.append(_pack_BH(shared, len(suffix)))
+            kblk.append(suffix)
+            kblk_size += 3 + len(suffix)
+            if dawg is not None and plain != prev:
+                dawg.add(dec_utf8(plain))
+            prev = plain
+
+            # record
+            if typecode not in typecodes:
+                if len(typecodes) > 255:
+                    raise IndexError("too many typecodes")
+                typecodes[typecode] = len(typecodes)
+            recs.append(_pack_BB(typecodes[typecode], prio))
+
+            # strings, compressed together with those of the same block
+            if b"\0" in label or b"\0" in path:
+                raise IndexError("a label or a path contains NUL")
+            labels.append(label)
+            paths.append(path)
+            if len(labels) == _BLOCK_SIZE or i == num - 1:
+                sblk_size += flush_strings()
+        sidx.append(_pack_I(sblk_size))
+
+        types = sorted(typecodes, key=typecodes.get)
+        smax = bytes(
+            max(scores[i : i + _SCORE_BLOCK]) for i in range(0, num, _SCORE_BLOCK)
+        )
+        sections = (
+            (b"KIDX", b"".join(kidx)),
+            (b"KBLK", b"".join(kblk)),
+            (b"RECS", b"".join(recs)),
+            (b"TYPE", b"\0".join(types)),
+            (b"SIDX", b"".join(sidx)),
+            (b"SBLK", b"".join(sblk)),
+            (b"SCOR", scores),
+            (b"SMAX", smax),
+        )
+        if dawg is not None:
+            sections += ((b"DAWG", dawg.serialize()),)
 
-        dstf.close()
-        mm.close()
+        with open(self._path, "wb") as dstf:
+            write = dstf.write
+            write(_pack_I(_MAGIC))
+            write(_pack_I(_DB_VERSION))
+            write(_pack_I(num))
+            write(_pack_I(len(sections)))
+            offset = 4 * 4 + 12 * len(sections)
+            for (tag, data) in sections:
+                write(_pack_4sII(tag, offset, len(data)))
+                offset += len(data)
+            for (tag, data) in sections:
+                write(data)
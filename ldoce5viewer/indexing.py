@@ -0,0 +1,281 @@
+"""Stages of building the index files from the LDOCE5 archives
+
+They are run by the indexing thread of the GUI and by the benchmarks.
+"""
+
+import os
+import pickle
+from html import escape
+from struct import Struct
+
+import lxml.etree as et
+
+from . import fulltext, incremental
+from .ldoce5 import filemap, idmreader
+from .ldoce5.extract import get_item_score, iterparse_entry_items
+
+_struct_I = Struct(b"<I")
+_pack_I = _struct_I.pack
+_unpack_I = _struct_I.unpack
+
+
+class AbortIndexing(Exception):
+    pass
+
+
+class Progress(object):
+    """Passes the messages of the stages on, and stops them when aborted"""
+
+    def __init__(self, message=None):
+        self._message = message
+        self._abort = False
+
+    def message(self, s):
+        if self._message:
+            self._message(s)
+
+    def abort(self):
+        self._abort = True
+
+    def check(self):
+        if self._abort:
+            raise AbortIndexing()
+
+
+class ScanTempFile(object):
+    def __init__(self, path):
+        self._path = path
+        self._n = 0
+        self._f = open(path, "w+b")
+
+    def append(self, item):
+        data = pickle.dumps(item)
+        f = self._f
+        f.write(_pack_I(len(data)))
+        f.write(data)
+        self._n += 1
+
+    def iter_items(self):
+        f = self._f
+        f.seek(0)
+        for _ in range(self._n):
+            (lendata,) = _unpack_I(f.read(4))
+            data = f.read(lendata)
+            yield pickle.loads(data)
+
+    def __len__(self):
+        return self._n
+
+    def remove(self):
+        self._f.close()
+        try:
+            os.remove(self._path)
+        except EnvironmentError:
+            pass
+
+
+def make_filemap(srcdir, filemap_path, progress):
+    """Build the file-location lookup table and return the number of files"""
+
+    progress.message("Building the file-location lookup table...")
+    count = 0
+    with open(filemap_path, "w+b") as f:
+        maker = filemap.FilemapMaker(f)
+        for archive_name in idmreader.get_archive_names():
+            progress.message("Analyzing '{0}'...".format(archive_name))
+            file_iter = filemap.list_files(srcdir, archive_name)
+            for (name, location) in file_iter:
+                progress.check()
+                maker.add(archive_name, name, location)
+                count += 1
+
+        progress.message("Finalizing...")
+        maker.finalize()
+    return count
+
+
+def scan_entries(srcdir, scan_temp, progress):
+    """Add the items of the entries to scan_temp
+
+    Returns (the number of items, {word: set of its variations}).
+    """
+
+    variations = {}
+    progress.message("Scanning entry files...")
+    files = idmreader.list_files(srcdir, "fs")
+    count = 0
+    with idmreader.ArchiveReader(srcdir, "fs") as archive_reader:
+        for (dirs, name, location) in files:
+            progress.check()
+
+            (items, var) = iterparse_entry_items(archive_reader.read(location))
+
+            for k in var:
+                v = var[k]
+                if not v:
+                    continue
+                if k not in variations:
+                    variations[k] = set()
+                variations[k].update(v)
+
+            for (itemtype, label, path, content, sortkey, asfilter, prio) in items:
+                count += 1
+                if count % 10000 == 0:
+                    progress.message("{0} items found".format(count))
+
+                if itemtype == "hm":
+                    words = content.split()
+                    for w in words:
+                        if "-" in w:
+                            content += " " + w.replace("-", "")
+
+                scan_temp.append(
+                    (itemtype, label, path, content, sortkey, asfilter, prio)
+                )
+
+    progress.message("{0} items were found.".format(count))
+    return (count, variations)
+
+
+def make_variations(variations_path, variations, progress):
+    """Write the word variation database and return the number of words"""
+
+    progress.message("Making the word variation database...")
+    with open(variations_path, "w+b") as f:
+        var_writer = fulltext.VariationsWriter(f)
+        for k in variations:
+            v = variations[k]
+            var_writer.add(k, v)
+
+        progress.message("Finalizing...")
+        var_writer.finalize()
+        progress.message("Done.")
+    return len(variations)
+
+
+def scan_activator(srcdir, scan_temp, progress):
+    """Add the items of the activator to scan_temp and return their number"""
+
+    progress.message("Scanning language-activator files...")
+    count = 0
+
+    # activator sections
+    sections = {}
+    files = idmreader.list_files(srcdir, "activator_section")
+    with idmreader.ArchiveReader(srcdir, "activator_section") as cr:
+        for (dirs, name, location) in files:
+            progress.check()
+
+            data = cr.read(location)
+            root = et.fromstring(data)
+            sid = root.get("id")
+            sections[sid] = []
+            for exp in root.iterfind("Exponent"):
+                eid = exp.get("id")
+                plain = "".join(exp.find("EXP").itertext()).strip()
+                sections[sid].append((eid, plain))
+
+    # activator concepts
+    files = idmreader.list_files(srcdir, "activator_concept")
+    exponents = []
+    with idmreader.ArchiveReader(srcdir, "activator_concept") as cr:
+        for (dirs, name, location) in files:
+            progress.check()
+
+            root = et.fromstring(cr.read(location))
+            cid = root.get("id")
+            hwd = root.find("HWD").text
+            first_sid = root.find("Section").get("id")
+            for h in hwd.split("/"):
+                scan_temp.append(
+                    (
+                        "ac",
+                        "<a><c>{0}</c></a>".format(escape(h)),
+                        "/activator/{0}/{1}".format(cid, first_sid),
+                        h,
+                        h,
+                        "",
+                        50,
+                    )
+                )
+                count += 1
+
+            for sno, section in enumerate(root.iterfind("Section")):
+                sid = section.get("id")
+                for (eid, plain) in sections[sid]:
+                    exponents.append((plain, hwd, cid, sid, eid, sno))
+
+    for (plain, hwd, cid, sid, eid, sno) in exponents:
+        progress.check()
+
+        keywords = set([plain])
+        # if plain in phrase_keys:
+        #    keywords.update(phrase_keys[plain])
+        for keyword in keywords:
+            scan_temp.append(
+                (
+                    "ae",
+                    "<a><e>{0}</e> (<c>{1}<s>{2}</s></c>)</a>".format(
+                        escape(keyword), escape(hwd), sno + 1
+                    ),
+                    "/activator/{0}/{1}#{2}".format(cid, sid, eid),
+                    keyword,
+                    keyword,
+                    "",
+                    51,
+                )
+            )
+            count += 1
+
+    progress.message("Done.")
+    return count
+
+
+def make_incremental(incremental_path, tmp_path, items, progress):
+    """Build the incremental search index from the headwords, phrases and
+    activator items, and return their number"""
+
+    progress.message("Building the incremental search index...")
+    incr_maker = incremental.Maker(incremental_path, tmp_path, fuzzy=True)
+
+    i = 0
+    for (itemtype, label, path, content, sortkey, asfilter, prio) in items:
+        progress.check()
+        ty = itemtype[0]
+        if ty == "p" or ty == "h" or ty == "a":
+            i += 1
+            if i % 10000 == 0:
+                progress.message("{0} items added".format(i))
+            score = get_item_score(asfilter, prio)
+            incr_maker.add_item(content, itemtype, label, path, prio, score)
+
+    progress.message("{0} items were added.".format(i))
+    progress.message("Finalizing...")
+    incr_maker.finalize()
+    progress.message("Done.")
+    return i
+
+
+def make_fulltext(index_path, items, itemtypes, title, progress):
+    """Build a full text search index from the items whose itemtype starts
+    with one of the letters of itemtypes, and return their number"""
+
+    progress.message("Building the full text search index for {0}...".format(title))
+    maker = fulltext.Maker(index_path)
+
+    i = 0
+    for (itemtype, label, path, content, sortkey, asfilter, prio) in items:
+        progress.check()
+        if itemtype[0] in itemtypes:
+            i += 1
+            if i % 10000 == 0:
+                progress.message("{0} items added".format(i))
+            maker.add_item(itemtype, content, asfilter, label, path, prio, sortkey)
+
+    progress.message("{0} items were added.".format(i))
+    progress.message("Finalizing...")
+    progress.message("Please wait a while...")
+    maker.commit()
+    maker.close()
+    progress.message("Done.")
+    return i
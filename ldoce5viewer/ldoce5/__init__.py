@@ -5,6 +5,7 @@ import traceback
 import zlib
 
 from ..utils.cdb import CDBError, CDBReader
+from ..utils.metrics import hot_stats
 from . import transform
 from .filemap import FilemapReader
 from .idmreader import ArchiveReader
@@ -39,6 +40,10 @@ class LDOCE5(object):
         self._filemap_path = filemap_path
 
     def get_content(self, path) -> Tuple[bytes, str]:
+        with hot_stats.request(path):
+            return self._get_content(path)
+
+    def _get_content(self, path):
         try:
             archive, name = path.lstrip("/").split("/", 1)
         except ValueError:
@@ -52,7 +57,9 @@ class LDOCE5(object):
             #    pass
 
             try:
-                with FilemapReader(self._filemap_path) as fmr:
+                with hot_stats.timer("filemap_lookup"), FilemapReader(
+                    self._filemap_path
+                ) as fmr:
                     location = fmr.lookup(archive_name, name)
             except (IOError, CDBError):
                 raise FilemapError
@@ -4,14 +4,58 @@
 
 import re
 from html import escape
+from io import BytesIO
 from itertools import chain
 
 import lxml.etree as et
 
+from .paths import (
+    ALL_ABBR,
+    ALL_COLLOINEXA,
+    ALL_DEF,
+    ALL_GRAM,
+    ALL_LEXVAR,
+    ALL_ORTHVAR,
+    ALL_POS,
+    ALL_THESEXA,
+    AMEVARIANT,
+    BASE,
+    BREVARIANT,
+    COLLEXA,
+    COLLOC,
+    DERIV,
+    EXP,
+    FREQ,
+    GEO,
+    GRAM,
+    HEAD,
+    HEAD_PHRVBHWD,
+    HOMNUM,
+    HWD,
+    HYPHENATION,
+    INFLX,
+    POS,
+    SENSE_GRAM,
+    dispatch_by_tag,
+)
 from .utils import shorten_id
 
 _MATCH_SPACE = re.compile("\s+")
 _EXCLUDE_TAGS = frozenset(("span", "OBJECT", "GLOSS"))
+# the elements yielding items, in the order of the items
+_ITEM_TAGS = (
+    "Sense",
+    "RunOn",
+    "PhrVbEntry",
+    "EXAMPLE",
+    "LEXUNIT",
+    "PROPFORMPREP",
+    "PROPFORM",
+    "Collocate",
+    "Exponent",
+    "COLLO",
+    "COLLOC",
+)
 _SEARCH_COUNTABLE = re.compile(r"(\bcountable\b|\bc\b|\b(often|usually)\s+plural\b)")
 _SEARCH_UNCOUNTABLE = re.compile(r"(\buncountable\b)")
 
@@ -32,6 +76,12 @@ typecode:
 
 
 def _get_text(elem):
+    if not len(elem):
+        # most of the elements have no children
+        if elem.tag in _EXCLUDE_TAGS or elem.text is None:
+            return ""
+        return elem.text.strip()
+
     s = []
 
     def rec(e):
@@ -88,15 +138,11 @@ def _make_variations(base, inflections):
     return ret
 
 
-def _get_incorrect_inflections(
-    base, pos_elems, gram_main_elems, gram_sub_elems, num_syllable
-):
+def _lower_texts(elems):
+    return frozenset(_get_text(e).lower() for e in elems)
 
-    poslist = frozenset(_get_text(e).lower() for e in pos_elems)
-    gramlist_main = frozenset(_get_text(e).lower() for e in gram_main_elems)
-    gramlist_sub = frozenset(_get_text(e).lower() for e in gram_sub_elems)
-    gramlist = gramlist_main | gramlist_sub
 
+def _get_incorrect_inflections(base, poslist, gramlist, num_syllable):
     def handle_noun():
         for s in gramlist:
             if _SEARCH_COUNTABLE.search(s):
@@ -151,85 +197,128 @@ def _get_incorrect_inflections(
     return r
 
 
-def get_entry_items(entry_data):
+# as_filter codes of the most frequent 1000/2000/3000 words
+# in the spoken (233-235) and written (236-238) corpus, i.e. FREQ marks
+_FREQ_SPOKEN = {"233": 3, "234": 2, "235": 1}
+_FREQ_WRITTEN = {"236": 3, "237": 2, "238": 1}
 
-    root = et.fromstring(entry_data)
-    root_id = shorten_id(root.get("id"))
-    head = root.find("Head")
-    hyphenation = head.find("HYPHENATION")
-    num_syllable = 1
-    if hyphenation is not None:
-        num_syllable = _get_text(hyphenation).count("‧") + 1
-    is_freq = head.find("FREQ") is not None
-    hwdplain = _get_text(head.find("HWD/BASE"))
-
-    gram_main_elems = head.findall(".//GRAM")
-
-    pos_elems = head.findall(".//POS")
-    poslist = frozenset(_get_text(e).lower() for e in pos_elems)
-
-    incorrect = frozenset(
-        _get_incorrect_inflections(
-            hwdplain,
-            pos_elems,
-            gram_main_elems,
-            root.findall("Sense//GRAM"),
-            num_syllable,
-        )
-    )
 
-    gramlist_main = frozenset(_get_text(e).lower() for e in gram_main_elems)
+def get_item_score(asfilter, prio):
+    """Return the importance of an item (0-255) for ranking"""
 
-    is_hwd_noun = "noun" in poslist
-    is_hwd_adj = "adjective" in poslist
+    codes = asfilter.split()
+    freq = 0
+    for table in (_FREQ_SPOKEN, _FREQ_WRITTEN):
+        freq += max([table.get(c, 0) for c in codes], default=0)
+    return min(255, 20 * freq + max(0, 101 - 2 * prio))
+
+
+class _EntryItems(object):
+    """The headword of an entry and the extractors of the items in its body
+
+    Only the Head element is needed to make the extractors, so that the
+    body can be parsed incrementally.
+    """
+
+    def __init__(self, root_id, head):
+        self.root_id = root_id
+        self.head = head
+        hyphenation = HYPHENATION.find(head)
+        self.num_syllable = 1
+        if hyphenation is not None:
+            self.num_syllable = _get_text(hyphenation).count("‧") + 1
+        self.hwd = HWD.find(head)
+        self.hwdplain = _get_text(BASE.find(self.hwd))
+
+        self.gramlist_main = _lower_texts(ALL_GRAM.findall(head))
+        self.poslist = _lower_texts(ALL_POS.findall(head))
+        self.is_hwd_adj = "adjective" in self.poslist
 
-    if is_hwd_noun:
-        is_uncountable = False
-        for s in gramlist_main:
-            unco = _SEARCH_UNCOUNTABLE.search(s)
-            co = _SEARCH_COUNTABLE.search(s)
-            if unco and not co:
-                is_uncountable = True
-    else:
         is_uncountable = False
+        if "noun" in self.poslist:
+            for s in self.gramlist_main:
+                unco = _SEARCH_UNCOUNTABLE.search(s)
+                co = _SEARCH_COUNTABLE.search(s)
+                if unco and not co:
+                    is_uncountable = True
+
+        is_american = False
+        is_british = False
+        if AMEVARIANT.find(head) is None and BREVARIANT.find(head) is None:
+            for s in (_get_text(e) for e in GEO.findall(head)):
+                if "British" in s:
+                    is_british = True
+                elif "American" in s:
+                    is_american = True
+
+        self.hwdlabel = self._make_hwd_label()
+
+        asfilter = self.get_filter(self.hwd)
+        if is_uncountable:
+            asfilter += " u1"
+        if is_british:
+            asfilter += " u2"
+        if is_american:
+            asfilter += " u3"
+        self.hwd_label = "<h>{0}</h>".format(self.hwdlabel)
+        self.headword = (
+            "hm",
+            self.hwd_label,
+            "/fs/" + self.root_id,
+            self.hwdplain,
+            self.hwdplain,
+            asfilter,
+            1,
+        )
 
-    is_american = False
-    is_british = False
-    if head.find("AmEVariant") is None and head.find("BrEVariant") is None:
-        for s in (_get_text(e) for e in head.iterfind("GEO")):
-            if "British" in s:
-                is_british = True
-            elif "American" in s:
-                is_american = True
+        # the handlers of the elements in _ITEM_TAGS
+        self.handlers = dict(
+            zip(
+                _ITEM_TAGS,
+                (
+                    self.get_sense,
+                    self.get_runon,
+                    self.get_phrvb,
+                    self.get_example,
+                    self.get_lexunit,
+                    self.get_simple,
+                    self.get_simple,
+                    self.get_collocate,
+                    self.get_exponent,
+                    self.get_simple,
+                    self.get_colloc,
+                ),
+            )
+        )
 
-    def _get_filter(elem, poslist=None):
+    def get_filter(self, elem, poslist=None):
         if elem.get("as_filter", None) is None:
             return ""
 
         z = set(elem.get("as_filter").replace("|", "").split())
 
         # some adjectives are mislabeled as adjective+nouns.
-        if (poslist is None) and (not is_hwd_adj):
+        if (poslist is None) and (not self.is_hwd_adj):
             z.discard("334")  # 334 -> adjective
         elif poslist and ("adjective" not in poslist):
             z.discard("334")  # 334 -> adjective
 
         return " ".join(z)
 
-    def make_hwd_label():
-        hwd = head.find("HWD")
-        baselabel = escape(_get_text(hwd.find("BASE")))
+    def _make_hwd_label(self):
+        head = self.head
+        baselabel = escape(self.hwdplain)
 
-        homnum = head.find("HOMNUM")
+        homnum = HOMNUM.find(head)
         if homnum is not None:
             baselabel += "<s>{0}</s>".format(escape(_get_text(homnum)))
 
-        if is_freq:
+        if FREQ.find(head) is not None:
             hwdlabel = "<f>{0}</f>".format(baselabel)
         else:
             hwdlabel = "<n>{0}</n>".format(baselabel)
 
-        poslist = head.findall("POS")
+        poslist = POS.findall(head)
         if poslist:
             hwdlabel += " <p>{0}</p>".format(
                 escape(", ".join(_get_text(pos) for pos in poslist))
@@ -237,34 +326,29 @@ def get_entry_items(entry_data):
 
         return hwdlabel
 
-    hwdlabel = make_hwd_label()
+    def _path(self, elem):
+        return "/fs/{0}#{1}".format(self.root_id, shorten_id(elem.get("id")))
 
-    def get_hwd():
-        path = "/fs/" + root_id
-        hwd = head.find("HWD")
-        hwdplain = _get_text(hwd.find("BASE"))
-        asfilter = _get_filter(hwd)
-
-        if is_uncountable:
-            asfilter += " u1"
-
-        if is_british:
-            asfilter += " u2"
+    def get_hwd_variants(self, gramlist_sub):
+        """Yield the variants of the headword; gramlist_sub is the set of
+        the lowercased GRAM of the senses"""
 
-        if is_american:
-            asfilter += " u3"
-
-        label = "<h>{0}</h>".format(hwdlabel)
-
-        return ("hm", label, path, hwdplain, hwdplain, asfilter, 1)
-
-    def get_hwd_variants():
-        path = "/fs/" + root_id
-        hwd = head.find("HWD")
-        hwdplain = _get_text(hwd.find("BASE"))
-        asfilter = _get_filter(hwd)
+        head = self.head
+        hwd = self.hwd
+        hwdplain = self.hwdplain
+        hwdlabel = self.hwdlabel
+        path = "/fs/" + self.root_id
+        asfilter = self.get_filter(hwd)
+        incorrect = frozenset(
+            _get_incorrect_inflections(
+                hwdplain,
+                self.poslist,
+                self.gramlist_main | gramlist_sub,
+                self.num_syllable,
+            )
+        )
 
-        for inflx in hwd.iterfind("INFLX"):
+        for inflx in INFLX.findall(hwd):
             inflxplain = _get_text(inflx)
             if inflxplain == hwdplain:
                 continue
@@ -275,15 +359,15 @@ def get_entry_items(entry_data):
             )
             yield ("hv", inflxlabel, path, inflxplain, inflxplain, asfilter, 2)
 
-        variants = chain(head.iterfind(".//LEXVAR"), head.iterfind(".//ORTHVAR"))
+        variants = chain(ALL_LEXVAR.findall(head), ALL_ORTHVAR.findall(head))
 
         for lexvar in variants:
-            v_asfilter = _get_filter(lexvar)
+            v_asfilter = self.get_filter(lexvar)
             if lexvar.get("id", None) is None:
                 continue
             v_id = lexvar.get("id")
             v_path = path + "#" + shorten_id(v_id)
-            v_plains = tuple(set(_get_text(e) for e in lexvar.iterfind("INFLX")))
+            v_plains = tuple(set(_get_text(e) for e in INFLX.findall(lexvar)))
             for v_plain in v_plains:
                 if v_plain in incorrect:
                     continue
@@ -292,26 +376,26 @@ def get_entry_items(entry_data):
                 )
                 yield ("hv", v_label, v_path, v_plain, v_plain, v_asfilter, 2)
 
-        for abbr in head.iterfind(".//ABBR"):
+        for abbr in ALL_ABBR.findall(head):
             v_asfilter = ""
             v_plain = _get_text(abbr)
             v_label = "<h><v>{0}</v> &rarr; {1}</h>".format(escape(v_plain), hwdlabel)
             yield ("hv", v_label, path, v_plain, v_plain, v_asfilter, 2)
 
-    def get_phrvb(phrvb):
-        path = "/fs/{0}#{1}".format(root_id, shorten_id(phrvb.get("id")))
-        phrvbhwd = phrvb.find("Head/PHRVBHWD")
+    def get_phrvb(self, phrvb):
+        path = self._path(phrvb)
+        phrvbhwd = HEAD_PHRVBHWD.find(phrvb)
         plain = _get_text(phrvbhwd)
-        asfilter = _get_filter(phrvbhwd)
+        asfilter = self.get_filter(phrvbhwd)
         label = "<h><pv>{0}</pv> <p>phrasal verb</p></h>".format(escape(plain))
         yield ("hp", label, path, plain, plain, asfilter, 1)
 
-    def get_runon(runon):
-        deriv = runon.find("DERIV")
-        path = "/fs/{0}#{1}".format(root_id, shorten_id(deriv.get("id")))
-        poslist = frozenset(_get_text(e).lower() for e in runon.iterfind(".//POS"))
-        asfilter = _get_filter(deriv, poslist)
-        hwd = deriv.find("BASE")
+    def get_runon(self, runon):
+        deriv = DERIV.find(runon)
+        path = self._path(deriv)
+        poslist = _lower_texts(ALL_POS.findall(runon))
+        asfilter = self.get_filter(deriv, poslist)
+        hwd = BASE.find(deriv)
         plain = _get_text(hwd)
         plain = plain.replace("\u02c8", "")
         plain = plain.replace("\u02cc", "")
@@ -325,11 +409,14 @@ def get_entry_items(entry_data):
 
         incorrect = frozenset(
             _get_incorrect_inflections(
-                plain, runon.findall("POS"), runon.findall("GRAM"), (), num_syllable
+                plain,
+                _lower_texts(POS.findall(runon)),
+                _lower_texts(GRAM.findall(runon)),
+                self.num_syllable,
             )
         )
 
-        for inflx in deriv.iterfind("INFLX"):
+        for inflx in INFLX.findall(deriv):
             inflplain = _get_text(inflx)
             if inflplain == plain:
                 continue
@@ -338,151 +425,175 @@ def get_entry_items(entry_data):
             infllabel = "<h><v>{0}<v> &rarr; {1}</h>".format(escape(inflplain), label)
             yield ("hv", infllabel, path, inflplain, inflplain, asfilter, 1)
 
-    def get_lexunit(elem):
-        asfilter = _get_filter(elem)
-        path = "/fs/{0}#{1}".format(root_id, shorten_id(elem.get("id")))
+    def get_lexunit(self, elem):
+        asfilter = self.get_filter(elem)
+        path = self._path(elem)
         plain = _get_text(elem)
-        label = "<l><o>{0}</o> ({1})</l>".format(escape(plain), hwdlabel)
+        label = "<l><o>{0}</o> ({1})</l>".format(escape(plain), self.hwdlabel)
         yield ("pl", label, path, plain, plain, asfilter, 9)
 
-    def get_simple(elem):
-        asfilter = _get_filter(elem)
-        path = "/fs/{0}#{1}".format(root_id, shorten_id(elem.get("id")))
+    def get_simple(self, elem):
+        asfilter = self.get_filter(elem)
+        path = self._path(elem)
         plain = _get_text(elem)
-        label = "<c><o>{0}</o> ({1})</c>".format(plain, hwdlabel)
+        label = "<c><o>{0}</o> ({1})</c>".format(plain, self.hwdlabel)
         yield ("p", label, path, plain, plain, asfilter, 10)
 
-    def get_colloc(elem):
-        asfilter = _get_filter(elem)
-        path = "/fs/{0}#{1}".format(root_id, shorten_id(elem.get("id")))
+    def get_colloc(self, elem):
+        asfilter = self.get_filter(elem)
+        path = self._path(elem)
         plain = _get_text(elem)
         plain = _remove_article(plain)
-        label = "<c><o>{0}</o> ({1})</c>".format(plain, hwdlabel)
+        label = "<c><o>{0}</o> ({1})</c>".format(plain, self.hwdlabel)
         yield ("p", label, path, plain, plain, asfilter, 10)
 
-    def get_collocate(elem):
+    def get_collocate(self, elem):
         if elem.get("id", None) is None:
             return
 
         texts = chain(
-            elem.iterfind("COLLOC"),
-            elem.iterfind(".//LEXVAR"),
-            elem.iterfind(".//ORTHVAR"),
+            COLLOC.findall(elem),
+            ALL_LEXVAR.findall(elem),
+            ALL_ORTHVAR.findall(elem),
         )
         title = ", ".join("<b>{0}</b>".format(escape(_get_text(e))) for e in texts)
 
-        path = "/fs/{0}#{1}".format(root_id, shorten_id(elem.get("id")))
-        for e in elem.iterfind("COLLEXA"):
-            plain = _get_text2(e.find("BASE"))
-            asfilter = _get_filter(e)
-            label = "{0} &mdash; {1}".format(hwd_label, title)
-            yield ("e", label, path, plain, hwd_plain, asfilter, 20)
+        path = self._path(elem)
+        for e in COLLEXA.findall(elem):
+            plain = _get_text2(BASE.find(e))
+            asfilter = self.get_filter(e)
+            label = "{0} &mdash; {1}".format(self.hwd_label, title)
+            yield ("e", label, path, plain, self.hwdplain, asfilter, 20)
 
-        variants = chain(elem.iterfind(".//LEXVAR"), elem.iterfind(".//ORTHVAR"))
+        variants = chain(ALL_LEXVAR.findall(elem), ALL_ORTHVAR.findall(elem))
         for var in variants:
             if var.get("id", None) is None:
                 continue
-            path = "/fs/{0}#{1}".format(root_id, shorten_id(var.get("id")))
+            path = self._path(var)
             v_plain = _get_text(var)
-            v_label = "<c><o>{0}</o> ({1})</c>".format(v_plain, hwdlabel)
+            v_label = "<c><o>{0}</o> ({1})</c>".format(v_plain, self.hwdlabel)
             yield ("p", v_label, path, v_plain, v_plain, "", 11)
 
-    def get_exponent(elem):
+    def get_exponent(self, elem):
         if elem.get("id", None) is None:
             return
 
         texts = chain(
-            elem.iterfind("EXP"),
-            elem.iterfind(".//LEXVAR"),
-            elem.iterfind(".//ORTHVAR"),
+            EXP.findall(elem),
+            ALL_LEXVAR.findall(elem),
+            ALL_ORTHVAR.findall(elem),
         )
         title = ", ".join("<b>{0}</b>".format(escape(_get_text(e))) for e in texts)
 
-        path = "/fs/{0}#{1}".format(root_id, shorten_id(elem.get("id")))
-        for e in elem.iterfind(".//THESEXA"):
-            asfilter = _get_filter(e)
-            text = _get_text2(e.find("BASE"))
-            yield ("e", hwd_label, path, text, hwd_plain, asfilter, 20)
+        path = self._path(elem)
+        for e in ALL_THESEXA.findall(elem):
+            asfilter = self.get_filter(e)
+            text = _get_text2(BASE.find(e))
+            yield ("e", self.hwd_label, path, text, self.hwdplain, asfilter, 20)
 
-        for d in elem.iterfind(".//DEF"):
+        for d in ALL_DEF.findall(elem):
             text = _get_text(d)
-            asfilter = _get_filter(d)
-            label = "{0} &mdash; {1}".format(hwd_label, title)
-            yield ("d", label, path, text, hwd_plain, asfilter, 30)
+            asfilter = self.get_filter(d)
+            label = "{0} &mdash; {1}".format(self.hwd_label, title)
+            yield ("d", label, path, text, self.hwdplain, asfilter, 30)
 
-    def get_example(elem):
-        path = "/fs/{0}#{1}".format(root_id, shorten_id(elem.get("id")))
-        asfilter = _get_filter(elem)
-        text = _get_text2(elem.find("BASE"))
-        yield ("e", hwd_label, path, text, hwd_plain, asfilter, 20)
+    def get_example(self, elem):
+        path = self._path(elem)
+        asfilter = self.get_filter(elem)
+        text = _get_text2(BASE.find(elem))
+        yield ("e", self.hwd_label, path, text, self.hwdplain, asfilter, 20)
 
-        collo = tuple(_get_text(c) for c in elem.iterfind(".//COLLOINEXA"))
+        collo = tuple(_get_text(c) for c in ALL_COLLOINEXA.findall(elem))
         if collo:
             coplain = " ".join(collo)
             colabel = " &hellip; ".join(escape(c) for c in collo)
-            colabel = "<c><o>{0}</o> ({1})</c>".format(colabel, hwdlabel)
+            colabel = "<c><o>{0}</o> ({1})</c>".format(colabel, self.hwdlabel)
             yield ("p", colabel, path, coplain, coplain, "", 15)
 
-    def get_sense(elem):
-        path = "/fs/{0}#{1}".format(root_id, shorten_id(elem.get("id")))
-        for d in elem.iterfind(".//DEF"):
+    def get_sense(self, elem):
+        path = self._path(elem)
+        for d in ALL_DEF.findall(elem):
             text = _get_text(d)
-            asfilter = _get_filter(d)
-            yield ("d", hwd_label, path, text, hwd_plain, asfilter, 30)
+            asfilter = self.get_filter(d)
+            yield ("d", self.hwd_label, path, text, self.hwdplain, asfilter, 30)
 
-        variants = chain(elem.iterfind(".//LEXVAR"), elem.iterfind(".//ORTHVAR"))
+        variants = chain(ALL_LEXVAR.findall(elem), ALL_ORTHVAR.findall(elem))
         for var in variants:
-            path = "/fs/{0}#{1}".format(root_id, shorten_id(var.get("id")))
+            path = self._path(var)
             v_plain = (
                 _get_text(var)
                 .replace("\xb7", "")
                 .replace("\u02c8", "")
                 .replace("\u02cc", "")
             )
-            v_label = "<l><o>{0}</o> ({1})</l>".format(escape(v_plain), hwdlabel)
+            v_label = "<l><o>{0}</o> ({1})</l>".format(escape(v_plain), self.hwdlabel)
             yield ("pl", v_label, path, v_plain, v_plain, "", 11)
 
-    def gen(f, elems):
-        for e in elems:
-            for r in f(e):
-                yield r
-
-    items = []
-    headword = get_hwd()
-    items.append(headword)
-    hwd_label = headword[1]
-    hwd_plain = headword[3]
-
-    inflections = set()
-    for v in get_hwd_variants():
-        items.append(v)
-        var_plain = v[3]
-        inflections.add(var_plain)
-
-    variations = _make_variations(hwd_plain, inflections)
-
-    iterfind = root.iterfind
-    for r in gen(get_sense, iterfind(".//Sense")):
-        items.append(r)
-    for r in gen(get_runon, iterfind(".//RunOn")):
-        items.append(r)
-    for r in gen(get_phrvb, iterfind(".//PhrVbEntry")):
-        items.append(r)
-    for r in gen(get_example, iterfind(".//EXAMPLE")):
-        items.append(r)
-    for r in gen(get_lexunit, iterfind(".//LEXUNIT")):
-        items.append(r)
-    for r in gen(get_simple, iterfind(".//PROPFORMPREP")):
-        items.append(r)
-    for r in gen(get_simple, iterfind(".//PROPFORM")):
-        items.append(r)
-    for r in gen(get_collocate, iterfind(".//Collocate")):
-        items.append(r)
-    for r in gen(get_exponent, iterfind(".//Exponent")):
-        items.append(r)
-    for r in gen(get_simple, iterfind(".//COLLO")):
-        items.append(r)
-    for r in gen(get_colloc, iterfind(".//COLLOC")):
-        items.append(r)
-
-    return (items, variations)
+    def finish(self, gramlist_sub, body_items):
+        """Return (items, variations) of the entry given the items of
+        the body grouped by the tag"""
+
+        items = [self.headword]
+        inflections = set()
+        for v in self.get_hwd_variants(gramlist_sub):
+            items.append(v)
+            inflections.add(v[3])
+
+        for tag in _ITEM_TAGS:
+            items.extend(body_items[tag])
+
+        return (items, _make_variations(self.hwdplain, inflections))
+
+
+def get_entry_items(entry_data):
+    """Return (items, variations) of an entry"""
+
+    root = et.fromstring(entry_data)
+    entry = _EntryItems(shorten_id(root.get("id")), HEAD.find(root))
+
+    # collect the items in a single walk, grouped by the tag
+    body_items = dict((tag, []) for tag in _ITEM_TAGS)
+    dispatch_by_tag(root, entry.handlers, body_items, inclusive=False)
+
+    return entry.finish(_lower_texts(SENSE_GRAM.findall(root)), body_items)
+
+
+def iterparse_entry_items(entry_data):
+    """Return the same as get_entry_items, but without building the tree
+    of the whole entry
+
+    The items are extracted as each child of the entry is closed, and the
+    child is freed as soon as it is processed, except Head.
+    """
+
+    root = None
+    entry = None
+    pending = []
+    gramlist_sub = set()
+    body_items = dict((tag, []) for tag in _ITEM_TAGS)
+    for (_, elem) in et.iterparse(BytesIO(entry_data)):
+        parent = elem.getparent()
+        if root is None:
+            # the end of the first child of the entry
+            if parent is None or parent.getparent() is not None:
+                continue
+            root = parent
+        elif parent is not root:
+            continue
+
+        pending.append(elem)
+        if entry is None:
+            if elem.tag != "Head":
+                continue
+            entry = _EntryItems(shorten_id(root.get("id")), elem)
+
+        for child in pending:
+            dispatch_by_tag(child, entry.handlers, body_items)
+            if child.tag == "Sense":
+                gramlist_sub.update(_lower_texts(ALL_GRAM.findall(child)))
+            if child is not entry.head:
+                child.clear()
+                root.remove(child)
+        del pending[:]
+
+    return entry.finish(frozenset(gramlist_sub), body_items)
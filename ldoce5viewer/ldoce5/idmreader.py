@@ -4,6 +4,8 @@ import os.path
 from struct import unpack
 from zlib import decompress
 
+from ..utils.metrics import hot_stats, io_stats
+
 try:
     from configparser import SafeConfigParser
 except:
@@ -230,7 +232,11 @@ class ArchiveReader(object):
         f = self._f
         f.seek(cmpoffset)
         if (self._cache_offset != cmpoffset) or (self._cache_size != cmpsize):
-            self._cache = decompress(f.read(cmpsize))
+            with hot_stats.timer("block_read"):
+                data = f.read(cmpsize)
+            with hot_stats.timer("decompress"):
+                self._cache = decompress(data)
+            io_stats.add(cmpsize, len(self._cache))
             self._cache_offset = cmpoffset
             self._cache_size = cmpsize
         return self._cache[origoffset : (origoffset + origsize)]
@@ -0,0 +1,78 @@
+"""Precompiled element paths and tag-dispatch helpers
+
+find(), findall() and iterfind() parse their string path on every call.
+The paths of the entry documents are compiled here once as XPath objects.
+"""
+
+import lxml.etree as et
+
+
+class Path(object):
+    """A compiled path with the find() and findall() of the elements"""
+
+    __slots__ = ("findall",)
+
+    def __init__(self, path):
+        self.findall = et.XPath(path)
+
+    def find(self, elem):
+        r = self.findall(elem)
+        return r[0] if r else None
+
+
+# children
+AMEVARIANT = Path("AmEVariant")
+BASE = Path("BASE")
+BREVARIANT = Path("BrEVariant")
+COLLEXA = Path("COLLEXA")
+COLLOC = Path("COLLOC")
+DERIV = Path("DERIV")
+EXP = Path("EXP")
+FREQ = Path("FREQ")
+GEO = Path("GEO")
+GRAM = Path("GRAM")
+HEAD = Path("Head")
+HOMNUM = Path("HOMNUM")
+HWD = Path("HWD")
+HYPHENATION = Path("HYPHENATION")
+INFLX = Path("INFLX")
+POS = Path("POS")
+REFHWD = Path("REFHWD")
+SUFFIX = Path("SUFFIX")
+
+# paths
+HEAD_HWD_BASE = Path("Head/HWD/BASE")
+HEAD_HYPHENATION = Path("Head/HYPHENATION")
+HEAD_PHRVBHWD = Path("Head/PHRVBHWD")
+HEAD_POS = Path("Head/POS")
+HWD_BASE = Path("HWD/BASE")
+REFS_REF = Path("Refs/Ref")
+SENSE_GRAM = Path("Sense//GRAM")
+SENSENUM = Path('span[@class="sensenum"]')
+GB_HWD_PRON = Path('Audio[@resource="GB_HWD_PRON"]')
+US_HWD_PRON = Path('Audio[@resource="US_HWD_PRON"]')
+
+# descendants
+ALL_ABBR = Path(".//ABBR")
+ALL_COLLOINEXA = Path(".//COLLOINEXA")
+ALL_DEF = Path(".//DEF")
+ALL_ENTRYASSET = Path(".//EntryAsset")
+ALL_GRAM = Path(".//GRAM")
+ALL_LEXVAR = Path(".//LEXVAR")
+ALL_ORTHVAR = Path(".//ORTHVAR")
+ALL_POS = Path(".//POS")
+ALL_THESEXA = Path(".//THESEXA")
+
+
+def dispatch_by_tag(elem, handlers, results, inclusive=True):
+    """Walk elem once and extend results[tag] with handlers[tag](e) for
+    each element e with one of the tags of handlers
+
+    The elements are visited in the document order. elem itself is skipped
+    unless inclusive is True.
+    """
+
+    for e in elem.iter(*handlers):
+        if inclusive or e is not elem:
+            tag = e.tag
+            results[tag].extend(handlers[tag](e))
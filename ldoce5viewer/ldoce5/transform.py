@@ -7,7 +7,9 @@ from html import escape
 
 import lxml.etree as et
 
+from ..utils.metrics import hot_stats
 from ..utils.text import enc_utf8
+from .paths import GB_HWD_PRON, HEAD, HWD_BASE, POS, US_HWD_PRON
 from .transform_body import _trans_assets, body2html
 from .utils import shorten_id
 
@@ -83,28 +85,29 @@ def trans_entry(data):
     meta = {}
 
     try:
-        root = et.fromstring(data)
-        head = root.find("Head")
-        title = _get_text_nr(head.find("HWD/BASE"))
-        poslist = head.findall("POS")
+        with hot_stats.timer("xml_parse"):
+            root = et.fromstring(data)
+        head = HEAD.find(root)
+        title = _get_text_nr(HWD_BASE.find(head))
+        poslist = POS.findall(head)
         if poslist:
             title += " ({0})".format(", ".join(_get_text_nr(pos) for pos in poslist))
     except:
         title = ""
 
     try:
-        pron_gb = head.find('Audio[@resource="GB_HWD_PRON"]')
+        pron_gb = GB_HWD_PRON.find(head)
         if pron_gb is not None:
             meta["gb_pron"] = pron_gb.get("topic").split("/")[-1]
-        pron_us = head.find('Audio[@resource="US_HWD_PRON"]')
+        pron_us = US_HWD_PRON.find(head)
         if pron_us is not None:
             meta["us_pron"] = pron_us.get("topic").split("/")[-1]
     except:
         pass
 
-    r.append(_build_header(["entry"], title=title, meta=meta))
-
-    r.append(et.tounicode(_trans_assets(root), pretty_print=True, method="html"))
+    with hot_stats.timer("header"):
+        r.append(_build_header(["entry"], title=title, meta=meta))
+        r.append(et.tounicode(_trans_assets(root), pretty_print=True, method="html"))
 
     r.append(body2html(root))
     r.append("</body></html>")
@@ -6,18 +6,43 @@ This module generates HTML documents from LDOCE's XML entry documents.
 """
 
 import platform
-import re
+from functools import lru_cache
+from urllib.parse import quote, urlencode
 
-from urllib.parse import urlencode
-
-from lxml.etree import Element, tounicode
+from lxml.etree import Element
 
 from ..utils.compat import basestring
+from ..utils.metrics import hot_stats
+from .paths import (
+    ALL_ENTRYASSET,
+    HEAD_HWD_BASE,
+    HEAD_HYPHENATION,
+    HEAD_POS,
+    REFS_REF,
+    SENSENUM,
+)
 from .utils import shorten_id
 
 _SPAN_BUBBLEUP_HEAD = frozenset(("$", ";", ":", ",", "|", ", →", "at"))
 _SPAN_BUBBLEUP_TAIL = frozenset(("$", ";", ",", "|", ", →"))
 
+# the replacements of the symbols in the text
+_TEXT_SYMBOLS = {
+    0x2027: "\xb7",
+    0x2192: "<span>\u2192</span>",
+    0x2194: "<span>\u2194</span>",
+    0x25BA: "<span>\u25ba</span>",
+}
+if platform.release() == "XP" and platform.system() == "Windows":
+    for c in "\u02cc\u02c8\u2194":
+        _TEXT_SYMBOLS[ord(c)] = _TEXT_SYMBOLS.get(ord(c), c).replace(
+            c, '<span class="winxpsym">{0}</span>'.format(c)
+        )
+
+# the attributes which lxml's HTML serializer escapes as URIs
+_URI_ATTRS = frozenset(("href", "src"))
+_URI_SAFE = "".join(chr(c) for c in range(0x21, 0x7F))
+
 
 def _E(tag, attrib={}, children=()):
     """Make an element"""
@@ -46,114 +71,205 @@ def _E(tag, attrib={}, children=()):
     return elem
 
 
-def _preprocess_span(elem):
-    """make markups sane"""
-
-    def is_plainspan(e):
-        return e.tag == "span" and e.get("class", "neutral") == "neutral"
-
-    for c in elem:
-        _preprocess_span(c)
-
-    if elem.text and len(elem) == 0:
-        if elem.text.startswith(" "):
-            elem.text = elem.text[1:]
-            elem.addprevious(_E("span", {}, [" "]))
-        if elem.text.endswith(" "):
-            elem.text = elem.text[:-1]
-            elem.addnext(_E("span", {}, [" "]))
-
-    if elem.getparent() is None:
-        return
-
-    if elem.tag != "Crossref":
-        if len(elem) >= 1:
-            span = elem[0]
-            if elem.text is None and is_plainspan(span):
-                elem.remove(span)
-                if span.text is not None:
-                    m = re.match(r"(\s*)(.*)", span.text)
-                    group = m.group
-                    if group(2).strip() in _SPAN_BUBBLEUP_HEAD:
-                        elem.text = span.tail
-                        span.tail = None
+# the fields of the items of the normalized elements
+_PLAIN = 0  # True for the plain spans, which can be moved
+_ELEM = 1  # the source element, None for the spaces split from the text
+_TEXT = 2
+_TAIL = 3
+_ITEMS = 4  # the items of the children
+
+_NO_ITEMS = ()
+
+
+def _split_head(s):
+    """Split s as re.match(r"(\s*)(.*)", s).groups()"""
+    rest = s.lstrip()
+    return (s[: len(s) - len(rest)], rest.partition("\n")[0])
+
+
+def _split_tail(s):
+    """Split s as re.match(r"(.*)(\s*)", s).groups()"""
+    (line, nl, rest) = s.partition("\n")
+    if not nl:
+        return (line, "")
+    rest = nl + rest
+    return (line, rest[: len(rest) - len(rest.lstrip())])
+
+
+def _normalize(elem, moves=True):
+    """Make markups sane without modifying the source tree
+
+    Returns (before, item, after): the item of elem, and the plain spans
+    moved out of elem (or None), which become its siblings. The spaces at
+    the ends of the text of a leaf and the plain spans at the ends of an
+    element bubble up until they meet some text.
+    """
+
+    before = after = None
+    text = elem.text
+    if not len(elem):
+        items = _NO_ITEMS
+        if text and moves:
+            if text.startswith(" "):
+                text = text[1:]
+                before = [True, None, " ", None, _NO_ITEMS]
+            if text.endswith(" "):
+                text = text[:-1]
+                after = [True, None, " ", None, _NO_ITEMS]
+    else:
+        items = []
+        append = items.append
+        for c in elem:
+            (b, item, a) = _normalize(c)
+            if b is not None:
+                append(b)
+            append(item)
+            if a is not None:
+                append(a)
+
+        if moves and elem.tag != "Crossref":
+            span = items[0]
+            if text is None and span[_PLAIN]:
+                del items[0]
+                s = span[_TEXT]
+                if s is not None:
+                    (head, rest) = _split_head(s)
+                    if rest.strip() in _SPAN_BUBBLEUP_HEAD:
+                        text = span[_TAIL]
+                        span[_TAIL] = None
                     else:
-                        span.text = group(1)
-                        elem.text = group(2)
-                        if span.tail:
-                            elem.text += span.tail
-                            span.tail = None
-                    elem.addprevious(span)
+                        span[_TEXT] = head
+                        text = rest
+                        if span[_TAIL]:
+                            text += span[_TAIL]
+                            span[_TAIL] = None
+                    before = span
                 else:
-                    elem.text = span.tail
-
-        if len(elem) >= 1:
-            span = elem[-1]
-            if span.tail is None and is_plainspan(span):
-                elem.remove(span)
-                if span.text is not None:
-                    m = re.match(r"(.*)(\s*)", span.text)
-                    group = m.group
-                    if group(1).strip() in _SPAN_BUBBLEUP_TAIL:
-                        pass
-                    else:
-                        span.text = group(2)
-                        if len(elem) >= 1:
-                            last = elem[-1]
-                            last.tail = (last.tail or "") + group(1)
-                        else:
-                            elem.text = (elem.text or "") + group(1)
-                    elem.addnext(span)
+                    text = span[_TAIL]
+
+            if items:
+                span = items[-1]
+                if span[_TAIL] is None and span[_PLAIN]:
+                    del items[-1]
+                    s = span[_TEXT]
+                    if s is not None:
+                        (rest, tail) = _split_tail(s)
+                        if rest.strip() not in _SPAN_BUBBLEUP_TAIL:
+                            span[_TEXT] = tail
+                            if items:
+                                last = items[-1]
+                                last[_TAIL] = (last[_TAIL] or "") + rest
+                            else:
+                                text = (text or "") + rest
+                        after = span
+
+    plain = elem.tag == "span" and elem.get("class", "neutral") == "neutral"
+    return (before, [plain, elem, text, elem.tail, items], after)
+
+
+def _escape_text(s):
+    """Escape a text node, wrapping the symbols"""
+    return (
+        s.replace("&", "&amp;")
+        .replace("<", "&lt;")
+        .replace(">", "&gt;")
+        .translate(_TEXT_SYMBOLS)
+    )
+
+
+def _attr(name, value):
+    """Format an attribute as lxml's HTML serializer does"""
+    if name in _URI_ATTRS:
+        value = value.lstrip(" \t\n\r")
+        if not (value.isascii() and value.isprintable()) or " " in value:
+            value = quote(value, safe=_URI_SAFE)
+    value = value.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+    if '"' not in value:
+        return ' {0}="{1}"'.format(name, value)
+    elif "'" not in value:
+        return " {0}='{1}'".format(name, value)
+    else:
+        return ' {0}="{1}"'.format(name, value.replace('"', "&quot;"))
+
+
+def _start_tag(tag, attrib):
+    if not attrib:
+        return "<" + tag + ">"
+    return "<{0}{1}>".format(tag, "".join(_attr(k, v) for (k, v) in attrib.items()))
+
+
+@lru_cache(maxsize=None)
+def _class_start(name, tag):
+    """Return the start tag <name class="tag" without the closing >"""
+    return "<" + name + _attr("class", tag.lower())
+
+
+def _child_text(items, tag):
+    """Return the normalized text of the first child with the tag,
+    or False if there is no such child"""
+    for item in items:
+        elem = item[_ELEM]
+        if elem is not None and elem.tag == tag:
+            return item[_TEXT]
+    return False
 
 
-def _as_span(elem, root):
+def _write_item(item, root, out):
+    elem = item[_ELEM]
+    if item[_PLAIN]:
+        _write_span({} if elem is None else elem.attrib, item[_TEXT], out)
+    else:
+        f = _TRANS_MAP.get(elem.tag, _as_span)
+        f(elem, root, item[_TEXT], item[_ITEMS], out)
+
+
+def _write_children(text, items, root, out):
+    if text is not None:
+        out.append(_escape_text(text))
+    for item in items:
+        _write_item(item, root, out)
+        tail = item[_TAIL]
+        if tail is not None:
+            out.append(_escape_text(tail))
+
+
+def _as_span(elem, root, text, items, out):
     """transform an element as <span>"""
 
-    attrib = {"class": elem.tag.lower()}
+    out.append(_class_start("span", elem.tag))
     _id = elem.get("id")
     if _id is not None:
-        attrib["id"] = shorten_id(_id)
+        out.append(_attr("id", shorten_id(_id)))
+    out.append(">")
+    _write_children(text, items, root, out)
+    out.append("</span>")
 
-    children = [elem.text]
-    for c in elem:
-        children.extend(_dispatch(c, root))
-        children.append(c.tail)
 
-    yield _E("span", attrib, children)
-
-
-def _as_div(elem, root):
+def _as_div(elem, root, text, items, out):
     """transform an element as <div>"""
 
-    attrib = {"class": elem.tag.lower()}
+    out.append(_class_start("div", elem.tag))
     _id = elem.get("id")
     if _id:
-        attrib["id"] = shorten_id(_id)
+        out.append(_attr("id", shorten_id(_id)))
+    out.append(">")
+    _write_children(text, items, root, out)
+    out.append("</div>")
 
-    children = [elem.text]
-    for c in elem:
-        children.extend(_dispatch(c, root))
-        children.append(c.tail)
 
-    yield _E("div", attrib, children)
-
-
-def _trans_sense(elem, root):
+def _trans_sense(elem, root, text, items, out):
     attrib = {"class": elem.tag.lower()}
-    if elem.find('span[@class="sensenum"]') is not None:
+    if SENSENUM.find(elem) is not None:
         attrib["class"] += " sensewithnum"
     if elem.get("id", None) is not None:
         attrib["id"] = shorten_id(elem.get("id"))
 
-    children = [elem.text]
-    for c in elem:
-        children.extend(_dispatch(c, root))
-        children.append(c.tail)
-
-    yield _E("div", attrib, children)
+    out.append(_start_tag("div", attrib))
+    _write_children(text, items, root, out)
+    out.append("</div>")
 
 
-def _trans_ref(elem, root):
+def _trans_ref(elem, root, text, items, out):
     topic = elem.get("topic")
     if len(topic.split(".")) == 4:
         id23 = shorten_id(topic)
@@ -163,33 +279,30 @@ def _trans_ref(elem, root):
     else:
         href = "./" + elem.get("topic")
 
-    text = elem.text
-
-    suffix = elem.find("SUFFIX")
-    if suffix is not None:
-        text += suffix.text
-
-    children = [text]
-    for c in elem:
-        children.extend(_dispatch(c, root))
-        children.append(c.tail)
+    suffix = _child_text(items, "SUFFIX")
+    if suffix is not False:
+        text += suffix
 
-    yield _E("a", {"href": href, "class": "ref"}, children)
+    out.append(_start_tag("a", {"href": href, "class": "ref"}))
+    _write_children(text, items, root, out)
+    out.append("</a>")
 
 
-def _trans_nondv(elem, root):
-    refhwd = elem.find("REFHWD")
+def _trans_nondv(elem, root, text, items, out):
+    refhwd = _child_text(items, "REFHWD")
     href = "#"
     text = ""
-    if refhwd is not None:
-        text = refhwd.text
+    if refhwd is not False:
+        text = refhwd
         href = "lookup:///?" + urlencode({"q": text.strip().encode("utf-8")})
 
-    suffix = elem.find("SUFFIX")
-    if suffix is not None:
-        text += suffix.text
+    suffix = _child_text(items, "SUFFIX")
+    if suffix is not False:
+        text += suffix
 
-    yield _E("a", {"href": href, "class": "nondv"}, [text])
+    out.append(_start_tag("a", {"href": href, "class": "nondv"}))
+    out.append(_escape_text(text))
+    out.append("</a>")
 
 
 def _trans_assets(root):
@@ -201,10 +314,10 @@ def _trans_assets(root):
     external = []
 
     assets = {}
-    for asset in root.iterfind(".//EntryAsset"):
+    for asset in ALL_ENTRYASSET.findall(root):
         asset_type = asset.get("type").lower()
         assets[asset_type] = "_".join(
-            ref.get("topic") for ref in asset.iterfind("Refs/Ref")
+            ref.get("topic") for ref in REFS_REF.findall(asset)
         )
 
     if "entry_collocations" in assets:
@@ -246,7 +359,7 @@ def _trans_assets(root):
         word.append(("Origin", "dict:///etymologies/" + assets["etymology"]))
 
     is_noun = False
-    pos_elems = root.findall("Head/POS")
+    pos_elems = HEAD_POS.findall(root)
     if not len(pos_elems):
         is_noun = True
     else:
@@ -255,7 +368,7 @@ def _trans_assets(root):
                 is_noun = True
 
     if is_noun:
-        hwd = root.find("Head/HWD/BASE")
+        hwd = HEAD_HWD_BASE.find(root)
         external.append(
             (
                 "Wikipedia",
@@ -297,30 +410,34 @@ def _trans_assets(root):
     return _E("div", {"class": "assets"}, r)
 
 
-def _trans_span(elem, root):
-    attrib = elem.attrib
-    text = elem.text
+def _write_span(attrib, text, out):
     attr_class = attrib.get("class")
     if attr_class:
         if attr_class == "exabullet":
             return
         elif attr_class == "sensenum":
-            yield _E("span", attrib, (text, " "))
-        elif attr_class == "heading":
-            yield _E("div", attrib, (text,))
+            out.append(_start_tag("span", attrib))
+            out.append(_escape_text((text or "") + " "))
+            out.append("</span>")
         else:
-            yield _E("span", attrib, (text,))
+            tag = "div" if attr_class == "heading" else "span"
+            out.append(_start_tag(tag, attrib))
+            if text is not None:
+                out.append(_escape_text(text))
+            out.append("</" + tag + ">")
     elif text is not None:
-        yield text
-    else:
-        return
+        out.append(_escape_text(text))
+
 
+def _trans_span(elem, root, text, items, out):
+    _write_span(elem.attrib, text, out)
 
-def _trans_br(elem, root):
-    yield _E("br")
 
+def _trans_br(elem, root, text, items, out):
+    out.append("<br>")
 
-def _trans_audio(elem, root):
+
+def _trans_audio(elem, root, text, items, out):
     topic = elem.get("topic")
     res = elem.get("resource").lower()
     path = "audio:///{0}/{1}".format(res, topic.split("/")[-1])
@@ -338,30 +455,32 @@ def _trans_audio(elem, root):
         attrib["title"] = "Not Supported"
         img = "static:///images/speaker_eg.png"
 
-    children = (_E("img", {"src": img}),)
-    yield _E("a", attrib, children)
+    out.append(_start_tag("a", attrib))
+    out.append(_start_tag("img", {"src": img}))
+    out.append("</a>")
 
 
-def _trans_illustration(elem, root):
+def _trans_illustration(elem, root, text, items, out):
     topic = elem.get("thumb")
     filename = topic.split("/")[-1]
     path_thumb = "dict:///picture/thumbnail/" + filename
     path_full = "dict:///picture/fullsize/" + filename
     attrib = {"src": path_thumb, "style": "float: right"}
-    children = (_E("img", attrib),)
-    yield _E("a", {"class": "illust", "href": path_full}, children)
+    out.append(_start_tag("a", {"class": "illust", "href": path_full}))
+    out.append(_start_tag("img", attrib))
+    out.append("</a>")
 
 
-def _trans_skip(elem, root):
-    return ()
+def _trans_skip(elem, root, text, items, out):
+    pass
 
 
-def _trans_hwd(elem, root):
-    if root.find("Head/HYPHENATION") is None:
-        hwd = elem
-        if hwd is not None:
-            yield _E("span", {"class": "hwd"}, [hwd.text])
-    return
+def _trans_hwd(elem, root, text, items, out):
+    if HEAD_HYPHENATION.find(root) is None:
+        out.append('<span class="hwd">')
+        if text is not None:
+            out.append(_escape_text(text))
+        out.append("</span>")
 
 
 _TRANS_MAP = {
@@ -401,27 +520,15 @@ _TRANS_MAP = {
 }
 
 
-def _dispatch(elem, root):
-    """invoke a proper transformation function for a given element"""
-    f = _TRANS_MAP.get(elem.tag, _as_span)
-    return f(elem, root)
-
-
 def body2html(root):
-    _preprocess_span(root)
-    r = []
+    """Transform the element into HTML
 
-    # pass the root element to the dispatcher
-    for el in _dispatch(root, root):
-        if not isinstance(el, basestring):
-            r.append(tounicode(el, pretty_print=True, method="html"))
-
-    # replace some characters
-    body = "".join(r).translate({0x2027: 0xB7})
-    body = re.sub(r"([→►↔])", r"<span>\1</span>", body)
-    if platform.release() == "XP" and platform.system() == "Windows":
-        body = re.sub(
-            r"([\u02cc\u02c8\u2194])", r'<span class="winxpsym">\1</span>', body
-        )
+    The source tree is not modified, so that it can be rendered again.
+    """
 
-    return body
+    with hot_stats.timer("body2html"):
+        (_, item, _) = _normalize(root, root.getparent() is not None)
+        out = []
+        _write_item(item, root, out)
+        out.append("\n")
+        return "".join(out)
@@ -14,6 +14,8 @@ from PySide6.QtGui import QIcon
 from PySide6.QtWidgets import QLineEdit
 
 from .. import __author__
+from ..utils.metrics import hot_stats
+from ..utils.profiler import ProfileSession, timestamped_path
 from .config import get_config
 from .utils.error import MyStreamHandler, StdErrWrapper
 from .utils.singleapp import SingleApplication
@@ -53,8 +55,23 @@ def run(argv):
 
     # Parse arguments
     optparser = OptionParser()
-    optparser.set_defaults(debug=False)
+    optparser.set_defaults(debug=False, stats=False, trace_alloc=False)
     optparser.add_option("--debug", action="store_true", help="Enable debug mode")
+    optparser.add_option(
+        "--stats",
+        action="store_true",
+        help="Collect the timings of loading content (see static:///stats)",
+    )
+    optparser.add_option(
+        "--profile-out",
+        metavar="FILE",
+        help="Profile the main thread and write the pstats to FILE on exit",
+    )
+    optparser.add_option(
+        "--trace-alloc",
+        action="store_true",
+        help="Trace memory allocations and write a snapshot on exit",
+    )
     (options, args) = optparser.parse_args(argv)
 
     # stderr wrapper
@@ -73,6 +90,9 @@ def run(argv):
         app.sendMessage("activate")
         return 1
 
+    # Timings of loading content
+    hot_stats.enabled = options.stats
+
     # Load the configuration file
     config.debug = options.debug
     config.load()
@@ -82,6 +102,17 @@ def run(argv):
     app.setOrganizationName(__author__)
     app.setWindowIcon(QIcon(":/icons/icon.png"))
 
+    # Profiling session from the creation of the main window to the exit
+    session = None
+    if options.profile_out or options.trace_alloc:
+        pstats_path = snapshot_path = None
+        if options.profile_out:
+            pstats_path = os.path.join(config.profile_dir, options.profile_out)
+        if options.trace_alloc:
+            snapshot_path = timestamped_path(config.profile_dir, "alloc", ".snapshot")
+        session = ProfileSession(pstats_path, snapshot_path)
+        session.start()
+
     # Setup MainWindow
     from .main import MainWindow
 
@@ -113,7 +144,12 @@ def run(argv):
         sys.stderr.setApplication(app)
 
     # Start the application
-    r = app.exec()
+    try:
+        r = app.exec()
+    finally:
+        if session:
+            for path in session.stop():
+                logging.getLogger(__name__).info("profile written to %s", path)
 
     # Quit
     config.save()
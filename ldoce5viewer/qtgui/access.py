@@ -4,6 +4,7 @@ import imp
 import os.path
 import sys
 import traceback
+from html import escape
 
 from PySide6.QtCore import QBuffer, QUrl, QUrlQuery
 from PySide6.QtMultimedia import QMediaPlayer, QAudioOutput
@@ -15,6 +16,7 @@ from PySide6.QtWebEngineCore import (
 from .. import __name__ as basepkgname
 from .. import __version__
 from ..ldoce5 import LDOCE5, ArchiveError, FilemapError, NotFoundError
+from ..utils.metrics import hot_stats
 from ..utils.text import enc_utf8
 from .advanced import search_and_render
 from .config import get_config
@@ -71,6 +73,47 @@ def _load_static_data(filename):
     return data
 
 
+def _stats_page():
+    """Render the timings of serving content (static:///stats)"""
+
+    if not hot_stats.enabled:
+        return (
+            "<h2>Statistics</h2>"
+            "<p>Not collected. Start the viewer with --stats.</p>"
+        )
+
+    def ms(seconds):
+        return "{0:.2f}".format(seconds * 1000)
+
+    r = [
+        "<h2>Statistics</h2><table><tr><th>step</th><th>count</th>"
+        "<th>total (ms)</th><th>mean (ms)</th><th>max (ms)</th></tr>"
+    ]
+    for (name, count, total, longest) in hot_stats.counters():
+        r.append(
+            "<tr><td>{0}</td><td>{1}</td><td>{2}</td><td>{3}</td>"
+            "<td>{4}</td></tr>".format(
+                escape(name), count, ms(total), ms(total / count), ms(longest)
+            )
+        )
+    r.append("</table><h3>Slowest recent requests</h3><table>")
+    r.append("<tr><th>ms</th><th>path</th><th>steps (ms)</th></tr>")
+    for (elapsed, path, steps) in hot_stats.slowest():
+        r.append(
+            "<tr><td>{0}</td><td>{1}</td><td>{2}</td></tr>".format(
+                ms(elapsed),
+                escape(path),
+                escape(
+                    ", ".join(
+                        "{0} {1}".format(k, ms(v)) for (k, v) in sorted(steps.items())
+                    )
+                ),
+            )
+        )
+    r.append("</table>")
+    return "".join(r)
+
+
 class MyUrlSchemeHandler(QWebEngineUrlSchemeHandler):
     def __init__(self, parent, searcher_hp=None, searcher_de=None):
         super().__init__(parent)
@@ -107,6 +150,9 @@ class MyUrlSchemeHandler(QWebEngineUrlSchemeHandler):
             except ArchiveError:
                 data = b"<h2>Dictionary Data Not Available</h2>"
                 mime = "text/html"
+        elif scheme == "static" and url.path().lstrip("/") == "stats":
+            data = enc_utf8(_stats_page())
+            mime = "text/html"
         elif scheme == "static":
             try:
                 data = _load_static_data(url.path().lstrip("/"))
@@ -11,6 +11,9 @@ from ..utils.text import MATCH_CLOSE_TAG, MATCH_OPEN_TAG
 from .config import get_config
 from .ui.advanced import Ui_Dialog
 
+# Number of results rendered per page
+_PAGE_SIZE = 300
+
 
 class AdvancedSearchDialog(QDialog):
     """The 'Advanced Search' dialog"""
@@ -179,6 +182,18 @@ ADV_HEADER = """<!DOCTYPE html>
 <body>"""
 
 
+def _make_search_url(phrase, filters, mode, page=None):
+    q = QUrlQuery()
+    if phrase:
+        q.addQueryItem("phrase", phrase)
+    if filters:
+        q.addQueryItem("filters", filters)
+    q.addQueryItem("mode", mode)
+    if page:
+        q.addQueryItem("page", str(page))
+    return QUrl("search:///?" + q.toString())
+
+
 def _render_header(title, mode, phrase, filters):
     r = []
     r.append(ADV_HEADER)
@@ -189,13 +204,7 @@ def _render_header(title, mode, phrase, filters):
     modes.sort(key=itemgetter(0))
 
     for (name, spec) in modes:
-        q = QUrlQuery()
-        if phrase:
-            q.addQueryItem("phrase", phrase)
-        if filters:
-            q.addQueryItem("filters", filters)
-        q.addQueryItem("mode", name)
-        href = QUrl("search:///?" + q.toString())
+        href = _make_search_url(phrase, filters, name)
         if name != mode:
             r.append(
                 '<li><a href="{href}">{title}</a></li>\n'.format(
@@ -211,6 +220,14 @@ def _render_header(title, mode, phrase, filters):
     return "".join(r)
 
 
+def _render_more(next_url):
+    if next_url is None:
+        return ""
+    return '<p class="more"><a href="{0}">Load more results</a></p>\n'.format(
+        next_url.toString()
+    )
+
+
 def _render_footer():
     return "</head></body>"
 
@@ -220,11 +237,12 @@ def _replace_tags(s):
     return MATCH_CLOSE_TAG.sub("</span>", s)
 
 
-def _render_defexa(items, mode):
+def _render_defexa(items, mode, first_page=True):
     r = []
 
     if not items:
-        r.append('<p class="no">No Items Found</p>\n')
+        if first_page:
+            r.append('<p class="no">No Items Found</p>\n')
     else:
         r.append('<ul class="result r_{0}">\n'.format(mode))
         for item in items:
@@ -247,19 +265,21 @@ def _render_defexa(items, mode):
     return "".join(r)
 
 
-def _render_hwdphr(items, mode):
+def _render_hwdphr(items, mode, first_page=True):
     r = []
     if not items:
-        r.append('<p class="no">No Items Found</p>\n')
+        if first_page:
+            r.append('<p class="no">No Items Found</p>\n')
     else:
-        r.append('<ul class="excmd">\n')
-        if mode in ("headwords", "phrasalverbs"):
-            r.append(
-                """<li><a href="javascript:void(0)" onclick="$('.label_p').hide();"""
-                """$('.label_s').hide(); $(this).hide();">"""
-                """Hide extra information</a></li>"""
-            )
-        r.append("</ul>\n")
+        if first_page:
+            r.append('<ul class="excmd">\n')
+            if mode in ("headwords", "phrasalverbs"):
+                r.append(
+                    """<li><a href="javascript:void(0)" """
+                    """onclick="$('body').addClass('noextra'); $(this).hide();">"""
+                    """Hide extra information</a></li>"""
+                )
+            r.append("</ul>\n")
 
         r.append('<ul class="result r_{0}">\n'.format(mode))
         for item in items:
@@ -279,21 +299,35 @@ def search_and_render(url, fulltext_hp, fulltext_de):
     mode = query.get("mode", None)
     phrase = query.get("phrase", None)
     filters = query.get("filters", None)
+    try:
+        page = max(1, int(query.get("page", 1)))
+    except ValueError:
+        page = 1
 
     r = []
     if mode in MODE_DICT:
         spec = MODE_DICT[mode]
         searcher = fulltext_hp if (spec["searcher"] == "hp") else fulltext_de
         collector = searcher.make_collector(spec["limit"])
+
+        # fetch one extra item to know whether there is a next page
         res = searcher.search(
             collector,
             query_str1=phrase,
             query_str2=filters,
             itemtypes=spec["itemtypes"],
             highlight=spec["highlight"],
+            offset=(page - 1) * _PAGE_SIZE,
+            count=_PAGE_SIZE + 1,
         )
+        next_url = None
+        if len(res) > _PAGE_SIZE:
+            del res[_PAGE_SIZE:]
+            next_url = _make_search_url(phrase, filters, mode, page + 1)
+
         r.append(_render_header(spec["title"], mode, phrase, filters))
-        r.append(spec["renderer"](res, mode))
+        r.append(spec["renderer"](res, mode, first_page=(page == 1)))
+        r.append(_render_more(next_url))
         r.append(_render_footer())
     else:
         r.append(_render_header("Advanced Search", mode, phrase, filters))
@@ -41,9 +41,16 @@ class _FTSearchThread(QThread):
                 self._collector = collector
                 self._mutex.unlock()
 
+                # successive queries typed in the search box are
+                # usually refinements of the previous ones
                 try:
                     result = self._searcher.search(
-                        collector, query_str1, query_str2, itemtypes, highlight
+                        collector,
+                        query_str1,
+                        query_str2,
+                        itemtypes,
+                        highlight,
+                        refine=True,
                     )
                 except Exception:
                     self._mutex.lock()
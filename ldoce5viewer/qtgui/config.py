@@ -141,6 +141,14 @@ class __Config(object):
     def fulltext_defexa_path(self):
         return os.path.join(self._data_dir, "fulltext_de")
 
+    @property
+    def profile_dir(self):
+        return self._config_dir
+
+    @property
+    def index_report_path(self):
+        return os.path.join(self._data_dir, "index_report.json")
+
     @property
     def scan_tmp_path(self):
         return os.path.join(self._data_dir, "scan" + self.tmp_suffix)
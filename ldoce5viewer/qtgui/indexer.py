@@ -1,32 +1,24 @@
 """Indexing thread and dialog window"""
 
+import logging
 import os
 import os.path
 import shutil
 
-import pickle
 import traceback
 from html import escape
-from struct import Struct
 
 from PySide6.QtCore import *
 from PySide6.QtWidgets import *
 
-import lxml.etree as et
-
-from .. import __version__, fulltext, incremental
-from ..ldoce5 import filemap, idmreader
-from ..ldoce5.extract import get_entry_items
+from .. import __version__, indexing
+from ..indexing import AbortIndexing, Progress, ScanTempFile
+from ..ldoce5 import idmreader
+from ..utils.metrics import StageMetrics
 from .config import get_config
 from .ui.indexer import Ui_Dialog
 
-_struct_I = Struct(b"<I")
-_pack_I = _struct_I.pack
-_unpack_I = _struct_I.unpack
-
-
-class AbortIndexing(Exception):
-    pass
+_logger = logging.getLogger(__name__)
 
 
 class IndexerDialog(QDialog):
@@ -169,286 +161,80 @@ class IndexingThread(QThread):
     def __init__(self, parent, srcdir):
         QThread.__init__(self, parent)
         self._srcdir = srcdir
-        self._abort = False
+        self._progress = Progress(self._message)
         self._succeeded = False
+        self._metrics = StageMetrics()
 
     @property
     def succeeded(self):
         return self._succeeded
 
     def abort(self):
-        self._abort = True
+        self._progress.abort()
 
     def _message(self, s):
         self.message.emit(s)
 
     def _make_index(self):
-        def scan_entries(scan_temp):
-            # entries
-            variations = {}
-            self._message("Scanning entry files...")
-            files = idmreader.list_files(self._srcdir, "fs")
-            count = 0
-            with idmreader.ArchiveReader(self._srcdir, "fs") as archive_reader:
-                for (dirs, name, location) in files:
-                    if self._abort:
-                        raise AbortIndexing()
-
-                    (items, var) = get_entry_items(archive_reader.read(location))
-
-                    for k in var:
-                        v = var[k]
-                        if not v:
-                            continue
-                        if k not in variations:
-                            variations[k] = set()
-                        variations[k].update(v)
-
-                    for (
-                        itemtype,
-                        label,
-                        path,
-                        content,
-                        sortkey,
-                        asfilter,
-                        prio,
-                    ) in items:
-
-                        count += 1
-                        if count % 10000 == 0:
-                            self._message("{0} items found".format(count))
-
-                        if itemtype == "hm":
-                            words = content.split()
-                            for w in words:
-                                if "-" in w:
-                                    content += " " + w.replace("-", "")
-
-                        scan_temp.append(
-                            (itemtype, label, path, content, sortkey, asfilter, prio)
-                        )
-
-            self._message("{0} items were found.".format(count))
-
-            # word variation database
-            self._message("Making the word variation database...")
-            with open(get_config().variations_path, "w+b") as f:
-                var_writer = fulltext.VariationsWriter(f)
-                for k in variations:
-                    v = variations[k]
-                    var_writer.add(k, v)
-
-                self._message("Finalizing...")
-                var_writer.finalize()
-                self._message("Done.")
-
-        def scan_activator(scan_temp):
-            self._message("Scanning language-activator files...")
-
-            # phrase to keywords
-            act_label_path = os.path.join(
-                self._srcdir, "activator.skn", "alpha_index.skn", "LABEL.tda"
-            )
-            with open(act_label_path, "rb") as f:
-                labels = f.read().split(b"\0")[:-1]
-
-            # activator sections
-            sections = {}
-            files = idmreader.list_files(self._srcdir, "activator_section")
-            with idmreader.ArchiveReader(self._srcdir, "activator_section") as cr:
-                for (dirs, name, location) in files:
-                    if self._abort:
-                        raise AbortIndexing()
-
-                    data = cr.read(location)
-                    root = et.fromstring(data)
-                    sid = root.get("id")
-                    sections[sid] = []
-                    for exp in root.iterfind("Exponent"):
-                        eid = exp.get("id")
-                        plain = "".join(exp.find("EXP").itertext()).strip()
-                        sections[sid].append((eid, plain))
-
-            # activator concepts
-            files = idmreader.list_files(self._srcdir, "activator_concept")
-            exponents = []
-            with idmreader.ArchiveReader(self._srcdir, "activator_concept") as cr:
-                for (dirs, name, location) in files:
-                    if self._abort:
-                        raise AbortIndexing()
-
-                    root = et.fromstring(cr.read(location))
-                    cid = root.get("id")
-                    hwd = root.find("HWD").text
-                    first_sid = root.find("Section").get("id")
-                    for h in hwd.split("/"):
-                        scan_temp.append(
-                            (
-                                "ac",
-                                "<a><c>{0}</c></a>".format(escape(h)),
-                                "/activator/{0}/{1}".format(cid, first_sid),
-                                h,
-                                h,
-                                "",
-                                50,
-                            )
-                        )
-
-                    for sno, section in enumerate(root.iterfind("Section")):
-                        sid = section.get("id")
-                        for (eid, plain) in sections[sid]:
-                            exponents.append((plain, hwd, cid, sid, eid, sno))
-
-            for (plain, hwd, cid, sid, eid, sno) in exponents:
-                if self._abort:
-                    raise AbortIndexing()
-
-                keywords = set([plain])
-                # if plain in phrase_keys:
-                #    keywords.update(phrase_keys[plain])
-                for keyword in keywords:
-                    scan_temp.append(
-                        (
-                            "ae",
-                            "<a><e>{0}</e> (<c>{1}<s>{2}</s></c>)</a>".format(
-                                escape(keyword), escape(hwd), sno + 1
-                            ),
-                            "/activator/{0}/{1}#{2}".format(cid, sid, eid),
-                            keyword,
-                            keyword,
-                            "",
-                            51,
-                        )
-                    )
-
-            self._message("Done.")
-
-        def make_incr(scan_temp):
-            self._message("Building the incremental search index...")
-            incr_maker = incremental.Maker(
-                get_config().incremental_path,
-                get_config().incremental_path + get_config().tmp_suffix,
-            )
-
-            i = 0
-            for (
-                itemtype,
-                label,
-                path,
-                content,
-                sortkey,
-                asfilter,
-                prio,
-            ) in scan_temp.iter_items():
-                if self._abort:
-                    raise AbortIndexing()
-                ty = itemtype[0]
-                if ty == "p" or ty == "h" or ty == "a":
-                    i += 1
-                    if i % 10000 == 0:
-                        self._message("{0} items added".format(i))
-                    incr_maker.add_item(content, itemtype, label, path, prio)
-
-            self._message("{0} items were added.".format(i))
-            self._message("Finalizing...")
-            incr_maker.finalize()
-
-            self._message("Done.")
-
-        def make_full_hp(scan_temp):
-            self._message(
-                "Building the full text search index " "for headwords and phrases..."
-            )
-            fulltext_hwdphr_maker = fulltext.Maker(get_config().fulltext_hwdphr_path)
-
-            i = 0
-            for (
-                itemtype,
-                label,
-                path,
-                content,
-                sortkey,
-                asfilter,
-                prio,
-            ) in scan_temp.iter_items():
-                if self._abort:
-                    raise AbortIndexing()
-                ty = itemtype[0]
-                if ty == "p" or ty == "h" or ty == "a":
-                    i += 1
-                    if i % 10000 == 0:
-                        self._message("{0} items added".format(i))
-                    fulltext_hwdphr_maker.add_item(
-                        itemtype, content, asfilter, label, path, prio, sortkey
-                    )
-
-            self._message("{0} items were added.".format(i))
-            self._message("Finalizing...")
-            self._message("Please wait a while...")
-            fulltext_hwdphr_maker.commit()
-            fulltext_hwdphr_maker.close()
-
-            self._message("Done.")
-
-        def make_full_de(scan_temp):
-            self._message(
-                "Building the full text search index " "for examples and definitions..."
-            )
-            fulltext_defexa_maker = fulltext.Maker(get_config().fulltext_defexa_path)
-
-            i = 0
-            for (
-                itemtype,
-                label,
-                path,
-                content,
-                sortkey,
-                asfilter,
-                prio,
-            ) in scan_temp.iter_items():
-                if self._abort:
-                    raise AbortIndexing()
-                ty = itemtype[0]
-                if ty == "d" or ty == "e":
-                    i += 1
-                    if i % 10000 == 0:
-                        self._message("{0} items added".format(i))
-                    fulltext_defexa_maker.add_item(
-                        itemtype, content, asfilter, label, path, prio, sortkey
-                    )
-
-            self._message("{0} items were added.".format(i))
-            self._message("Finalizing...")
-            self._message("Please wait a while...")
-            fulltext_defexa_maker.commit()
-            fulltext_defexa_maker.close()
-            self._message("Done.")
-
-        scan_temp = ScanTempFile(get_config().scan_tmp_path)
+        config = get_config()
+        srcdir = self._srcdir
+        progress = self._progress
+        stage = self._metrics.stage
+        scan_temp = ScanTempFile(config.scan_tmp_path)
         try:
-            scan_entries(scan_temp)
-            scan_activator(scan_temp)
-            make_incr(scan_temp)
-            make_full_hp(scan_temp)
-            make_full_de(scan_temp)
+            with stage("scan_entries") as st:
+                (st["items"], variations) = indexing.scan_entries(
+                    srcdir, scan_temp, progress
+                )
+            with stage("variations") as st:
+                st["items"] = indexing.make_variations(
+                    config.variations_path, variations, progress
+                )
+            del variations
+            with stage("scan_activator") as st:
+                st["items"] = indexing.scan_activator(srcdir, scan_temp, progress)
+            with stage("incremental") as st:
+                st["items"] = indexing.make_incremental(
+                    config.incremental_path,
+                    config.incremental_path + config.tmp_suffix,
+                    scan_temp.iter_items(),
+                    progress,
+                )
+            with stage("full_hp") as st:
+                st["items"] = indexing.make_fulltext(
+                    config.fulltext_hwdphr_path,
+                    scan_temp.iter_items(),
+                    "pha",
+                    "headwords and phrases",
+                    progress,
+                )
+            with stage("full_de") as st:
+                st["items"] = indexing.make_fulltext(
+                    config.fulltext_defexa_path,
+                    scan_temp.iter_items(),
+                    "de",
+                    "examples and definitions",
+                    progress,
+                )
         finally:
             scan_temp.remove()
 
     def _make_filemap(self):
-        self._message("Building the file-location lookup table...")
-        with open(get_config().filemap_path, "w+b") as f:
-            maker = filemap.FilemapMaker(f)
-            for archive_name in idmreader.get_archive_names():
-                self._message("Analyzing '{0}'...".format(archive_name))
-                file_iter = filemap.list_files(self._srcdir, archive_name)
-                for (name, location) in file_iter:
-                    if self._abort:
-                        raise AbortIndexing()
-
-                    maker.add(archive_name, name, location)
+        with self._metrics.stage("filemap") as st:
+            st["items"] = indexing.make_filemap(
+                self._srcdir, get_config().filemap_path, self._progress
+            )
 
-            self._message("Finalizing...")
-            maker.finalize()
+    def _write_report(self):
+        """Write the timings of the stages to the data directory"""
+        lines = self._metrics.format()
+        for line in lines:
+            _logger.debug(line)
+        self._message("<pre>{0}</pre>".format(escape("\n".join(lines))))
+        try:
+            self._metrics.write_json(get_config().index_report_path)
+        except EnvironmentError:
+            pass
 
     def _remove_all(self):
         def rm(path):
@@ -484,6 +270,8 @@ class IndexingThread(QThread):
             )
             err = True
 
+        self._write_report()
+
         if err:
             try:
                 self._message("Removing files...")
@@ -493,31 +281,3 @@ class IndexingThread(QThread):
         else:
             self._succeeded = True
 
-
-class ScanTempFile(object):
-    def __init__(self, path):
-        self._path = path
-        self._n = 0
-        self._f = open(path, "w+b")
-
-    def append(self, item):
-        data = pickle.dumps(item)
-        f = self._f
-        f.write(_pack_I(len(data)))
-        f.write(data)
-        self._n += 1
-
-    def iter_items(self):
-        f = self._f
-        f.seek(0)
-        for _ in range(self._n):
-            (lendata,) = _unpack_I(f.read(4))
-            data = f.read(lendata)
-            yield pickle.loads(data)
-
-    def remove(self):
-        self._f.close()
-        try:
-            os.remove(self._path)
-        except EnvironmentError:
-            pass
@@ -2,7 +2,6 @@
 
 import sys
 import webbrowser
-from difflib import SequenceMatcher
 from functools import partial
 from operator import itemgetter
 
@@ -22,6 +21,9 @@ from PySide6.QtWebEngineCore import QWebEnginePage, QWebEngineProfile
 
 from .. import fulltext, incremental
 from ..ldoce5.idmreader import is_ldoce5_dir
+from ..utils.profiler import ProfileSession, timestamped_path
+from ..utils.results import MergedResults
+from ..utils.similarity import quick_ratio_ranker
 from ..utils.text import MATCH_CLOSE_TAG, MATCH_OPEN_TAG, ellipsis, normalize_index_key
 from .access import MyUrlSchemeHandler, _load_static_data
 from .advanced import AdvancedSearchDialog
@@ -37,6 +39,7 @@ _FTS_HWDPHR_LIMIT = 10000
 _INCREMENTAL_LIMIT = 500
 _MAX_DELAY_UPDATE_INDEX = 100
 _INTERVAL_AUTO_PRON = 500
+_FUZZY_RANKER = quick_ratio_ranker
 _LOCAL_SCHEMES = frozenset(("dict", "static", "search", "audio", "lookup"))
 _HELP_PAGE_URL = "https://forward-backward.co.jp/ldoce5viewer/manual/"
 
@@ -57,6 +60,18 @@ def _incr_delay_func(count):
     x = max(0.3, min(1, float(count) / _INCREMENTAL_LIMIT))
     return int(_MAX_DELAY_UPDATE_INDEX * x)
 
+
+def _index_item_html(item):
+    """Convert the label of an item into HTML for the index list"""
+
+    def opentag(m):
+        return "".join(('<span class="', m.group(1), '">'))
+
+    s = MATCH_CLOSE_TAG.sub("</span>", item[0])
+    s = MATCH_OPEN_TAG.sub(opentag, s)
+    return "".join(("<body>", s, "</body>"))
+
+
 class MainWindow(QMainWindow):
 
     # ------------
@@ -83,6 +98,7 @@ class MainWindow(QMainWindow):
         self._selection_pending = False
         self._loading_pending = False
         self._auto_fts_phrase = None
+        self._profile_session = None
 
         # Lazy-loaded objects
         self._lazy = {}
@@ -131,7 +147,7 @@ class MainWindow(QMainWindow):
 
         # Stylesheet for the item list pane
         try:
-            self._ui.listWidgetIndex.setStyleSheet(
+            self._ui.listViewIndex.setStyleSheet(
                 _load_static_data("styles/list.css").decode("utf-8", "ignore")
             )
         except EnvironmentError:
@@ -168,6 +184,7 @@ class MainWindow(QMainWindow):
                 lazy[_LAZY_ADVSEARCH_WINDOW].close()
             self._save_to_configfile()
             self._unload_searchers()
+            self._stop_profile_session()
             super(MainWindow, self).closeEvent(event)
         else:
             self.hide()
@@ -279,18 +296,7 @@ class MainWindow(QMainWindow):
     def _updateIndex(self):
         """Update the item list"""
 
-        text_getter = itemgetter(0)
-        path_getter = itemgetter(1)
-
-        def _replace_htmltags(s):
-            def opentag(m):
-                return "".join(('<span class="', m.group(1), '">'))
-
-            s = MATCH_CLOSE_TAG.sub("</span>", s)
-            s = MATCH_OPEN_TAG.sub(opentag, s)
-            return "".join(("<body>", s, "</body>"))
-
-        lw = self._ui.listWidgetIndex
+        lv = self._ui.listViewIndex
 
         incr_res = self._incr_results
         full_res = self._fts_results
@@ -306,55 +312,36 @@ class MainWindow(QMainWindow):
             self._timerSpellCorrection.start(200)
 
         # Escape the previous selection
-        row_prev = lw.currentRow()
+        row_prev = lv.currentRow()
         selected_prev = None
         if row_prev != -1:
             selected_prev = self._found_items[row_prev]
 
         # Update Index
-        if incr_res and full_res:
-            closed = set(map(path_getter, incr_res))
-            self._found_items = incr_res + tuple(
-                item for item in full_res if path_getter(item) not in closed
-            )
-        elif incr_res:
-            self._found_items = tuple(incr_res)
-        elif full_res:
-            self._found_items = tuple(full_res)
-        else:
-            self._found_items = tuple()
+        self._found_items = MergedResults(incr_res or (), full_res or ())
 
         del incr_res
         del full_res
 
-        # Create a new list
-        items = tuple(
-            _replace_htmltags(text_getter(item)) for item in self._found_items
-        )
-        lw.clear()
-        lw.addItems(items)
+        # Replace the list; the rows are formatted when they are painted
+        lv.setItems(self._found_items, _index_item_html)
 
         # Restore the previous selection
         if selected_prev:
-            comparer = itemgetter(2, 3, 1)  # (sortkey, prio, path)
-            current = comparer(selected_prev)
-            for row in range(len(self._found_items)):
-                if comparer(self._found_items[row]) == current:
-                    lw.setCurrentRow(row)
-                    break
+            row = self._found_items.row_of_item(selected_prev)
+            if row >= 0:
+                lv.setCurrentRow(row)
 
         url = self._ui.webView.url().toString()
         sel_row = -1
-        for (row, path) in enumerate(map(path_getter, self._found_items)):
-            if "dict:" + path == url:
-                sel_row = row
-                break
+        if url.startswith("dict:"):
+            sel_row = self._found_items.row_of_path(url[len("dict:") :])
 
         if sel_row >= 0:
-            lw.setCurrentRow(sel_row)
-            lw.scrollToItem(lw.item(sel_row), QAbstractItemView.ScrollHint.EnsureVisible)
+            lv.setCurrentRow(sel_row)
+            lv.scrollToRow(sel_row, QAbstractItemView.ScrollHint.EnsureVisible)
         else:
-            lw.scrollToTop()
+            lv.scrollToTop()
 
         if self._selection_pending:
             self._selection_pending = False
@@ -373,8 +360,8 @@ class MainWindow(QMainWindow):
             return
 
         ui = self._ui
-        lw = ui.listWidgetIndex
-        row_prev = lw.currentRow()
+        lv = ui.listViewIndex
+        row_prev = lv.currentRow()
         sortkey_getter = itemgetter(2)
 
         if row_prev == -1 or ui.lineEditSearch.hasFocus():
@@ -383,29 +370,21 @@ class MainWindow(QMainWindow):
             sortkey_iter = map(sortkey_getter, self._found_items)
             for (row, sortkey) in enumerate(sortkey_iter):
                 if sortkey.lower().startswith(text):
-                    lw.setFocus()
-                    lw.setCurrentRow(row)
+                    lv.setFocus()
+                    lv.setCurrentRow(row)
                     return
 
             # find the most similar item
-            row = -1
-            sm = SequenceMatcher(a=text)
-            max_ratio = 0
-            sortkeys = map(sortkey_getter, self._found_items)
-            for (r, sortkey) in enumerate(sortkeys):
-                sm.set_seq2(sortkey)
-                ratio = sm.quick_ratio()
-                if ratio > max_ratio:
-                    max_ratio = ratio
-                    row = r
-            lw.setFocus()
-            lw.setCurrentRow(row)
+            sortkeys = list(map(sortkey_getter, self._found_items))
+            row = _FUZZY_RANKER(text, sortkeys)
+            lv.setFocus()
+            lv.setCurrentRow(row)
 
         else:
             row = max(0, min(len(self._found_items) - 1, row_prev + rel))
             if row != row_prev:
-                lw.setFocus()
-                lw.setCurrentRow(row)
+                lv.setFocus()
+                lv.setCurrentRow(row)
 
     def _loadItem(self, row=None):
         if not self._found_items:
@@ -413,7 +392,7 @@ class MainWindow(QMainWindow):
             return
 
         if row is None:
-            row = self._ui.listWidgetIndex.currentRow()
+            row = self._ui.listViewIndex.currentRow()
 
         if 0 <= row < len(self._found_items):
             path = self._found_items[row][1]
@@ -422,9 +401,9 @@ class MainWindow(QMainWindow):
                 self._ui.webView.page().load(url)
 
     def _onItemSelectionChanged(self):
-        selitems = self._ui.listWidgetIndex.selectedItems()
-        if selitems and QApplication.mouseButtons() != Qt.MouseButton.NoButton:
-            self._loadItem(self._ui.listWidgetIndex.row(selitems[0]))
+        selrows = self._ui.listViewIndex.selectedRows()
+        if selrows and QApplication.mouseButtons() != Qt.MouseButton.NoButton:
+            self._loadItem(selrows[0])
 
     # ---------
     # Search
@@ -488,7 +467,11 @@ class MainWindow(QMainWindow):
     def _onTimerSpellCorrection(self):
         query = self._ui.lineEditSearch.text()
         if len(query.split()) == 1:
-            words = self._fts_hwdphr.correct(query)
+            # whoosh may still correct the words which are too far from
+            # every key for the DAWG
+            words = self._incremental_suggest(query)
+            if not words:
+                words = self._fts_hwdphr.correct(query)
             cmpl = QCompleter(words, self)
             cmpl.setModelSorting(QCompleter.ModelSorting.UnsortedModel)
             cmpl.setCompletionMode(QCompleter.CompletionMode.UnfilteredPopupCompletion)
@@ -505,10 +488,23 @@ class MainWindow(QMainWindow):
             return None
         else:
             try:
-                return self._incremental.search(key, limit=_INCREMENTAL_LIMIT)
+                return self._incremental.search(
+                    key, limit=_INCREMENTAL_LIMIT, ranked=True
+                )
             except (EnvironmentError, incremental.IndexError):
                 return None
 
+    def _incremental_suggest(self, key):
+        """Return the spelling suggestions from the incremental search index,
+        or None if the index doesn't provide them"""
+        incr = self._incremental
+        if not incr or not incr.has_suggest():
+            return None
+        try:
+            return incr.suggest(key, prefix=True)
+        except (EnvironmentError, incremental.IndexError):
+            return None
+
     def _onAsyncFTSearchFinished(self):
         self._timerSearchingLabel.stop()
         self._ui.labelSearching.hide()
@@ -854,6 +850,34 @@ class MainWindow(QMainWindow):
     def _onAbout(self):
         self._ui.webView.page().load(QUrl("static:///documents/about.html"))
 
+    def _onRecordProfileToggled(self, checked):
+        if checked:
+            profile_dir = get_config().profile_dir
+            session = ProfileSession(
+                timestamped_path(profile_dir, "profile", ".pstats"),
+                timestamped_path(profile_dir, "alloc", ".snapshot"),
+            )
+            try:
+                session.start()
+            except RuntimeError as e:
+                self._ui.actionRecordProfile.setChecked(False)
+                QMessageBox.warning(self, "Record Profile", str(e))
+                return
+            self._profile_session = session
+        else:
+            self._stop_profile_session(notify=True)
+
+    def _stop_profile_session(self, notify=False):
+        session = self._profile_session
+        self._profile_session = None
+        if session is None:
+            return
+        paths = session.stop()
+        if notify and paths:
+            QMessageBox.information(
+                self, "Record Profile", "Written:\n" + "\n".join(paths)
+            )
+
     # ----------
     # Indexer
     # ----------
@@ -1047,7 +1071,7 @@ class MainWindow(QMainWindow):
         webpage.action(QWebEnginePage.WebAction.Back).changed.connect(self._onNavActionChanged)
 
         # ListView
-        ui.listWidgetIndex.setAttribute(Qt.WidgetAttribute.WA_MacShowFocusRect, False)
+        ui.listViewIndex.setAttribute(Qt.WidgetAttribute.WA_MacShowFocusRect, False)
 
         # WebView
         for web_act in (
@@ -1095,7 +1119,7 @@ class MainWindow(QMainWindow):
             partial(self.setFindbarVisible, visible=False)
         )
         ui.lineEditFind.shiftReturnPressed.connect(self.findPrev)
-        ui.listWidgetIndex.itemSelectionChanged.connect(self._onItemSelectionChanged)
+        ui.listViewIndex.itemSelectionChanged.connect(self._onItemSelectionChanged)
         # FIXME(wontfix): webpage.linkClicked.connect(self._onWebViewLinkClicked)
         ui.webView.loadStarted.connect(partial(self.setFindbarVisible, visible=False))
         ui.webView.wheelWithCtrl.connect(self._onWebViewWheelWithCtrl)
@@ -1123,6 +1147,7 @@ class MainWindow(QMainWindow):
         act_conn(ui.actionZoomOut, partial(self.setZoom, -1, relative=True))
         act_conn(ui.actionNormalSize, partial(self.setZoom, 0))
         act_conn(ui.actionMonitorClipboard, self._onMonitorClipboardChanged)
+        ui.actionRecordProfile.toggled.connect(self._onRecordProfileToggled)
         act_conn(ui.actionFind, partial(self.setFindbarVisible, visible=True))
         act_conn(ui.actionFindClose, partial(self.setFindbarVisible, visible=False))
         act_conn(
@@ -1266,6 +1291,12 @@ class MainWindow(QMainWindow):
 
         obj = self._lazy.pop(_LAZY_INCREMENTAL, None)
         if obj:
+            # the incremental search results are read from the index on access
+            if self._incr_results:
+                self._incr_results = tuple(map(tuple, self._incr_results))
+            if self._found_items:
+                self._found_items = self._found_items.detached()
+                self._ui.listViewIndex.setItems(self._found_items, _index_item_html)
             obj.close()
 
     @property
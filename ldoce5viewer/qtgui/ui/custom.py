@@ -6,6 +6,7 @@ from PySide6.QtWebEngineCore import QWebEnginePage
 from PySide6.QtWebEngineWidgets import *
 from PySide6.QtWidgets import *
 
+from ...utils.cache import LRUCache
 from ...utils.text import ellipsis
 
 DisplayRole = Qt.ItemDataRole.DisplayRole
@@ -113,7 +114,46 @@ class LineEditFind(QLineEdit):
             super(LineEditFind, self).keyPressEvent(event)
 
 
-class HtmlListWidget(QListWidget):
+class HtmlListModel(QAbstractListModel):
+    """List model of items formatted into rich text on demand"""
+
+    _CACHE_SIZE = 1000
+
+    def __init__(self, parent=None):
+        super(HtmlListModel, self).__init__(parent)
+        self._items = ()
+        self._formatter = None
+        self._cache = LRUCache(self._CACHE_SIZE)
+
+    def setItems(self, items, formatter):
+        self.beginResetModel()
+        self._items = items
+        self._formatter = formatter
+        self._cache.clear()
+        self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self._items)
+
+    def data(self, index, role=DisplayRole):
+        if role != DisplayRole or not index.isValid():
+            return None
+        row = index.row()
+        html = self._cache.get(row)
+        if html is None:
+            html = self._formatter(self._items[row])
+            self._cache.put(row, html)
+        return html
+
+
+class HtmlListView(QListView):
+    """List view of rich-text items
+
+    Only the rows being painted are formatted, so replacing the items
+    costs the same regardless of their number."""
+
     class HtmlItemDelegate(QStyledItemDelegate):
 
         MARGIN_H = 5
@@ -125,7 +165,7 @@ class HtmlListWidget(QListWidget):
             MARGIN_V = 5
 
         def __init__(self, parent=None):
-            super(HtmlListWidget.HtmlItemDelegate, self).__init__(parent)
+            super(HtmlListView.HtmlItemDelegate, self).__init__(parent)
             self._doc = QTextDocument()
             self._doc.setDocumentMargin(0)
             self._item_size = None
@@ -156,11 +196,35 @@ class HtmlListWidget(QListWidget):
             self._doc.setDefaultStyleSheet(s)
             self._item_size = None
 
+    itemSelectionChanged = Signal()
+
     def __init__(self, parent):
-        super(HtmlListWidget, self).__init__(parent)
-        QListWidget.setStyleSheet(self, "QListWidget{background-color: white;}")
-        self._item_delegate = HtmlListWidget.HtmlItemDelegate(parent)
+        super(HtmlListView, self).__init__(parent)
+        QListView.setStyleSheet(self, "QListView{background-color: white;}")
+        self._item_delegate = HtmlListView.HtmlItemDelegate(parent)
         self.setItemDelegate(self._item_delegate)
+        self.setUniformItemSizes(True)
+        self._model = HtmlListModel(self)
+        self.setModel(self._model)
+        self.selectionModel().selectionChanged.connect(self.itemSelectionChanged)
+
+    def setItems(self, items, formatter):
+        """Show the items, each of which is converted by the formatter
+        into rich text when it is painted"""
+        self._model.setItems(items, formatter)
+
+    def currentRow(self):
+        index = self.currentIndex()
+        return index.row() if index.isValid() else -1
+
+    def setCurrentRow(self, row):
+        self.setCurrentIndex(self._model.index(row))
+
+    def selectedRows(self):
+        return [index.row() for index in self.selectedIndexes()]
+
+    def scrollToRow(self, row, hint=QAbstractItemView.ScrollHint.EnsureVisible):
+        self.scrollTo(self._model.index(row), hint)
 
     def keyPressEvent(self, event):
         event.ignore()
@@ -0,0 +1,19 @@
+$(function () {
+    // "Load more results": fetch the next page and append its items
+    $(document).on('click', 'p.more a', function (event) {
+        var link = $(this);
+        var href = link.attr('href');
+        event.preventDefault();
+        if (link.hasClass('loading')) {
+            return;
+        }
+        link.addClass('loading');
+        $.get(href, function (data) {
+            var page = $('<div>').append($.parseHTML(data));
+            $('ul.result').last().append(page.find('ul.result > li'));
+            link.parent().replaceWith(page.find('p.more'));
+        }).fail(function () {
+            window.location.href = href;
+        });
+    });
+});
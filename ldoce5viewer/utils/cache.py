@@ -0,0 +1,76 @@
+"""A small thread-safe LRU cache"""
+
+from collections import OrderedDict, namedtuple
+from threading import Lock
+
+CacheInfo = namedtuple("CacheInfo", "hits misses maxsize currsize weight")
+
+
+class LRUCache(object):
+    """LRU mapping bounded by the number of entries and,
+    optionally, by the total weight of the values"""
+
+    def __init__(self, maxsize, maxweight=None, weigher=len):
+        self._maxsize = maxsize
+        self._maxweight = maxweight
+        self._weigher = weigher
+        self._dict = OrderedDict()
+        self._weight = 0
+        self._hits = 0
+        self._misses = 0
+        self._lock = Lock()
+
+    def __len__(self):
+        return len(self._dict)
+
+    def __contains__(self, key):
+        return key in self._dict
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                (value, weight) = self._dict[key]
+            except KeyError:
+                self._misses += 1
+                return default
+            self._dict.move_to_end(key)
+            self._hits += 1
+            return value
+
+    def peek(self, key, default=None):
+        """Same as get() but doesn't affect the order and the statistics"""
+        with self._lock:
+            try:
+                return self._dict[key][0]
+            except KeyError:
+                return default
+
+    def put(self, key, value):
+        weight = self._weigher(value) if self._maxweight is not None else 0
+        if self._maxweight is not None and weight > self._maxweight:
+            return
+
+        with self._lock:
+            d = self._dict
+            old = d.pop(key, None)
+            if old is not None:
+                self._weight -= old[1]
+            d[key] = (value, weight)
+            self._weight += weight
+
+            while len(d) > self._maxsize or (
+                self._maxweight is not None and self._weight > self._maxweight
+            ):
+                (_, (_, w)) = d.popitem(last=False)
+                self._weight -= w
+
+    def clear(self):
+        with self._lock:
+            self._dict.clear()
+            self._weight = 0
+
+    def info(self):
+        with self._lock:
+            return CacheInfo(
+                self._hits, self._misses, self._maxsize, len(self._dict), self._weight
+            )
@@ -0,0 +1,207 @@
+"""Timing and resource metrics"""
+
+import json
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager, nullcontext
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+class IOStats(object):
+    """Bytes read from the archives and inflated by this process
+
+    The counters are updated by the reading threads, e.g. the indexing
+    thread, while another thread takes the totals.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._read = 0
+        self._inflated = 0
+
+    def add(self, read, inflated):
+        with self._lock:
+            self._read += read
+            self._inflated += inflated
+
+    def totals(self):
+        """Return (bytes read, bytes inflated)"""
+        with self._lock:
+            return (self._read, self._inflated)
+
+
+io_stats = IOStats()
+
+_ROW_FORMAT = "{0:<16}{1:>9}{2:>9}{3:>10}{4:>10}{5:>10}{6:>10}{7:>10}"
+_ROW_TITLES = (
+    "stage", "wall(s)", "cpu(s)", "items/s", "read(MB)", "infl(MB)",
+    "peak(MB)", "grow(MB)",
+)
+
+
+def peak_rss():
+    """Return the peak resident set size of the process in bytes, or None"""
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # in kilobytes except on macOS
+    return rss if sys.platform.startswith("darwin") else rss * 1024
+
+
+class StageMetrics(object):
+    """Wall/CPU time, items/sec, archive bytes read/inflated and peak RSS
+    of each stage of a job
+
+    The CPU time is that of the calling thread. The archive I/O counts the
+    reads of all the threads of the process.
+
+    The peak RSS is the high-water mark of the process, which can't be
+    reset: process_peak_rss is its value at the end of the stage and
+    peak_rss_growth how much the stage raised it. A stage which stays
+    below the peak of an earlier one has no growth.
+    """
+
+    def __init__(self):
+        self.stages = []
+
+    @contextmanager
+    def stage(self, name):
+        """Measure a stage; the caller sets record["items"]"""
+        record = dict(name=name, items=0)
+        wall = time.perf_counter()
+        cpu = time.thread_time()
+        (read, inflated) = io_stats.totals()
+        rss = peak_rss()
+        try:
+            yield record
+        finally:
+            wall = time.perf_counter() - wall
+            (total_read, total_inflated) = io_stats.totals()
+            process_rss = peak_rss()
+            record.update(
+                wall=wall,
+                cpu=time.thread_time() - cpu,
+                items_per_sec=record["items"] / wall if wall > 0 else 0.0,
+                bytes_read=total_read - read,
+                bytes_inflated=total_inflated - inflated,
+                process_peak_rss=process_rss,
+                peak_rss_growth=None if rss is None else process_rss - rss,
+            )
+            self.stages.append(record)
+
+    def report(self):
+        return dict(
+            stages=self.stages,
+            wall=sum(s["wall"] for s in self.stages),
+            cpu=sum(s["cpu"] for s in self.stages),
+        )
+
+    def write_json(self, path):
+        with open(path, "w") as f:
+            json.dump(self.report(), f, indent=2)
+
+    def format(self):
+        """Return the report as lines of text"""
+        mb = float(1 << 20)
+        lines = [_ROW_FORMAT.format(*_ROW_TITLES)]
+        for s in self.stages:
+            (rss, growth) = (s["process_peak_rss"], s["peak_rss_growth"])
+            lines.append(
+                _ROW_FORMAT.format(
+                    s["name"],
+                    "{0:.2f}".format(s["wall"]),
+                    "{0:.2f}".format(s["cpu"]),
+                    "{0:.0f}".format(s["items_per_sec"]),
+                    "{0:.1f}".format(s["bytes_read"] / mb),
+                    "{0:.1f}".format(s["bytes_inflated"] / mb),
+                    "-" if rss is None else "{0:.0f}".format(rss / mb),
+                    "-" if growth is None else "{0:.0f}".format(growth / mb),
+                )
+            )
+        return lines
+
+
+class HotPathStats(object):
+    """Counters and timers of the steps of serving content
+
+    Disabled by default; timer() and request() then return a shared no-op
+    context manager. The recent requests are kept in a ring buffer with the
+    time spent in each step.
+    """
+
+    def __init__(self, recent=200):
+        self.enabled = False
+        self._null = nullcontext()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._counters = {}
+        self._recent = deque(maxlen=recent)
+
+    def timer(self, name):
+        return self._timer(name) if self.enabled else self._null
+
+    def request(self, path):
+        return self._request(path) if self.enabled else self._null
+
+    @contextmanager
+    def _timer(self, name):
+        t = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - t)
+
+    @contextmanager
+    def _request(self, path):
+        steps = self._local.steps = {}
+        t = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - t
+            self._local.steps = None
+            self.add("request", elapsed)
+            with self._lock:
+                self._recent.append((elapsed, path, steps))
+
+    def add(self, name, seconds):
+        """Count a step which took the given time"""
+        with self._lock:
+            c = self._counters.get(name)
+            if c is None:
+                self._counters[name] = [1, seconds, seconds]
+            else:
+                c[0] += 1
+                c[1] += seconds
+                if seconds > c[2]:
+                    c[2] = seconds
+        steps = getattr(self._local, "steps", None)
+        if steps is not None:
+            steps[name] = steps.get(name, 0.0) + seconds
+
+    def counters(self):
+        """Return [(name, count, total seconds, max seconds)]"""
+        with self._lock:
+            return sorted((k,) + tuple(v) for (k, v) in self._counters.items())
+
+    def slowest(self, n=20):
+        """Return the n slowest of the recent requests
+        as [(seconds, path, {step: seconds})]"""
+        with self._lock:
+            recent = list(self._recent)
+        recent.sort(key=lambda r: r[0], reverse=True)
+        return recent[:n]
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._recent.clear()
+
+
+hot_stats = HotPathStats()
@@ -0,0 +1,83 @@
+"""Profiling sessions with cProfile and tracemalloc"""
+
+import cProfile
+import os.path
+import threading
+import time
+import tracemalloc
+
+_TRACEMALLOC_FRAMES = 25
+
+_lock = threading.Lock()
+_active = None
+
+
+def timestamped_path(out_dir, prefix, ext):
+    """Return out_dir/prefix-YYYYmmdd-HHMMSS.ext"""
+    name = "{0}-{1}{2}".format(prefix, time.strftime("%Y%m%d-%H%M%S"), ext)
+    return os.path.join(out_dir, name)
+
+
+class ProfileSession(object):
+    """Record the calls of the starting thread into a pstats file and/or
+    the allocations of the process into a tracemalloc snapshot
+
+    Only one session can run at a time.
+    """
+
+    def __init__(self, pstats_path=None, snapshot_path=None):
+        self._pstats_path = pstats_path
+        self._snapshot_path = snapshot_path
+        self._profile = None
+        self._started_tracing = False
+
+    @property
+    def running(self):
+        return _active is self
+
+    def start(self):
+        global _active
+        with _lock:
+            if _active is not None:
+                raise RuntimeError("another profiling session is running")
+            _active = self
+
+        if self._snapshot_path and not tracemalloc.is_tracing():
+            tracemalloc.start(_TRACEMALLOC_FRAMES)
+            self._started_tracing = True
+        if self._pstats_path:
+            self._profile = cProfile.Profile()
+            try:
+                self._profile.enable()
+            except ValueError:
+                # another profiler is active (Python 3.12+)
+                self._profile = None
+                self._stop_tracing()
+                _active = None
+                raise RuntimeError("another profiler is active")
+
+    def stop(self):
+        """Stop the session and return the paths of the files written"""
+        global _active
+        if _active is not self:
+            return []
+
+        paths = []
+        try:
+            if self._profile is not None:
+                self._profile.disable()
+                self._profile.dump_stats(self._pstats_path)
+                self._profile = None
+                paths.append(self._pstats_path)
+            if self._snapshot_path and tracemalloc.is_tracing():
+                tracemalloc.take_snapshot().dump(self._snapshot_path)
+                paths.append(self._snapshot_path)
+        finally:
+            self._stop_tracing()
+            _active = None
+        return paths
+
+    def _stop_tracing(self):
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
@@ -0,0 +1,76 @@
+"""Search results shown in the index list"""
+
+
+class MergedResults(object):
+    """The incremental search results followed by the full-text search
+    results whose paths are not among them
+
+    A sequence of (label, path, sortkey, prio, text), which also finds
+    the row of a path or of an item without scanning the rows.
+    """
+
+    def __init__(self, incr_res=(), full_res=()):
+        # The incremental search results decode their rows on access, so
+        # their paths are read only when the rows are indexed by path,
+        # which the full-text search results need to be merged
+        self._incr_res = tuple(incr_res)
+        self._full_res = tuple(full_res)
+        self._items = None if self._full_res else self._incr_res
+        self._rows_by_path = None
+
+    def _index(self):
+        if self._rows_by_path is not None:
+            return
+
+        items = list(self._incr_res)
+        rows_by_path = {}
+        for (row, item) in enumerate(items):
+            rows_by_path.setdefault(item[1], []).append(row)
+
+        num_incr = len(items)
+        for item in self._full_res:
+            path = item[1]
+            rows = rows_by_path.get(path)
+            if rows is None:
+                rows = rows_by_path[path] = []
+            elif rows[0] < num_incr:
+                continue
+            rows.append(len(items))
+            items.append(item)
+
+        self._items = tuple(items)
+        self._rows_by_path = rows_by_path
+        self._incr_res = self._full_res = None
+
+    def _get_items(self):
+        if self._items is None:
+            self._index()
+        return self._items
+
+    def __len__(self):
+        return len(self._get_items())
+
+    def __getitem__(self, i):
+        return self._get_items()[i]
+
+    def __iter__(self):
+        return iter(self._get_items())
+
+    def row_of_path(self, path):
+        """Return the first row of the path, or -1"""
+        self._index()
+        rows = self._rows_by_path.get(path)
+        return rows[0] if rows else -1
+
+    def row_of_item(self, item):
+        """Return the first row with the same (sortkey, prio, path), or -1"""
+        self._index()
+        items = self._items
+        for row in self._rows_by_path.get(item[1], ()):
+            if items[row][2] == item[2] and items[row][3] == item[3]:
+                return row
+        return -1
+
+    def detached(self):
+        """Return a copy which doesn't read the incremental search index"""
+        return MergedResults(tuple(map(tuple, self._get_items())))
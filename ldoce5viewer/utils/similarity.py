@@ -0,0 +1,35 @@
+"""Rankers finding the string most similar to a query
+
+A ranker is called as ranker(text, keys) and returns the index of the
+first key with the highest positive similarity to text, or -1.
+"""
+
+from collections import Counter
+
+
+def quick_ratio_ranker(text, keys):
+    """Rank by difflib.SequenceMatcher(a=text, b=key).quick_ratio()"""
+    counts = tuple(Counter(text).items())
+    len_a = len(text)
+    best = -1
+    best_ratio = 0
+    for (i, key) in enumerate(keys):
+        length = len_a + len(key)
+        if not length:
+            ratio = 1.0
+        else:
+            # the ratio can't exceed 2 * min(len_a, len_b) / length
+            if 2.0 * min(len_a, len(key)) / length <= best_ratio:
+                continue
+            matches = 0
+            for (c, n) in counts:
+                m = key.count(c)
+                matches += n if n < m else m
+            ratio = 2.0 * matches / length
+        if ratio > best_ratio:
+            best_ratio = ratio
+            best = i
+            if ratio == 1.0:
+                break
+    return best
+
@@ -1,6 +1,7 @@
 import codecs
 import re
 import unicodedata
+from functools import lru_cache
 
 _utf8_encoder = codecs.getencoder("utf-8")
 _utf8_decoder = codecs.getdecoder("utf-8")
@@ -29,7 +30,7 @@ def normalize_token(t):
     return u"".join(c for c in _unicode_normalize(u"NFKD", key) if is_not_mn(c))
 
 
-def normalize_index_key(key):
+def _normalize_index_key(key):
     key = key.strip().lower()
     key = key.replace(u"\u00A9", u"c")
 
@@ -40,6 +41,29 @@ def normalize_index_key(key):
     return u"".join(c for c in _unicode_normalize(u"NFKD", key) if is_wd(c))
 
 
+class _IndexKeyTable(dict):
+    """str.translate() table mapping a lowercased character to its
+    normalized form, filled in as the characters are seen"""
+
+    def __missing__(self, code):
+        value = _normalize_index_key(chr(code)) or None
+        self[code] = value
+        return value
+
+
+_index_key_table = _IndexKeyTable()
+for _code in range(0x80):
+    _index_key_table[_code]
+del _code
+
+
+@lru_cache(maxsize=4096)
+def normalize_index_key(key):
+    # NFKD only reorders combining marks, which are all dropped here,
+    # so the key can be normalized character by character
+    return key.strip().lower().translate(_index_key_table)
+
+
 def ellipsis(s, length):
     if len(s) >= length:
         return s[: length - 1] + u"\u2026"
@@ -0,0 +1,70 @@
+import hashlib
+import json
+import os.path
+import shutil
+import tempfile
+import unittest
+
+from benchmarks.corpus import generate
+from ldoce5viewer.ldoce5 import idmreader
+from ldoce5viewer.ldoce5.extract import get_entry_items, iterparse_entry_items
+
+# digests of the output of the multi-XPath extractor which get_entry_items()
+# replaced, for the entries of generate(entries, seed)
+_GOLDEN_PATH = os.path.join(os.path.dirname(__file__), "data", "extract_golden.json")
+
+
+def entry_digest(items, variations):
+    """Digest of the result of an extractor
+
+    Sets make the order of some variant items and of the asfilter codes
+    depend on the hash seed, so the items and the codes are sorted.
+    """
+
+    items = sorted(
+        item[:5] + (" ".join(sorted(item[5].split())), item[6]) for item in items
+    )
+    variations = sorted((k, sorted(v)) for (k, v) in variations.items())
+    data = json.dumps([items, variations], ensure_ascii=False)
+    return hashlib.sha1(data.encode("utf-8")).hexdigest()
+
+
+def read_entries(entries, seed):
+    tmp_dir = tempfile.mkdtemp(prefix="ldoce5test")
+    try:
+        data_dir = os.path.join(tmp_dir, "ldoce5.data")
+        generate(data_dir, entries, seed)
+        with idmreader.ArchiveReader(data_dir, "fs") as reader:
+            return [
+                (name, reader.read(location))
+                for (dirs, name, location) in idmreader.list_files(data_dir, "fs")
+            ]
+    finally:
+        shutil.rmtree(tmp_dir)
+
+
+class ExtractGoldenTest(unittest.TestCase):
+    """The extractors against the multi-XPath extractor, on the synthetic
+    corpus of the benchmarks"""
+
+    @classmethod
+    def setUpClass(cls):
+        with open(_GOLDEN_PATH) as f:
+            golden = json.load(f)
+        cls.digests = golden["digests"]
+        cls.entries = read_entries(golden["entries"], golden["seed"])
+
+    def check(self, extract):
+        self.assertEqual(len(self.entries), len(self.digests))
+        for ((name, data), digest) in zip(self.entries, self.digests):
+            self.assertEqual(entry_digest(*extract(data)), digest, name)
+
+    def test_get_entry_items(self):
+        self.check(get_entry_items)
+
+    def test_iterparse_entry_items(self):
+        self.check(iterparse_entry_items)
+
+
+if __name__ == "__main__":
+    unittest.main()
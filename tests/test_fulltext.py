@@ -0,0 +1,317 @@
+import os.path
+import random
+import shutil
+import tempfile
+import unittest
+
+from whoosh import index as wh_index
+from whoosh.query import And, Or, Term
+
+from ldoce5viewer import fulltext
+
+_WORDS = "run runs ran cat cats the of dog house take took fast slow red blue".split()
+_VARIATIONS = {"run": ("runs", "ran"), "cat": ("cats",), "take": ("took",)}
+_ITEMTYPES = ("hm", "p", "e", "d")
+_CODES = ("233", "234", "235", "236")
+
+
+def make_items(count, seed):
+    """(itemtype, content, asfilter, label, path, prio, sortkey) of random
+    items, with repeated words and many (sortkey, prio) ties"""
+
+    rng = random.Random(seed)
+    items = []
+    for i in range(count):
+        words = [rng.choice(_WORDS) for _ in range(rng.randint(1, 8))]
+        sortkey = rng.choice(_WORDS[:4])
+        items.append(
+            (
+                rng.choice(_ITEMTYPES),
+                " ".join(words),
+                " ".join(c for c in _CODES if rng.random() < 0.4),
+                "<l>{0}</l>".format(sortkey),
+                "/fs/{0}".format(i),
+                rng.choice((1, 2)),
+                sortkey,
+            )
+        )
+    return items
+
+
+def build_index(dirname, items):
+    index_dir = os.path.join(dirname, "fulltext")
+    var_path = os.path.join(dirname, "variations.cdb")
+    with open(var_path, "w+b") as f:
+        writer = fulltext.VariationsWriter(f)
+        for (word, variations) in _VARIATIONS.items():
+            writer.add(word, variations)
+        writer.finalize()
+    maker = fulltext.Maker(index_dir)
+    for item in items:
+        maker.add_item(*item)
+    maker.commit()
+    maker.close()
+    return (index_dir, var_path)
+
+
+class _IndexTestCase(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp_dir = tempfile.mkdtemp(prefix="ldoce5test")
+        (cls.index_dir, cls.var_path) = build_index(cls.tmp_dir, make_items(400, 0))
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.tmp_dir)
+
+    def setUp(self):
+        self.searcher = fulltext.Searcher(self.index_dir, self.var_path)
+
+    def tearDown(self):
+        self.searcher.close()
+
+    def search(self, *args, **kwargs):
+        limit = kwargs.pop("limit", None)
+        searcher = self.searcher
+        return searcher.search(searcher.make_collector(limit), *args, **kwargs)
+
+
+class CacheTest(_IndexTestCase):
+    """The result cache and the pages taken from it"""
+
+    def test_cache_hit(self):
+        first = self.search("run the", itemtypes=("e", "d"))
+        info = self.searcher.cache_info()
+        # the same query, written differently
+        second = self.search("run  the ", itemtypes=("d", "e", "d"))
+        self.assertEqual(second, first)
+        self.assertEqual(self.searcher.cache_info().hits, info.hits + 1)
+        self.assertEqual(self.searcher.cache_info().currsize, info.currsize)
+
+        # the limit and the highlighting are not part of the results
+        self.search("run the", itemtypes=("e", "d"), limit=10)
+        self.assertEqual(self.searcher.cache_info().currsize, info.currsize + 1)
+        self.search("run the", itemtypes=("e", "d"), highlight=True)
+        self.assertEqual(self.searcher.cache_info().hits, info.hits + 2)
+
+    def test_generation(self):
+        tmp_dir = tempfile.mkdtemp(prefix="ldoce5test")
+        try:
+            (index_dir, var_path) = build_index(tmp_dir, make_items(50, 1))
+            searcher = fulltext.Searcher(index_dir, var_path)
+            try:
+                before = searcher.search(searcher.make_collector(), "cat")
+                self.assertTrue(before)
+
+                index = wh_index.open_dir(index_dir)
+                writer = index.writer()
+                writer.add_document(
+                    itemtype="hm",
+                    content="cat",
+                    asfilter="",
+                    data=("<l>cat</l>", "/fs/new", 1, "cat"),
+                )
+                writer.commit()
+                index.close()
+
+                after = searcher.search(searcher.make_collector(), "cat")
+                self.assertEqual(len(after), len(before) + 1)
+                self.assertIn("/fs/new", [item[1] for item in after])
+                self.assertEqual(searcher.cache_info().hits, 0)
+            finally:
+                searcher.close()
+        finally:
+            shutil.rmtree(tmp_dir)
+
+    def test_pages(self):
+        for (query_str1, query_str2) in (
+            ("the", None),
+            ("run cat", None),
+            ("r*", None),
+            (None, "233 OR 235"),
+        ):
+            for highlight in (False, True):
+                whole = self.search(query_str1, query_str2, highlight=highlight)
+                self.assertTrue(whole)
+                for count in (1, 7, 50):
+                    # from a cold searcher, then from the cache
+                    for searcher in (
+                        fulltext.Searcher(self.index_dir, self.var_path),
+                        self.searcher,
+                    ):
+                        pages = []
+                        for offset in range(0, len(whole) + count, count):
+                            page = searcher.search(
+                                searcher.make_collector(),
+                                query_str1,
+                                query_str2,
+                                highlight=highlight,
+                                offset=offset,
+                                count=count,
+                            )
+                            self.assertEqual(page, whole[offset : offset + count])
+                            pages.extend(page)
+                        self.assertEqual(pages, whole)
+                        if searcher is not self.searcher:
+                            searcher.close()
+
+    def test_highlight(self):
+        for (label, path, sortkey, prio, text) in self.search(
+            "run", itemtypes=("e",), highlight=True
+        ):
+            self.assertIn('<span class="s_match', text)
+
+
+class RefineTest(_IndexTestCase):
+    """Refined searches against fresh ones"""
+
+    def test_refine(self):
+        searcher = self.searcher
+        refine = searcher._refine
+        refined = []
+
+        def counting_refine(*args):
+            entry = refine(*args)
+            if entry is not None:
+                refined.append(args[0])
+            return entry
+
+        searcher._refine = counting_refine
+        fresh = fulltext.Searcher(self.index_dir, self.var_path)
+        self.addCleanup(fresh.close)
+
+        rng = random.Random(2)
+        sentences = [[rng.choice(_WORDS) for _ in range(4)] for _ in range(20)]
+        sentences += [["the", "an", "run"], ["an", "the"], ["x", "the", "cat"]]
+        for words in sentences:
+            for itemtypes in ((), ("e", "d"), ("hm",)):
+                for limit in (None, 30):
+                    for n in range(1, len(words) + 1):
+                        query_str1 = " ".join(words[:n])
+                        result = searcher.search(
+                            searcher.make_collector(limit),
+                            query_str1,
+                            itemtypes=itemtypes,
+                            refine=True,
+                        )
+                        fresh._cache.clear()
+                        expected = fresh.search(
+                            fresh.make_collector(limit),
+                            query_str1,
+                            itemtypes=itemtypes,
+                        )
+                        self.assertEqual(result, expected, query_str1)
+
+                    # the refined result is highlighted as a fresh one
+                    self.assertEqual(
+                        searcher.search(
+                            searcher.make_collector(limit),
+                            query_str1,
+                            itemtypes=itemtypes,
+                            highlight=True,
+                        ),
+                        fresh.search(
+                            fresh.make_collector(limit),
+                            query_str1,
+                            itemtypes=itemtypes,
+                            highlight=True,
+                        ),
+                    )
+        self.assertGreater(len(refined), 100)
+
+
+class FilterBitsetsTest(_IndexTestCase):
+    """Filter-only searches on the bitsets against whoosh"""
+
+    _FILTERS = (
+        None,
+        "233",
+        "233 OR 234",
+        "233 AND 234",
+        "233 OR 234 OR 235 OR 236",
+        "233 AND 234 AND 235",
+        "(233 OR 234) AND (235 OR 236)",
+        "233 OR (234 AND 235)",
+        "999",
+        "233 OR 999",
+    )
+    _ITEMTYPES = ((), ("hm",), ("e", "d"), ("hm", "p", "e", "d"), ("x",))
+
+    def setUp(self):
+        _IndexTestCase.setUp(self)
+        self.whoosh = fulltext.Searcher(self.index_dir, self.var_path)
+        self.whoosh._bitsets.close()
+        self.whoosh._bitsets = None
+
+    def tearDown(self):
+        self.whoosh.close()
+        _IndexTestCase.tearDown(self)
+
+    def filter_query(self, query_str2, itemtypes):
+        andlist = []
+        if query_str2:
+            andlist.append(self.searcher._asf_parser.parse(query_str2))
+        if itemtypes:
+            andlist.append(Or([Term("itemtype", t) for t in itemtypes]))
+        return And(andlist)
+
+    def test_evaluate(self):
+        bitsets = self.searcher._bitsets
+        whoosh_searcher = self.whoosh._get_searcher()
+        for query_str2 in self._FILTERS:
+            for itemtypes in self._ITEMTYPES:
+                if not (query_str2 or itemtypes):
+                    continue
+                query = self.filter_query(query_str2, itemtypes)
+                expected = {}
+                for hit in whoosh_searcher.search(query, limit=None):
+                    expected.setdefault(hit.score, set()).add(hit.docnum)
+                scores = dict(
+                    (score, set(fulltext._iter_bits(bits)))
+                    for (score, bits) in bitsets.evaluate(query).items()
+                )
+                self.assertEqual(scores, expected, (query_str2, itemtypes))
+
+    def test_search(self):
+        for query_str2 in self._FILTERS:
+            for itemtypes in self._ITEMTYPES:
+                for limit in (None, 1000, 20):
+                    searchers = (self.searcher, self.whoosh)
+                    (result, expected) = (
+                        s.search(s.make_collector(limit), None, query_str2, itemtypes)
+                        for s in searchers
+                    )
+                    self.assertEqual(result, expected, (query_str2, itemtypes, limit))
+
+    def test_limit(self):
+        searcher = self.searcher
+        whoosh_searcher = searcher._get_searcher()
+        for limit in (1, 20, 100):
+            query = self.filter_query("233 OR 234", ("hm", "e"))
+            count = len(whoosh_searcher.search(query, limit=None))
+            self.assertGreater(count, limit)
+            # more docs than the limit: left to whoosh
+            with self.assertRaises(fulltext._UnsupportedFilter):
+                searcher._search_filter_only(
+                    whoosh_searcher,
+                    searcher.make_collector(limit),
+                    "233 OR 234",
+                    ("hm", "e"),
+                )
+            # exactly the limit: answered from the bitsets
+            entry = searcher._search_filter_only(
+                whoosh_searcher,
+                searcher.make_collector(count),
+                "233 OR 234",
+                ("hm", "e"),
+            )
+            self.assertEqual(
+                entry.results,
+                self.whoosh.search(
+                    self.whoosh.make_collector(count), None, "233 OR 234", ("hm", "e")
+                ),
+            )
+
+
+if __name__ == "__main__":
+    unittest.main()
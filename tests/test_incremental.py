@@ -0,0 +1,363 @@
+import os.path
+import random
+import shutil
+import tempfile
+import unittest
+
+from ldoce5viewer import incremental
+from ldoce5viewer.utils.text import normalize_index_key
+
+_ALPHABET = "abcdeé -"
+
+
+def make_items(count, seed):
+    """(plain, typecode, label, path, prio, score) of random items,
+    with many shared prefixes and duplicate keys"""
+
+    rng = random.Random(seed)
+    items = []
+    for i in range(count):
+        plain = "".join(rng.choice(_ALPHABET) for _ in range(rng.randint(1, 6)))
+        items.append(
+            (
+                plain,
+                rng.choice(("hm", "ph", "éx")),
+                rng.choice(("", "<b>{0}</b>", "é {0} あ")).format(plain),
+                "/fs/{0}".format(i),
+                rng.randint(0, 3),
+                rng.randint(0, 255),
+            )
+        )
+    return items
+
+
+def osa_distances(a, b):
+    """Edit distances from a to every prefix of b, counting the
+    transpositions of adjacent characters (optimal string alignment)"""
+
+    d = [
+        [i + j if i * j == 0 else 0 for j in range(len(b) + 1)]
+        for i in range(len(a) + 1)
+    ]
+    for i in range(1, len(a) + 1):
+        for j in range(1, len(b) + 1):
+            d[i][j] = min(
+                d[i - 1][j] + 1,
+                d[i][j - 1] + 1,
+                d[i - 1][j - 1] + (a[i - 1] != b[j - 1]),
+            )
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                d[i][j] = min(d[i][j], d[i - 2][j - 2] + 1)
+    return d[len(a)]
+
+
+def index_order(items):
+    """The items with normalized keys, in the index order"""
+
+    items = [(normalize_index_key(item[0]),) + item[1:] for item in items]
+    items.sort(key=lambda item: (item[0], item[4]))
+    return items
+
+
+class _IndexTestCase(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp_dir = tempfile.mkdtemp(prefix="ldoce5test")
+        cls.items = make_items(3000, 0)
+        items = index_order(cls.items)
+        # (label, path, sortkey, prio, None) as returned by search()
+        cls.rows = [
+            (label, path, plain, prio, None)
+            for (plain, _, label, path, prio, _) in items
+        ]
+        cls.scores = [item[5] for item in items]
+        cls.paths = {}
+        for (version, fuzzy) in ((1, False), (2, False), (2, True)):
+            path = os.path.join(cls.tmp_dir, "v{0}{1}.db".format(version, fuzzy))
+            maker = incremental.Maker(path, path + ".tmp", fuzzy=fuzzy, version=version)
+            for item in cls.items:
+                maker.add_item(*item)
+            maker.finalize()
+            cls.paths[(version, fuzzy)] = path
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.tmp_dir)
+
+    def open(self, version, fuzzy=False):
+        searcher = incremental.Searcher(self.paths[(version, fuzzy)])
+        self.addCleanup(searcher.close)
+        return searcher
+
+
+class RoundTripTest(_IndexTestCase):
+    """Indexes written by Maker and read back by both readers"""
+
+    def test_readers(self):
+        self.assertIsInstance(self.open(1)._reader, incremental._ReaderV1)
+        self.assertIsInstance(self.open(2)._reader, incremental._ReaderV2)
+        self.assertFalse(self.open(1).has_suggest())
+        self.assertFalse(self.open(2).has_suggest())
+        self.assertTrue(self.open(2, True).has_suggest())
+
+    def test_records(self):
+        for key in ((1, False), (2, False), (2, True)):
+            reader = self.open(*key)._reader
+            self.assertEqual(reader.num, len(self.rows))
+            for (i, (label, path, plain, prio, _)) in enumerate(self.rows):
+                self.assertEqual(reader.key(i), plain.encode("utf-8"), (key, i))
+                self.assertEqual(reader.label(i), label, (key, i))
+                self.assertEqual(reader.path(i), path, (key, i))
+                self.assertEqual(reader.prio(i), prio, (key, i))
+
+    def test_search(self):
+        rows = self.rows
+        keys = sorted(set(row[2] for row in rows))
+        prefixes = set(k[:n] for k in keys for n in range(1, len(k) + 1))
+        prefixes.update(("f", "ééééééé", "E-a", " "))
+        searchers = [self.open(1), self.open(2), self.open(2, True)]
+        for prefix in sorted(prefixes):
+            key = normalize_index_key(prefix)
+            matches = [row for row in rows if key and row[2].startswith(key)]
+            for limit in (1, 5, 100):
+                expected = matches[:limit]
+                for searcher in searchers:
+                    result = searcher.search(prefix, limit)
+                    self.assertEqual(len(result), len(expected), prefix)
+                    self.assertEqual([tuple(row) for row in result], expected, prefix)
+
+    def test_unknown_version(self):
+        path = os.path.join(self.tmp_dir, "unknown.db")
+        with self.assertRaises(ValueError):
+            incremental.Maker(path, path + ".tmp", version=3)
+        self.assertFalse(os.path.exists(path + ".tmp"))
+
+
+class RankedSearchTest(_IndexTestCase):
+    """Ranked searches against brute force"""
+
+    def ranked_rows(self, key, limit):
+        rows = self.rows
+        scores = self.scores
+        matches = [i for (i, row) in enumerate(rows) if row[2].startswith(key)]
+        if len(matches) > limit:
+            exact = [i for i in matches if rows[i][2] == key][:limit]
+            others = [i for i in matches if rows[i][2] != key]
+            others.sort(key=lambda i: (-scores[i], i))
+            matches = (exact + others)[:limit]
+        return [rows[i] for i in matches]
+
+    def test_top(self):
+        reader = self.open(2)._reader
+        scores = self.scores
+        rng = random.Random(4)
+        for _ in range(2000):
+            start = rng.randint(0, len(scores))
+            stop = rng.randint(start, min(len(scores), start + rng.choice((10, 300))))
+            k = rng.choice((0, 1, 2, 5, 50, 1000))
+            expected = sorted(range(start, stop), key=lambda i: (-scores[i], i))
+            self.assertEqual(reader.top(start, stop, k), expected[:k], (start, stop))
+
+    def test_search(self):
+        keys = sorted(set(row[2] for row in self.rows))
+        prefixes = sorted(set(k[:n] for k in keys for n in range(1, len(k) + 1)))
+        searcher = self.open(2)
+        unranked = self.open(2)
+        for prefix in prefixes:
+            for limit in (1, 5, 30, 3000):
+                # cold searches
+                searcher._cache.clear()
+                result = [tuple(row) for row in searcher.search(prefix, limit, True)]
+                self.assertEqual(result, self.ranked_rows(prefix, limit), prefix)
+                if len(result) < limit:
+                    # complete, hence in the (sortkey, prio) order
+                    unranked._cache.clear()
+                    expected = [tuple(row) for row in unranked.search(prefix, limit)]
+                    self.assertEqual(result, expected, prefix)
+
+    def test_without_scores(self):
+        searcher = self.open(1)
+        for prefix in ("a", "b", "ce"):
+            self.assertEqual(
+                list(searcher.search(prefix, 5, True)),
+                list(searcher.search(prefix, 5, False)),
+            )
+
+
+class CacheTest(_IndexTestCase):
+    """Searches answered from the cache against cold ones"""
+
+    def test_refine(self):
+        searcher = self.open(2)
+        refine = searcher._refine
+        refined = []
+
+        def counting_refine(base, key):
+            refined.append(key)
+            return refine(base, key)
+
+        searcher._refine = counting_refine
+        cold = self.open(2)
+
+        rng = random.Random(5)
+        words = rng.sample(sorted(set(row[2] for row in self.rows)), 100)
+        for ranked in (False, True):
+            for word in words:
+                for n in range(1, len(word) + 1):
+                    prefix = word[:n]
+                    # the limit varies, as with the result list of the GUI
+                    limit = rng.choice((5, 30, 500))
+                    result = [
+                        tuple(row) for row in searcher.search(prefix, limit, ranked)
+                    ]
+                    cold._cache.clear()
+                    expected = [
+                        tuple(row) for row in cold.search(prefix, limit, ranked)
+                    ]
+                    self.assertEqual(result, expected, (prefix, limit, ranked))
+                    if ranked:
+                        # the exact matches come first
+                        exact = [row for row in expected if row[2] == prefix]
+                        self.assertEqual(result[: len(exact)], exact)
+        self.assertGreater(len(refined), 100)
+
+    def test_limits(self):
+        searcher = self.open(2)
+        cold = self.open(2)
+        for ranked in (False, True):
+            for prefix in ("a", "ab", "c", "e"):
+                for limit in (500, 5, 1, 30, 3000, 2):
+                    result = [
+                        tuple(row) for row in searcher.search(prefix, limit, ranked)
+                    ]
+                    cold._cache.clear()
+                    expected = [
+                        tuple(row) for row in cold.search(prefix, limit, ranked)
+                    ]
+                    self.assertEqual(result, expected, (prefix, limit, ranked))
+
+
+class RowsTest(_IndexTestCase):
+    """Rows decoded on access"""
+
+    def count_decoding(self, reader):
+        decoded = []
+        for name in ("key", "keys", "label", "path", "prio"):
+            method = getattr(reader, name)
+
+            def counting(*args, name=name, method=method):
+                decoded.append(name)
+                return method(*args)
+
+            setattr(reader, name, counting)
+        return decoded
+
+    def test_lazy(self):
+        for version in (1, 2):
+            searcher = self.open(version)
+            decoded = self.count_decoding(searcher._reader)
+            result = searcher.search("a", 100)
+            self.assertEqual(len(result), 100)
+            rows = list(result[10:20])
+            self.assertEqual(decoded, [])
+
+            self.assertEqual(rows[0][1], self.rows[self.first("a") + 10][1])
+            self.assertEqual(decoded, ["path"])
+            self.assertEqual(tuple(rows[1]), self.rows[self.first("a") + 11])
+            self.assertEqual(decoded, ["path", "label", "path", "key", "prio"])
+
+    def first(self, prefix):
+        return [row[2].startswith(prefix) for row in self.rows].index(True)
+
+    def test_closed(self):
+        for version in (1, 2):
+            searcher = incremental.Searcher(self.paths[(version, False)])
+            result = searcher.search("b", 500)
+            copy = [tuple(row) for row in result[:5]]
+            searcher.close()
+            # the copies stay valid, unlike the rows
+            self.assertEqual(copy, self.rows[self.first("b") : self.first("b") + 5])
+            with self.assertRaises(ValueError):
+                tuple(result[100])
+
+
+class DawgTest(unittest.TestCase):
+    """The DAWG and its suggestions against brute force"""
+
+    @classmethod
+    def setUpClass(cls):
+        rng = random.Random(3)
+        keys = set()
+        while len(keys) < 300:
+            keys.add("".join(rng.choice("abcde") for _ in range(rng.randint(1, 7))))
+        cls.keys = sorted(keys)
+        builder = incremental._DawgBuilder()
+        for key in cls.keys:
+            builder.add(key)
+            builder.add(key)  # duplicates are ignored
+        cls.dawg = incremental._Dawg(builder.serialize(), 0)
+
+        words = [rng.choice(cls.keys) for _ in range(60)]
+        words = [cls.mistype(rng, w) for w in words] + words[:20]
+        words += ["".join(rng.choice("abcdef") for _ in range(n)) for n in range(1, 9)]
+        cls.words = words
+
+    @staticmethod
+    def mistype(rng, word):
+        for _ in range(rng.randint(1, 2)):
+            i = rng.randint(0, len(word))
+            op = rng.choice("isdt")
+            if op == "i":
+                word = word[:i] + rng.choice("abcdef") + word[i:]
+            elif op == "s" and i < len(word):
+                word = word[:i] + rng.choice("abcdef") + word[i + 1 :]
+            elif op == "d" and i < len(word) and len(word) > 1:
+                word = word[:i] + word[i + 1 :]
+            elif op == "t" and i + 1 < len(word):
+                word = word[:i] + word[i + 1] + word[i] + word[i + 2 :]
+        return word
+
+    def distances(self, word, prefix):
+        """Return [(distance, length, key)] of the suggestions"""
+
+        found = []
+        for key in self.keys:
+            distances = osa_distances(word, key)
+            found.append((min(distances) if prefix else distances[-1], len(key), key))
+        return sorted(found)
+
+    def expected(self, distances, word, limit, maxdist):
+        # one edit only for the keys with another first letter
+        return [
+            key
+            for (dist, _, key) in distances
+            if dist <= (maxdist if key[0] == word[0] else min(maxdist, 1))
+        ][:limit]
+
+    def test_keys(self):
+        keys = []
+        stack = [(0, "")]
+        while stack:
+            (node, key) = stack.pop()
+            (final, edges) = self.dawg._node(node)
+            if final:
+                keys.append(key)
+            for i in range(0, len(edges), 2):
+                stack.append((edges[i + 1], key + chr(edges[i])))
+        self.assertEqual(sorted(keys), self.keys)
+
+    def test_suggest(self):
+        for word in self.words:
+            for prefix in (False, True):
+                distances = self.distances(word, prefix)
+                for maxdist in (0, 1, 2):
+                    for limit in (5, 1000):
+                        self.assertEqual(
+                            self.dawg.suggest(word, limit, maxdist, prefix),
+                            self.expected(distances, word, limit, maxdist),
+                            (word, limit, maxdist, prefix),
+                        )
+
+
+if __name__ == "__main__":
+    unittest.main()
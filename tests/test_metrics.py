@@ -0,0 +1,38 @@
+import unittest
+
+from ldoce5viewer.utils.metrics import StageMetrics, peak_rss
+
+
+class StageMetricsTest(unittest.TestCase):
+    """The metrics recorded for each stage"""
+
+    def test_stages(self):
+        metrics = StageMetrics()
+        data = []
+        for (name, size) in (("small", 1 << 10), ("large", 32 << 20), ("none", 0)):
+            with metrics.stage(name) as st:
+                data.append(b"x" * size)
+                st["items"] = size
+        report = metrics.report()
+        self.assertEqual(
+            [s["name"] for s in report["stages"]], ["small", "large", "none"]
+        )
+        self.assertEqual(len(metrics.format()), 4)
+        if peak_rss() is None:
+            return
+
+        # the peak of the process at the start of a stage is at least
+        # that at the end of the previous one
+        prev = None
+        for s in report["stages"]:
+            self.assertGreaterEqual(s["peak_rss_growth"], 0)
+            if prev is not None:
+                self.assertGreaterEqual(
+                    s["process_peak_rss"] - s["peak_rss_growth"],
+                    prev["process_peak_rss"],
+                )
+            prev = s
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,113 @@
+import unittest
+
+from ldoce5viewer.utils.results import MergedResults
+
+
+class LazyRow(object):
+    """A row of the incremental search results, which counts the reads
+    of its fields"""
+
+    def __init__(self, item, reads):
+        self._item = item
+        self._reads = reads
+
+    def __len__(self):
+        return len(self._item)
+
+    def __getitem__(self, n):
+        self._reads.append((self._item[1], n))
+        return self._item[n]
+
+    def __iter__(self):
+        return (self[n] for n in range(len(self)))
+
+
+def item(path, sortkey="a", prio=1):
+    return ("<b>{0}</b>".format(sortkey), path, sortkey, prio, None)
+
+
+class MergedResultsTest(unittest.TestCase):
+    """The merge of the results and the lookups of rows"""
+
+    def test_dedup(self):
+        incr_res = [item("/fs/1"), item("/fs/2", "b"), item("/fs/1", "c")]
+        full_res = [
+            item("/fs/2", "x"),  # in the incremental part: dropped
+            item("/fs/3"),
+            item("/fs/3", "y"),  # twice in the full-text part: kept
+            item("/fs/1"),
+            item("/fs/4"),
+        ]
+        merged = MergedResults(incr_res, full_res)
+        self.assertEqual(
+            list(merged), incr_res + [full_res[1], full_res[2], full_res[4]]
+        )
+        self.assertEqual(len(merged), 6)
+        self.assertEqual(merged[3], full_res[1])
+        self.assertEqual(merged[-1], full_res[4])
+
+    def test_row_of_path(self):
+        incr_res = [item("/fs/1"), item("/fs/2"), item("/fs/1", "b")]
+        full_res = [item("/fs/3"), item("/fs/2"), item("/fs/3", "c")]
+        merged = MergedResults(incr_res, full_res)
+        for (path, row) in (("/fs/1", 0), ("/fs/2", 1), ("/fs/3", 3), ("/x", -1)):
+            self.assertEqual(merged.row_of_path(path), row, path)
+        self.assertEqual(MergedResults().row_of_path("/fs/1"), -1)
+        self.assertEqual(MergedResults((), full_res).row_of_path("/fs/3"), 0)
+
+    def test_row_of_item(self):
+        incr_res = [item("/fs/1"), item("/fs/1", "b"), item("/fs/1", "b", 2)]
+        full_res = [item("/fs/2", "c"), item("/fs/2", "d")]
+        merged = MergedResults(incr_res, full_res)
+        self.assertEqual(merged.row_of_item(item("/fs/1", "b")), 1)
+        self.assertEqual(merged.row_of_item(item("/fs/1", "b", 2)), 2)
+        # the label and the text are not compared
+        self.assertEqual(merged.row_of_item(("", "/fs/2", "d", 1, "text")), 4)
+        self.assertEqual(merged.row_of_item(item("/fs/1", "c")), -1)
+        self.assertEqual(merged.row_of_item(item("/fs/3")), -1)
+
+    def test_detached(self):
+        merged = MergedResults([item("/fs/1")], [item("/fs/2")])
+        detached = merged.detached()
+        self.assertEqual(list(detached), list(merged))
+        self.assertEqual(detached.row_of_path("/fs/2"), 1)
+
+
+class LazinessTest(unittest.TestCase):
+    """The incremental search results are read only when needed"""
+
+    def setUp(self):
+        self.reads = []
+        self.incr_res = [
+            LazyRow(item("/fs/{0}".format(i)), self.reads) for i in range(100)
+        ]
+
+    def test_incremental_only(self):
+        merged = MergedResults(self.incr_res)
+        self.assertEqual(len(merged), 100)
+        self.assertIs(merged[5], self.incr_res[5])
+        self.assertEqual(self.reads, [])
+
+        self.assertEqual(merged.row_of_path("/fs/7"), 7)
+        self.assertEqual(len(self.reads), 100)
+        self.assertEqual(merged.row_of_path("/fs/8"), 8)
+        self.assertEqual(len(self.reads), 100)
+
+    def test_merged(self):
+        merged = MergedResults(self.incr_res, [item("/fs/1"), item("/fs/x")])
+        self.assertEqual(self.reads, [])
+        self.assertEqual(len(merged), 101)
+        paths = ["/fs/{0}".format(i) for i in range(100)]
+        self.assertEqual(self.reads, [(path, 1) for path in paths])
+
+    def test_detached(self):
+        detached = MergedResults(self.incr_res, [item("/fs/x")]).detached()
+        del self.reads[:]
+        self.assertEqual(len(detached), 101)
+        self.assertEqual(detached[0], item("/fs/0"))
+        self.assertEqual(detached.row_of_path("/fs/x"), 100)
+        self.assertEqual(self.reads, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
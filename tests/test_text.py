@@ -0,0 +1,58 @@
+import sys
+import unittest
+
+from ldoce5viewer.utils.text import _normalize_index_key, normalize_index_key
+
+# the translation is memoised, so test the function under the cache
+_normalize = normalize_index_key.__wrapped__
+
+_CHUNK = 512
+
+
+class NormalizeIndexKeyTest(unittest.TestCase):
+    """normalize_index_key() against the character-by-character NFKD
+    implementation it replaced"""
+
+    def test_every_code_point(self):
+        for code in range(sys.maxunicode + 1):
+            c = chr(code)
+            if _normalize(c) != _normalize_index_key(c):
+                self.fail(
+                    "U+{0:04X}: {1!r} != {2!r}".format(
+                        code, _normalize(c), _normalize_index_key(c)
+                    )
+                )
+
+    def test_runs_of_code_points(self):
+        # adjacent characters, so that NFKD may reorder or combine them
+        for start in range(0, sys.maxunicode + 1, _CHUNK):
+            s = "".join(
+                chr(c) for c in range(start, start + _CHUNK) if c <= sys.maxunicode
+            )
+            self.assertEqual(_normalize(s), _normalize_index_key(s), hex(start))
+
+    def test_combining_marks(self):
+        for s in (
+            "caf\u00e9",  # precomposed
+            "cafe\u0301",  # decomposed
+            "e\u0323\u0301",  # marks in canonical order
+            "e\u0301\u0323",  # marks in the other order
+            "\u0301e",  # leading mark
+            "s\u0323\u0307",  # s with dot below and dot above
+            "s\u0307\u0323",
+            "\u01fangstr\u00f6m",
+            "\u0915\u093c\u093f",  # Devanagari with nukta, vowel sign (Mc)
+            "\uac00",  # Hangul syllable
+            "\u00a9 \ufb01 \u2460 \uff21",  # compatibility forms
+        ):
+            self.assertEqual(_normalize(s), _normalize_index_key(s), repr(s))
+            self.assertEqual(normalize_index_key(s), _normalize_index_key(s))
+
+    def test_empty_and_spaces(self):
+        for s in ("", " ", "\t\n", "\u3000", " a\u00a0b ", "\u00a0x\u2003"):
+            self.assertEqual(_normalize(s), _normalize_index_key(s), repr(s))
+        self.assertEqual(normalize_index_key(""), "")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,63 @@
+import ast
+import os.path
+import re
+import unittest
+import xml.etree.ElementTree as ET
+
+_QTGUI_DIR = os.path.join(os.path.dirname(__file__), os.pardir, "ldoce5viewer", "qtgui")
+
+# the forms and the modules which use them
+_FORMS = (
+    ("main.ui", "main.py"),
+    ("advanced.ui", "advanced.py"),
+    ("indexer.ui", "indexer.py"),
+)
+
+# self._ui.name or ui.name, which is assigned if followed by a single '='
+_UI_ATTR = re.compile(r"(?:\bself\._ui|(?<![\w.])ui)\.(\w+)(\s*=(?!=))?")
+
+_GENERATED = frozenset(("setupUi", "retranslateUi"))
+
+
+def form_names(form):
+    """The names of the objects which pyside6-uic makes attributes"""
+
+    root = ET.parse(os.path.join(_QTGUI_DIR, "ui", form)).getroot()
+    return set(
+        e.get("name")
+        for e in root.iter()
+        if e.tag in ("widget", "action", "actiongroup", "layout", "spacer")
+        and e.get("name")
+    )
+
+
+class FormsTest(unittest.TestCase):
+    """The .ui forms against the code using them, without Qt
+
+    The ui/*.py modules are generated from the forms by pyside6-uic when
+    the package is built, so they are not in the tree.
+    """
+
+    def test_attributes(self):
+        for (form, module) in _FORMS:
+            with open(os.path.join(_QTGUI_DIR, module)) as f:
+                src = f.read()
+            (used, assigned) = (set(), set())
+            for m in _UI_ATTR.finditer(src):
+                (assigned if m.group(2) else used).add(m.group(1))
+            missing = used - assigned - _GENERATED - form_names(form)
+            self.assertEqual(missing, set(), form)
+
+    def test_custom_widgets(self):
+        with open(os.path.join(_QTGUI_DIR, "ui", "custom.py")) as f:
+            tree = ast.parse(f.read())
+        classes = set(n.name for n in tree.body if isinstance(n, ast.ClassDef))
+        for (form, _) in _FORMS:
+            root = ET.parse(os.path.join(_QTGUI_DIR, "ui", form)).getroot()
+            for w in root.iter("customwidget"):
+                if w.findtext("header") == ".custom":
+                    self.assertIn(w.findtext("class"), classes, form)
+
+
+if __name__ == "__main__":
+    unittest.main()